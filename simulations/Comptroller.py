@@ -1,7 +1,11 @@
 
-import statistics
 import math
 
+from RingBuffer import RingBuffer
+from RollingStats import RollingWindow
+import Snapshot
+from ConsensusDifficulties import rankDifficulties, floatDifficulties
+
 class Comptroller(object):
 
     # PARAMETERS
@@ -57,6 +61,13 @@ class Comptroller(object):
 
     noiseFractionSlots = 0.20
 
+    # state stored per block (in <name>History buffers) to restore it on reorgs.
+    historyNames = ['totalStaked', 'totalCirculating', 'minIssuance', 'currentIssuance',
+                    'blockTimeFactor', 'speedRatio', 'blockRewardTarget', 'blockReward', 'txsPerBlock']
+    # the float controllers are kept as floats (see float() below), so every
+    # history stays in its typed array on the normal path
+    historyTypecodes = {'totalStaked': 'q', 'totalCirculating': 'q', 'txsPerBlock': 'q'} # 'd' otherwise
+
 
     def __init__(self):
 
@@ -67,15 +78,24 @@ class Comptroller(object):
         # now is currentSpeedRatio
         #const VDF_PROTECTION_BASE = Number(3.0); // will raise very slow when VDF speed gets faster
 
-        # buffers of header data (windowSize items max)
-        self.blockTimes = [] # total time to produce block (>0)
-        self.difficulties = [] # vdf steps computed per block (>0)
-        self.speeds = [] # vdf steps per seconds per block
-        self.volumes = [] # coins moved per block
-        self.staked = [] # new coins staked per block (>=0), to stake you need 48hrs idle.
-        self.unstaked = [] # new coins umstaked per block (>=0)
-        self.rewards = [] # new coins minted for miner rewards (>0)
-        self.utilizations = [] # fraction of block txs used.
+        # buffers of header data (windowSize + windowExtraBuffer items max)
+        bufferSize = self.windowSize + self.windowExtraBuffer
+        # exact: values come back with the type they were added with (see RingBuffer)
+        self.blockTimes = RingBuffer(bufferSize, 'q', True) # total time to produce block (>0)
+        self.difficulties = RingBuffer(bufferSize, 'q', True) # vdf steps computed per block (>0)
+        self.speeds = RingBuffer(bufferSize, 'd', True) # vdf steps per seconds per block
+        self.volumes = RingBuffer(bufferSize, 'q', True) # coins moved per block
+        self.staked = RingBuffer(bufferSize, 'q', True) # new coins staked per block (>=0), to stake you need 48hrs idle.
+        self.unstaked = RingBuffer(bufferSize, 'q', True) # new coins umstaked per block (>=0)
+        self.rewards = RingBuffer(bufferSize, 'q', True) # new coins minted for miner rewards (>0)
+        self.utilizations = RingBuffer(bufferSize, 'd', True) # fraction of block txs used.
+
+        # state right after each buffered block, for rollbackTo.
+        for name in self.historyNames:
+            setattr(self, name + 'History', RingBuffer(bufferSize, self.historyTypecodes.get(name, 'd'), True))
+
+        # incremental statistics over the last windowSize items of the buffers
+        self.rebuildWindows()
 
         # basic metrics
         self.blockNumber = 0
@@ -90,9 +110,10 @@ class Comptroller(object):
         self.currentMinSpeed = None # min
         self.currentSpeedRatio = None # max / min
         self.velocity = 0.0
+        self.meanBlockUtilization = None
 
         # controlled variables
-        self.minIssuance = self.nonCircularMinIssuance # 1%
+        self.minIssuance = float(self.nonCircularMinIssuance) # 1%
         self.currentIssuance = None
         self.blockTimeFactor = None
         self.speedRatio = None
@@ -100,10 +121,10 @@ class Comptroller(object):
         self.blockReward = None
 
         # Final initialization
-        self.currentIssuance = self.maxIssuance
-        self.blockTimeFactor = self.initialBlockTimeFactor
-        self.speedRatio = self.initialSpeedRateTarget
-        self.blockReward = self.initialBlockReward
+        self.currentIssuance = float(self.maxIssuance)
+        self.blockTimeFactor = float(self.initialBlockTimeFactor)
+        self.speedRatio = float(self.initialSpeedRateTarget)
+        self.blockReward = float(self.initialBlockReward)
         self.blockRewardTarget = self.blockReward
         self.txsPerBlock = self.minTxsPerBlock
 
@@ -122,22 +143,15 @@ class Comptroller(object):
             self.totalCirculating = 1 #self.bootstrapVirtualStake * (100. - self.maximumStakingRatio) / 100.
         self.stakingRatio = 100 * float(self.totalStaked) / (self.totalCirculating + self.totalStaked)
 
-        # append to buffers
-        self.blockTimes.append(blockTime)
+        # append to buffers, oldest items are overwritten when full
+        self.appendToWindow(self.blockTimesWindow, self.blockTimes, blockTime)
         self.difficulties.append(difficulty)
-        self.speeds.append( difficulty / blockTime )
-        self.volumes.append(volume)
+        self.appendToWindow(self.speedsWindow, self.speeds, difficulty / blockTime)
+        self.appendToWindow(self.volumesWindow, self.volumes, volume)
         self.staked.append(newStake)
         self.unstaked.append(newUnstake)
-        self.utilizations.append(txsCount / self.txsPerBlock)
-
-        if len(self.blockTimes) > self.windowSize + self.windowExtraBuffer:
-            self.blockTimes = self.blockTimes[1:]
-            self.difficulties = self.difficulties[1:]
-            self.volumes = self.volumes[1:]
-            self.staked = self.staked[1:]
-            self.unstaked = self.unstaked[1:]
-            self.txsCounts = self.txsCounts[1:]
+        self.rewards.append(reward)
+        self.appendToWindow(self.utilizationsWindow, self.utilizations, txsCount / self.txsPerBlock)
 
         # update complex metrics
         self.updateComplexMetrics()
@@ -154,22 +168,122 @@ class Comptroller(object):
         # update block size in Txs
         self.updateBlockSize()
 
+        self.recordState()
+
+    # Bulk replay of many blocks, the same as calling addBlockSample for each
+    # block. The controllers still run per block on the rolling windows, the
+    # rest is batched: speeds are computed for the whole batch, the values
+    # leaving the windows come from the old buffer tail plus the batch, and
+    # the buffers and histories are written once at the end (RingBuffer.extend).
+    # All arguments are columnar sequences (lists or NumPy arrays) of equal length.
+    # trace: return per-block controller values as a dict of columns.
+    def addBlockSamples(self, blockTimes, difficulties, volumes, newStakes, newUnstakes, rewards, txsCounts, trace=False):
+        columns = [blockTimes, difficulties, volumes, newStakes, newUnstakes, rewards, txsCounts]
+        columns = [c.tolist() if hasattr(c, 'tolist') else list(c) for c in columns]
+        assert( all(len(c) == len(columns[0]) for c in columns) )
+        blockTimes, difficulties, volumes, newStakes, newUnstakes, rewards, txsCounts = columns
+
+        traceNames = ['blockTimeFactor', 'speedRatio', 'currentIssuance', 'blockReward', 'txsPerBlock']
+        traced = {name: [] for name in traceNames}
+        histories = [[] for name in self.historyNames]
+        windowSize = self.windowSize
+        held = len(self.blockTimes)
+        speeds = [difficulty / blockTime for difficulty, blockTime in zip(difficulties, blockTimes)]
+        # (window, series, tail): series is the buffered tail then the batch,
+        # batch value i is series[tail + i]; utilizations are added per block.
+        windows = []
+        for window, buffer, values in [(self.blockTimesWindow, self.blockTimes, blockTimes),
+                                       (self.speedsWindow, self.speeds, speeds),
+                                       (self.volumesWindow, self.volumes, volumes),
+                                       (self.utilizationsWindow, self.utilizations, [])]:
+            series = buffer.window(windowSize).tolist()
+            windows.append((window, series, len(series)))
+            series.extend(values)
+        utilizationSeries = windows[3][1]
+
+        for i in range(len(blockTimes)):
+            newStake = newStakes[i]
+            newUnstake = newUnstakes[i]
+            self.blockNumber += 1
+            assert( newStake <= self.totalCirculating )
+            assert( newUnstake <= self.totalStaked )
+            self.totalStaked += newStake - newUnstake
+            if self.totalStaked < 1:
+                self.totalStaked = 1
+            self.totalCirculating += newUnstake - newStake
+            if self.totalCirculating < 1:
+                self.totalCirculating = 1
+            self.stakingRatio = 100 * float(self.totalStaked) / (self.totalCirculating + self.totalStaked)
+
+            utilizationSeries.append(txsCounts[i] / self.txsPerBlock)
+            for window, series, tail in windows:
+                expired = None
+                if held + i >= windowSize:
+                    expired = series[tail + i - windowSize]
+                window.append(series[tail + i], expired)
+
+            self.updateComplexMetrics()
+            self.updateBlockTimeActionable()
+            self.updateSpeedRatioTarget()
+            self.updateIssuance()
+            self.updateBlockSize()
+
+            for name, history in zip(self.historyNames, histories):
+                history.append(getattr(self, name))
+            if trace:
+                for name in traceNames:
+                    traced[name].append(getattr(self, name))
+
+        for buffer, values in [(self.blockTimes, blockTimes), (self.difficulties, difficulties), (self.speeds, speeds),
+                               (self.volumes, volumes), (self.staked, newStakes), (self.unstaked, newUnstakes),
+                               (self.rewards, rewards), (self.utilizations, utilizationSeries[windows[3][2]:])]:
+            buffer.extend(values)
+        for name, history in zip(self.historyNames, histories):
+            getattr(self, name + 'History').extend(history)
+
+        if trace:
+            return traced
+
     def updateComplexMetrics(self):
         # update complex metrics
-        self.currentBlockTime = statistics.mean(self.blockTimes[-self.windowSize:])
-        self.currentSpeed = statistics.mean(self.speeds[-self.windowSize:])
-        self.currentMaxSpeed = max(self.speeds[-self.windowSize:])
-        self.currentMinSpeed = min(self.speeds[-self.windowSize:])
+        self.currentBlockTime = self.blockTimesWindow.mean()
+        self.currentSpeed = self.speedsWindow.mean()
+        self.currentMaxSpeed = self.speedsWindow.max()
+        self.currentMinSpeed = self.speedsWindow.min()
         self.currentSpeedRatio = self.currentMaxSpeed / self.currentMinSpeed
-        if len(self.volumes) < self.windowSize: # bootstrap blocks
-            auxWindowsPerYear = self.blocksPerYear / len(self.volumes)
+        if len(self.volumesWindow) < self.windowSize: # bootstrap blocks
+            auxWindowsPerYear = self.blocksPerYear / len(self.volumesWindow)
         else:
             auxWindowsPerYear = self.windowsPerYear
-        self.velocity = statistics.median(self.volumes[-self.windowSize:]) * auxWindowsPerYear / self.totalCirculating
+        self.velocity = self.volumesWindow.median() * auxWindowsPerYear / self.totalCirculating
         # use mean is not enough >0 points.
         if self.velocity == 0.0:
-            self.velocity = statistics.mean(self.volumes[-self.windowSize:]) * self.windowsPerYear / self.totalCirculating
-        self.meanBlockUtilization = statistics.mean(self.utilizations[-self.windowSize:])
+            self.velocity = self.volumesWindow.mean() * self.windowsPerYear / self.totalCirculating
+        self.meanBlockUtilization = self.utilizationsWindow.mean()
+
+    def rebuildWindows(self):
+        self.blockTimesWindow = RollingWindow(self.windowSize, self.windowExtraBuffer)
+        self.speedsWindow = RollingWindow(self.windowSize, self.windowExtraBuffer, extremes=True)
+        self.volumesWindow = RollingWindow(self.windowSize, self.windowExtraBuffer, median=True)
+        self.utilizationsWindow = RollingWindow(self.windowSize, self.windowExtraBuffer)
+        for window, buffer in [(self.blockTimesWindow, self.blockTimes), (self.speedsWindow, self.speeds),
+                               (self.volumesWindow, self.volumes), (self.utilizationsWindow, self.utilizations)]:
+            window.extend(buffer.window(len(buffer)))
+
+    # the value windowSize back leaves the window.
+    def appendToWindow(self, window, buffer, value):
+        expired = None
+        if len(buffer) >= self.windowSize:
+            expired = buffer[-self.windowSize]
+        buffer.append(value)
+        window.append(buffer[-1], expired)
+
+    # value already popped from buffer, the one windowSize back re-enters the window.
+    def popFromWindow(self, window, buffer, value):
+        restored = None
+        if len(buffer) >= self.windowSize:
+            restored = buffer[-self.windowSize]
+        window.pop(value, restored, buffer)
 
 
     def dropLastBlockSample(self):
@@ -190,14 +304,8 @@ class Comptroller(object):
             self.totalCirculating = 1 #self.bootstrapVirtualStake * (100. - self.maximumStakingRatio) / 100.
         self.stakingRatio = 100 * float(self.totalStaked) / (self.totalCirculating + self.totalStaked)
 
-        # append to buffers
-        self.blockTimes.pop()
-        self.difficulties.pop()
-        self.speeds.pop()
-        self.volumes.pop()
-        self.staked.pop()
-        self.unstaked.pop()
-        self.utilizations.pop()
+        # pop from buffers
+        self.popBuffers()
 
         if len(self.blockTimes) == 0:
             self.currentBlockTime = None # mean rounded
@@ -224,6 +332,83 @@ class Comptroller(object):
         self.updateBlockSize()
 
 
+    def popBuffers(self):
+        self.popFromWindow(self.blockTimesWindow, self.blockTimes, self.blockTimes.pop())
+        self.difficulties.pop()
+        self.popFromWindow(self.speedsWindow, self.speeds, self.speeds.pop())
+        self.popFromWindow(self.volumesWindow, self.volumes, self.volumes.pop())
+        self.staked.pop()
+        self.unstaked.pop()
+        self.rewards.pop()
+        self.popFromWindow(self.utilizationsWindow, self.utilizations, self.utilizations.pop())
+        for name in self.historyNames:
+            getattr(self, name + 'History').pop()
+
+    def recordState(self):
+        for name in self.historyNames:
+            getattr(self, name + 'History').append(getattr(self, name))
+
+
+    ## Reorgs
+
+    # Restores the state right after block blockNumber: pops the newer
+    # samples, restores the controllers from their stored per-block values
+    # and recomputes the window metrics once, independent of window size.
+    # Reorgs up to windowExtraBuffer blocks deep are supported.
+    def rollbackTo(self, blockNumber):
+        depth = self.blockNumber - blockNumber
+        if depth < 0:
+            raise ValueError('cannot roll forward to block ' + str(blockNumber))
+        if depth == 0:
+            return
+        # the window of the target block must still be in the buffers
+        remaining = len(self.blockTimes) - depth
+        if remaining < min(self.windowSize, blockNumber) or remaining < 0:
+            raise ValueError('cannot roll back ' + str(depth) + ' blocks, buffers hold ' + str(len(self.blockTimes)))
+        toGenesis = blockNumber == 0
+
+        for i in range(depth):
+            self.popBuffers()
+        self.blockNumber = blockNumber
+
+        if toGenesis:
+            initial = type(self)()
+            for name in self.historyNames + ['stakingRatio', 'currentBlockTime', 'currentSpeed', 'currentMaxSpeed',
+                                             'currentMinSpeed', 'currentSpeedRatio', 'velocity', 'meanBlockUtilization']:
+                setattr(self, name, getattr(initial, name))
+            return
+
+        for name in self.historyNames:
+            setattr(self, name, getattr(self, name + 'History')[-1])
+        self.stakingRatio = 100 * float(self.totalStaked) / (self.totalCirculating + self.totalStaked)
+        self.updateComplexMetrics()
+
+    # Switches to a fork: rolls back to the common ancestor block and adds
+    # the new blocks, given as dicts of addBlockSample arguments.
+    def applyFork(self, commonAncestor, newBlocks):
+        self.rollbackTo(commonAncestor)
+        newBlocks = list(newBlocks)
+        if not newBlocks:
+            return
+        names = ['blockTime', 'difficulty', 'volume', 'newStake', 'newUnstake', 'reward', 'txsCount']
+        columns = [[block[name] for block in newBlocks] for name in names]
+        self.addBlockSamples(*columns)
+
+
+    ## Snapshots, see Snapshot.py for the format.
+
+    def saveSnapshot(self, path):
+        Snapshot.saveObject(self, path)
+
+    # restores metrics, controllers and buffers without replaying the chain,
+    # rolling windows are rebuilt from the buffers.
+    @classmethod
+    def loadSnapshot(cls, path):
+        c = Snapshot.loadObject(cls, path)
+        c.rebuildWindows()
+        return c
+
+
     def updateBlockTimeActionable(self):
         if self.currentBlockTime > self.targetBlockTime:
             self.blockTimeFactor = self.blockTimeFactor * float(self.windowSize-1)/self.windowSize
@@ -232,9 +417,9 @@ class Comptroller(object):
         else: # ==
             pass   
         if self.blockTimeFactor < self.minBlockTimeFactor:
-            self.blockTimeFactor = self.minBlockTimeFactor
+            self.blockTimeFactor = float(self.minBlockTimeFactor)
         if self.blockTimeFactor > self.maxBlockTimeFactor:
-            self.blockTimeFactor = self.maxBlockTimeFactor
+            self.blockTimeFactor = float(self.maxBlockTimeFactor)
 
 
     def updateSpeedRatioTarget(self):
@@ -246,15 +431,15 @@ class Comptroller(object):
         else: # ==
             pass   
         if self.speedRatio < self.minSpeedRatio:
-            self.speedRatio = self.minSpeedRatio
+            self.speedRatio = float(self.minSpeedRatio)
         if self.speedRatio > self.maxSpeedRatio:
-            self.speedRatio = self.maxSpeedRatio
+            self.speedRatio = float(self.maxSpeedRatio)
 
     
     def updateIssuance(self):
         # early bird issuance
         if self.blockNumber < self.earlyBirdPeriod:
-            self.currentIssuance = self.maxIssuance
+            self.currentIssuance = float(self.maxIssuance)
         # circular economy convergence
         elif self.blockNumber >= self.circularBootstrapPeriod and \
             self.blockNumber < self.circularBootstrapPeriod + self.circularConvergencePeriod:
@@ -271,7 +456,7 @@ class Comptroller(object):
         if self.currentIssuance < self.minIssuance:
             self.currentIssuance = self.minIssuance   
         if self.currentIssuance > self.maxIssuance:
-            self.currentIssuance = self.maxIssuance 
+            self.currentIssuance = float(self.maxIssuance)
 
         # calculate individual block reward
         totalCoins = self.totalCirculating + self.totalStaked
@@ -321,15 +506,24 @@ class Comptroller(object):
         return noise
 
 
-    def slotByStakeWithNoise(self, coins, totalCoins, vrfSeed):
+    # number of slots slotByStakeWithNoise draws from.
+    def slotCount(self, coins, totalCoins):
         slots = math.ceil(float(totalCoins) / float(coins))
         if (slots > 2 ** 32 - 1):
             slots = 2 ** 32 - 1
+        return slots
+
+
+    def slotWithNoise(self, slots, vrfSeed):
         randomSlot = (vrfSeed % slots) + 1
         extraNoise = self.noise(vrfSeed)
         return float(randomSlot) + float(extraNoise)
 
 
+    def slotByStakeWithNoise(self, coins, totalCoins, vrfSeed):
+        return self.slotWithNoise(self.slotCount(coins, totalCoins), vrfSeed)
+
+
     def slotByStakeProtected(self, coins, totalCoins, vrfSeed):
         randomSlot = self.slotByStakeWithNoise(coins, totalCoins, vrfSeed)
         return self.currentSpeedRatio ** float(randomSlot)
@@ -343,6 +537,21 @@ class Comptroller(object):
         steps = int(math.floor(self.blockTimeFactor * float(slotProtected)))
         return steps + (steps%int(2))
 
+    # getConsensusDifficulty of a whole validator set in one pass, coinsArray
+    # and vrfSeeds hold one entry per validator. Returns a ConsensusDifficulties
+    # (difficulties, order from the lowest difficulty, winner).
+    # Slot counts are computed once per distinct stake.
+    def getConsensusDifficulties(self, coinsArray, totalCoins, vrfSeeds):
+        assert( len(coinsArray) == len(vrfSeeds) )
+        slotsByCoins = {}
+        exponents = []
+        for coins, vrfSeed in zip(coinsArray, vrfSeeds):
+            slots = slotsByCoins.get(coins)
+            if slots is None:
+                slots = slotsByCoins[coins] = self.slotCount(coins, totalCoins)
+            exponents.append(self.slotWithNoise(slots, vrfSeed))
+        return rankDifficulties(floatDifficulties(self.blockTimeFactor, self.currentSpeedRatio, exponents))
+
     def getConsensusBlockReward(self):
         return math.ceil(self.blockReward)
 
@@ -367,3 +576,28 @@ class Comptroller(object):
 
 
 
+
+
+if __name__ == '__main__':
+
+    # addBlockSamples against the addBlockSample loop, one week of blocks
+    import random
+    import time
+    rng = random.Random(1)
+    blocks = Comptroller.windowSize
+    columns = [[rng.randint(10, 70) for i in range(blocks)], [rng.randint(1000, 4000) for i in range(blocks)],
+               [rng.randint(0, 100) for i in range(blocks)], [0] * blocks, [rng.randint(0, 1) for i in range(blocks)],
+               [2] * blocks, [rng.randint(0, 500) for i in range(blocks)]]
+    loop = Comptroller()
+    start = time.perf_counter()
+    for sample in zip(*columns):
+        loop.addBlockSample(*sample)
+    loopTime = time.perf_counter() - start
+    batch = Comptroller()
+    start = time.perf_counter()
+    batch.addBlockSamples(*columns)
+    batchTime = time.perf_counter() - start
+    assert( batch.blockTimeFactor == loop.blockTimeFactor and batch.speedRatio == loop.speedRatio )
+    print('addBlockSample loop: ', format(loopTime, '.2f'), 'secs')
+    print('addBlockSamples:     ', format(batchTime, '.2f'), 'secs')
+    print('Speedup:             ', format(loopTime / batchTime, '.2f'))
@@ -1,7 +1,57 @@
 
-import statistics
 import math
 
+import Snapshot
+from ConsensusDifficulties import rankDifficulties, floatDifficulties
+
+
+# One block of the block time controller: blockTimeFactor after a block of
+# blockTime seconds, c holds the parameters (a comptroller). Shared by
+# addBlockSample and addBlockSamples, ControllerReplay has the NumPy form.
+def blockTimeFactorStep(c, blockTime, blockTimeFactor):
+    if blockTime > c.targetBlockTime:
+        blockTimeFactor = blockTimeFactor * float(c.windowSize-1)/c.windowSize
+    elif blockTime < c.targetBlockTime:
+        blockTimeFactor = blockTimeFactor * float(c.windowSize+1)/c.windowSize
+    if blockTimeFactor < c.minBlockTimeFactor:
+        blockTimeFactor = c.minBlockTimeFactor
+    if blockTimeFactor > c.maxBlockTimeFactor:
+        blockTimeFactor = c.maxBlockTimeFactor
+    return blockTimeFactor
+
+
+# One block of the VDF ratio controller: (movingMaxSpeed, movingMinSpeed,
+# speedRatio) after a block at currentSpeed.
+def speedRatioStep(c, currentSpeed, movingMaxSpeed, movingMinSpeed, speedRatio):
+    windowSize = c.windowSize
+    if currentSpeed > movingMaxSpeed and speedRatio < c.maxSpeedRatio: # increase max
+        movingMaxSpeed = movingMaxSpeed * (windowSize+1)/windowSize
+    if currentSpeed > movingMaxSpeed and speedRatio >= c.maxSpeedRatio: # increase max and increase min
+        movingMaxSpeed = movingMaxSpeed * (windowSize+1)/windowSize
+        movingMinSpeed = movingMinSpeed * (windowSize+1)/windowSize
+
+    if currentSpeed < movingMinSpeed and speedRatio < c.maxSpeedRatio: # decrease min
+        movingMinSpeed = movingMinSpeed * (windowSize-1)/windowSize
+    if currentSpeed < movingMinSpeed and speedRatio >= c.maxSpeedRatio: # decrease min and decrease max
+        movingMinSpeed = movingMinSpeed * (windowSize-1)/windowSize
+        movingMaxSpeed = movingMaxSpeed * (windowSize-1)/windowSize
+
+    if currentSpeed < movingMaxSpeed and currentSpeed > movingMinSpeed and speedRatio > c.minSpeedRatio:
+        # in the middle, decrease max and increase min.
+        movingMaxSpeed = movingMaxSpeed * (windowSize-1)/windowSize
+        movingMinSpeed = movingMinSpeed * (windowSize+1)/windowSize
+
+    # when they cross in the middle, this should not happen.
+    if movingMaxSpeed < movingMinSpeed:
+        # we swap them, adding the buffer of minimum ratio.
+        aux = movingMaxSpeed
+        movingMaxSpeed = movingMinSpeed * (1 + (c.minSpeedRatio/2))
+        movingMinSpeed = aux * (1 - (c.minSpeedRatio/2))
+        print('DEBUG: Unexpected Speed Cross!!!: self.movingMaxSpeed < self.movingMinSpeed')
+
+    return movingMaxSpeed, movingMinSpeed, movingMaxSpeed / movingMinSpeed
+
+
 class ComptrollerMinimal(object):
 
     # PARAMETERS
@@ -74,17 +124,53 @@ class ComptrollerMinimal(object):
         self.updateOrTestSpeedRatioTarget()
 
 
+    # Bulk replay of many blocks, same final state as calling addBlockSample
+    # for each block, the controller steps run over local variables.
+    # blockTimes, difficulties: columnar sequences (lists or NumPy arrays).
+    # trace: return per-block controller values as a dict of columns.
+    def addBlockSamples(self, blockTimes, difficulties, trace=False):
+        if hasattr(blockTimes, 'tolist'):
+            blockTimes = blockTimes.tolist()
+        if hasattr(difficulties, 'tolist'):
+            difficulties = difficulties.tolist()
+        assert( len(blockTimes) == len(difficulties) )
+        if len(blockTimes) == 0:
+            return {'blockTimeFactor': [], 'movingMaxSpeed': [], 'movingMinSpeed': [], 'speedRatio': []} if trace else None
+
+        blockTimeFactor = self.blockTimeFactor
+        movingMaxSpeed = self.movingMaxSpeed
+        movingMinSpeed = self.movingMinSpeed
+        speedRatio = self.speedRatio
+
+        if trace:
+            factors, maxSpeeds, minSpeeds, ratios = [], [], [], []
+
+        for blockTime, difficulty in zip(blockTimes, difficulties):
+            currentSpeed = difficulty / blockTime
+            blockTimeFactor = blockTimeFactorStep(self, blockTime, blockTimeFactor)
+            movingMaxSpeed, movingMinSpeed, speedRatio = speedRatioStep(self, currentSpeed, movingMaxSpeed, movingMinSpeed, speedRatio)
+
+            if trace:
+                factors.append(blockTimeFactor)
+                maxSpeeds.append(movingMaxSpeed)
+                minSpeeds.append(movingMinSpeed)
+                ratios.append(speedRatio)
+
+        self.blockNumber += len(blockTimes)
+        self.currentBlockTime = blockTimes[-1]
+        self.difficulty = difficulties[-1]
+        self.currentSpeed = currentSpeed
+        self.blockTimeFactor = blockTimeFactor
+        self.movingMaxSpeed = movingMaxSpeed
+        self.movingMinSpeed = movingMinSpeed
+        self.speedRatio = speedRatio
+
+        if trace:
+            return {'blockTimeFactor': factors, 'movingMaxSpeed': maxSpeeds, 'movingMinSpeed': minSpeeds, 'speedRatio': ratios}
+
+
     def updateOrTestBlockTimeActionable(self, newBlockTimeFactor=None):
-        if self.currentBlockTime > self.targetBlockTime:
-            validBlockTimeFactor = self.blockTimeFactor * float(self.windowSize-1)/self.windowSize
-        elif self.currentBlockTime < self.targetBlockTime:
-            validBlockTimeFactor = self.blockTimeFactor * float(self.windowSize+1)/self.windowSize
-        else: # ==
-            validBlockTimeFactor = self.blockTimeFactor  
-        if validBlockTimeFactor < self.minBlockTimeFactor:
-            validBlockTimeFactor = self.minBlockTimeFactor
-        if validBlockTimeFactor > self.maxBlockTimeFactor:
-            validBlockTimeFactor = self.maxBlockTimeFactor
+        validBlockTimeFactor = blockTimeFactorStep(self, self.currentBlockTime, self.blockTimeFactor)
         # test or update
         if newBlockTimeFactor:
             return newBlockTimeFactor == validBlockTimeFactor
@@ -93,47 +179,24 @@ class ComptrollerMinimal(object):
 
     # to use testing func, all parameters must be included.
     def updateOrTestSpeedRatioTarget(self, newMovingMaxSpeed=None, newMovingMinSpeed=None, newSpeedRatio=None):
-        #backup
-        backupMovingMaxSpeed = self.movingMaxSpeed
-        backupMovingMinSpeed = self.movingMinSpeed
-        backupSpeedRatio = self.speedRatio
-
-        if self.currentSpeed > self.movingMaxSpeed and self.speedRatio < self.maxSpeedRatio: # increase max
-            self.movingMaxSpeed = self.movingMaxSpeed * (self.windowSize+1)/self.windowSize
-        if self.currentSpeed > self.movingMaxSpeed and self.speedRatio >= self.maxSpeedRatio: # increase max and increase min
-            self.movingMaxSpeed = self.movingMaxSpeed * (self.windowSize+1)/self.windowSize
-            self.movingMinSpeed = self.movingMinSpeed * (self.windowSize+1)/self.windowSize
-        
-        if self.currentSpeed < self.movingMinSpeed and self.speedRatio < self.maxSpeedRatio: # decrease min
-            self.movingMinSpeed = self.movingMinSpeed * (self.windowSize-1)/self.windowSize
-        if self.currentSpeed < self.movingMinSpeed and self.speedRatio >= self.maxSpeedRatio: # decrease min and decrease max
-            self.movingMinSpeed = self.movingMinSpeed * (self.windowSize-1)/self.windowSize
-            self.movingMaxSpeed = self.movingMaxSpeed * (self.windowSize-1)/self.windowSize
+        valid = speedRatioStep(self, self.currentSpeed, self.movingMaxSpeed, self.movingMinSpeed, self.speedRatio)
+        testing = newMovingMaxSpeed and newMovingMinSpeed and newSpeedRatio
+        if testing and valid != (newMovingMaxSpeed, newMovingMinSpeed, newSpeedRatio):
+            return False # state unchanged
+        self.movingMaxSpeed, self.movingMinSpeed, self.speedRatio = valid
+        if testing:
+            return True
         
-        if self.currentSpeed < self.movingMaxSpeed and self.currentSpeed > self.movingMinSpeed and self.speedRatio > self.minSpeedRatio:            
-            # in the middle, decrease max and increase min.
-            self.movingMaxSpeed = self.movingMaxSpeed * (self.windowSize-1)/self.windowSize
-            self.movingMinSpeed = self.movingMinSpeed * (self.windowSize+1)/self.windowSize
-
-        # when they cross in the middle, this should not happen.
-        if self.movingMaxSpeed < self.movingMinSpeed:
-            # we swap them, adding the buffer of minimum ratio.
-            aux = self.movingMaxSpeed
-            self.movingMaxSpeed = self.movingMinSpeed * (1 + (self.minSpeedRatio/2))
-            self.movingMinSpeed = aux * (1 - (self.minSpeedRatio/2))
-            print('DEBUG: Unexpected Speed Cross!!!: self.movingMaxSpeed < self.movingMinSpeed')
 
-        self.speedRatio = self.movingMaxSpeed / self.movingMinSpeed
+    ## Snapshots, see Snapshot.py for the format.
+
+    def saveSnapshot(self, path):
+        Snapshot.saveObject(self, path)
+
+    @classmethod
+    def loadSnapshot(cls, path):
+        return Snapshot.loadObject(cls, path)
 
-        if newMovingMaxSpeed and newMovingMinSpeed and newSpeedRatio:
-            if self.movingMaxSpeed==newMovingMaxSpeed and self.movingMinSpeed==newMovingMinSpeed and self.speedRatio==newSpeedRatio:
-                return True
-            else: # revert with backups, and return False
-                self.movingMaxSpeed = backupMovingMaxSpeed
-                self.movingMinSpeed = backupMovingMinSpeed
-                self.speedRatio = backupSpeedRatio
-                return False
-        
 
     ## VDF Difficulty calculations
 
@@ -157,20 +220,34 @@ class ComptrollerMinimal(object):
         return noise
 
 
-    def slotByStakeWithNoise(self, coins, totalCoins, vrfSeed):
+    # number of slots slotByStakeWithNoise draws from.
+    def slotCount(self, coins, totalCoins):
         slots = math.ceil(float(totalCoins) / float(coins))
         if (slots > 2 ** 32 - 1):
             slots = 2 ** 32 - 1
+        return slots
+
+
+    def slotWithNoise(self, slots, vrfSeed):
         randomSlot = (vrfSeed % slots)
         extraNoise = self.noise(vrfSeed)
         return float(randomSlot) + float(extraNoise)
 
 
-    def slotByStakeProtected(self, coins, totalCoins, vrfSeed):
-        randomSlot = self.slotByStakeWithNoise(coins, totalCoins, vrfSeed)
+    def slotByStakeWithNoise(self, coins, totalCoins, vrfSeed):
+        return self.slotWithNoise(self.slotCount(coins, totalCoins), vrfSeed)
+
+
+    # exponent of speedRatio in the difficulty, capped at 64.
+    def protectedExponent(self, randomSlot):
         if randomSlot >= 64:
             randomSlot = 64
-        return self.speedRatio ** float(randomSlot)
+        return float(randomSlot)
+
+
+    def slotByStakeProtected(self, coins, totalCoins, vrfSeed):
+        randomSlot = self.slotByStakeWithNoise(coins, totalCoins, vrfSeed)
+        return self.speedRatio ** self.protectedExponent(randomSlot)
 
     ## Parameters used in next block consensus.
 
@@ -180,6 +257,21 @@ class ComptrollerMinimal(object):
         steps = int(math.floor(self.blockTimeFactor * float(slotProtected)))
         return steps + (steps%int(2))
 
+    # getConsensusDifficulty of a whole validator set in one pass, coinsArray
+    # and vrfSeeds hold one entry per validator. Returns a ConsensusDifficulties
+    # (difficulties, order from the lowest difficulty, winner).
+    # Slot counts are computed once per distinct stake.
+    def getConsensusDifficulties(self, coinsArray, totalCoins, vrfSeeds):
+        assert( len(coinsArray) == len(vrfSeeds) )
+        slotsByCoins = {}
+        exponents = []
+        for coins, vrfSeed in zip(coinsArray, vrfSeeds):
+            slots = slotsByCoins.get(coins)
+            if slots is None:
+                slots = slotsByCoins[coins] = self.slotCount(coins, totalCoins)
+            exponents.append(self.protectedExponent(self.slotWithNoise(slots, vrfSeed)))
+        return rankDifficulties(floatDifficulties(self.blockTimeFactor, self.speedRatio, exponents))
+
     def getConsensusBlockReward(self):
         return self.blockReward # static 10 coins
 
@@ -1,6 +1,12 @@
 
-import statistics
+import copy
 import math
+from collections import deque
+from functools import lru_cache
+
+import Snapshot
+from RingBuffer import RingBuffer
+from ConsensusDifficulties import rankDifficulties, floatDifficulties
 
 UNIT = 10**12
 
@@ -20,6 +26,178 @@ def trunc(x):
     return x // UNIT
 
 
+# Integer fixed-point exp/log/pow, no floats: the same results on every
+# platform. Computed with GUARD extra digits and truncated once to UNIT.
+
+GUARD = 10**8
+SCALE = UNIT * GUARD
+MAX_TABLE_EXPONENT = 64 # slots are capped at 64
+FRACTION_STEPS = 1000 # FRACTION_STEPS**2 divides UNIT
+COARSE_STEP = UNIT // FRACTION_STEPS
+FINE_STEP = UNIT // FRACTION_STEPS**2
+FRACTION_BITS = 80 # binary fixed-point of the fraction tables, shifts instead of divisions
+
+
+# e**x, x and the result fixed-point by scale.
+def expScaled(x, scale):
+    if x < 0:
+        return scale * scale // expScaled(-x, scale)
+    # halve x until it is below 1 so the series converges fast, then square back
+    halvings = 0
+    while x > scale:
+        x //= 2
+        halvings += 1
+    total = scale
+    term = scale
+    k = 1
+    while term:
+        term = term * x // (scale * k)
+        total += term
+        k += 1
+    for i in range(halvings):
+        total = total * total // scale
+    return total
+
+
+# ln(x), x > 0 and the result fixed-point by scale.
+def logScaled(x, scale):
+    assert( x > 0 )
+    # x = y * 2**k with y in [1, 2), ln(y) = 2 atanh((y - 1) / (y + 1))
+    k = 0
+    while x >= 2 * scale:
+        x //= 2
+        k += 1
+    while x < scale:
+        x *= 2
+        k -= 1
+    z = (x - scale) * scale // (x + scale)
+    z2 = z * z // scale
+    total = 0
+    term = z
+    n = 1
+    while term:
+        total += term // n
+        term = term * z2 // scale
+        n += 2
+    return 2 * total + k * ln2Scaled(scale)
+
+
+@lru_cache(maxsize=None)
+def ln2Scaled(scale):
+    # ln(2) = 2 atanh(1/3)
+    total = 0
+    term = scale // 3
+    n = 1
+    while term:
+        total += term // n
+        term //= 9
+        n += 2
+    return 2 * total
+
+
+def expFixed(x):
+    return expScaled(x * GUARD, SCALE) // GUARD
+
+
+def logFixed(x):
+    return logScaled(x * GUARD, SCALE) // GUARD
+
+
+# Tables of base (fixed-point by UNIT) for powFixed, cached per base:
+#   integerPowers[n] = base**n for n = 0..MAX_TABLE_EXPONENT, by UNIT,
+#                      truncated from the exact value
+#   coarsePowers[j] = base**(j / FRACTION_STEPS), by 2**FRACTION_BITS
+#   finePowers[j] = base**(j / FRACTION_STEPS**2), by 2**FRACTION_BITS
+#   logBase = ln(base) / UNIT, by 2**FRACTION_BITS
+@lru_cache(maxsize=64)
+def powTables(base):
+    one = 1 << FRACTION_BITS
+    integerPowers = [base**n // UNIT**(n-1) if n else UNIT for n in range(MAX_TABLE_EXPONENT + 1)]
+    logBase = logScaled((base << FRACTION_BITS) // UNIT, one)
+    coarsePowers = geometricScaled(expScaled(logBase // FRACTION_STEPS, one), FRACTION_STEPS)
+    finePowers = geometricScaled(expScaled(logBase // FRACTION_STEPS**2, one), FRACTION_STEPS)
+    return integerPowers, coarsePowers, finePowers, logBase // UNIT
+
+
+# [1, ratio, ratio**2, ...] (count items) by 2**FRACTION_BITS, errors stay
+# far below UNIT.
+def geometricScaled(ratio, count):
+    powers = [1 << FRACTION_BITS]
+    for i in range(count - 1):
+        powers.append(powers[-1] * ratio >> FRACTION_BITS)
+    return powers
+
+
+# base**(f / UNIT) for 0 <= f < UNIT, fixed-point by 2**(3*FRACTION_BITS)
+# (not yet truncated), tables = powTables(base). Table lookups for the first
+# six decimals of f, the rest r < 10**-6 adds e**x = 1 + x + x**2/2 with
+# x = r ln(base), the dropped x**3/6 is below 10**-18.
+def fractionPower(tables, f):
+    integerPowers, coarsePowers, finePowers, logBase = tables
+    j, f = divmod(f, COARSE_STEP)
+    k, r = divmod(f, FINE_STEP)
+    x = r * logBase
+    return coarsePowers[j] * finePowers[k] * ((1 << FRACTION_BITS) + x + (x * x >> (FRACTION_BITS + 1)))
+
+
+# base**exponent, both fixed-point by UNIT, base > 0 and exponent >= 0.
+def powFixed(base, exponent):
+    assert( exponent >= 0 )
+    tables = powTables(base)
+    n, f = divmod(exponent, UNIT)
+    integerPart = tables[0][n] if n <= MAX_TABLE_EXPONENT else base**n // UNIT**(n-1)
+    if f == 0:
+        return integerPart
+    return integerPart * fractionPower(tables, f) >> 3 * FRACTION_BITS
+
+
+# One block of the block time controller: blockTimeFactor after a block of
+# blockTime (by UNIT), c holds the parameters (a comptroller). Shared by
+# addBlockSample and addBlockSamples.
+def blockTimeFactorStep(c, blockTime, blockTimeFactor):
+    if blockTime > c.targetBlockTime:
+        blockTimeFactor = div(mul(blockTimeFactor, c.windowSize-1), c.windowSize)
+    elif blockTime < c.targetBlockTime:
+        blockTimeFactor = div(mul(blockTimeFactor, c.windowSize+1), c.windowSize)
+    if blockTimeFactor < c.minBlockTimeFactor:
+        blockTimeFactor = c.minBlockTimeFactor
+    if blockTimeFactor > c.maxBlockTimeFactor:
+        blockTimeFactor = c.maxBlockTimeFactor
+    return blockTimeFactor
+
+
+# One block of the VDF ratio controller: (movingMaxSpeed, movingMinSpeed,
+# speedRatio) after a block at currentSpeed, all by UNIT.
+def speedRatioStep(c, currentSpeed, movingMaxSpeed, movingMinSpeed, speedRatio):
+    windowSize = c.windowSize
+    if currentSpeed > movingMaxSpeed and speedRatio < c.maxSpeedRatio: # increase max
+        movingMaxSpeed = div(mul(movingMaxSpeed, windowSize+1), windowSize)
+    if currentSpeed > movingMaxSpeed and speedRatio >= c.maxSpeedRatio: # increase max and increase min
+        movingMaxSpeed = div(mul(movingMaxSpeed, windowSize+1), windowSize)
+        movingMinSpeed = div(mul(movingMinSpeed, windowSize+1), windowSize)
+
+    if currentSpeed < movingMinSpeed and speedRatio < c.maxSpeedRatio: # decrease min
+        movingMinSpeed = div(mul(movingMinSpeed, windowSize-1), windowSize)
+    if currentSpeed < movingMinSpeed and speedRatio >= c.maxSpeedRatio: # decrease min and decrease max
+        movingMinSpeed = div(mul(movingMinSpeed, windowSize-1), windowSize)
+        movingMaxSpeed = div(mul(movingMaxSpeed, windowSize-1), windowSize)
+
+    if currentSpeed < movingMaxSpeed and currentSpeed > movingMinSpeed and speedRatio > c.minSpeedRatio:
+        # in the middle, decrease max and increase min.
+        movingMinSpeed = div(mul(movingMinSpeed, windowSize+1), windowSize)
+        movingMaxSpeed = div(mul(movingMaxSpeed, windowSize-1), windowSize)
+
+    # when they cross in the middle, this should not happen.
+    if movingMaxSpeed < movingMinSpeed:
+        # we swap them, adding the buffer of minimum ratio.
+        aux = movingMaxSpeed
+        movingMaxSpeed = mulTrunc(movingMinSpeed, (UNIT + div(c.minSpeedRatio,2)))
+        movingMinSpeed = mulTrunc(aux, (UNIT + div(c.minSpeedRatio,2)))
+        print('DEBUG: Unexpected Speed Cross!!!: self.movingMaxSpeed < self.movingMinSpeed')
+
+    return movingMaxSpeed, movingMinSpeed, divTrunc(movingMaxSpeed, movingMinSpeed)
+
+
 class ComptrollerMinimalBigInt(object):
 
     # PARAMETERS
@@ -51,6 +229,11 @@ class ComptrollerMinimalBigInt(object):
 
     noiseFractionSlots = 10 * (UNIT//10**2) # 0.10 * UNIT
 
+    # getConsensusDifficulty with the integer fixed-point path instead of
+    # the floating point sections (results may differ in the last digits).
+    # Off by default: the floating point sections match the TS/JS reference.
+    fixedPointDifficulty = False
+
     def __init__(self):
 
         ## Variables, going to be dynamically adjusted
@@ -75,11 +258,20 @@ class ComptrollerMinimalBigInt(object):
         self.blockTimeFactor = self.initialBlockTimeFactor
         self.speedRatio = divTrunc(self.movingMaxSpeed, self.movingMinSpeed)
         self.blockReward = self.initialBlockReward
+        self.difficulty = None
+
+        # (blockTimeFactor, speedRatio, slot difficulties, powTables), see slotDifficultyTable.
+        self.difficultyTable = None
+
+        # undo journal for reorgs, state before each of the last windowExtraBuffer blocks.
+        self.journal = deque(maxlen=self.windowExtraBuffer)
 
     # blocktime: integer, no fixed-point
     # difficulty: integer no fixed-point
     def addBlockSample(self, blockTime, difficulty):
 
+        self.journal.append(self.journalState())
+
         # update basic metrics
         self.blockNumber += 1
 
@@ -95,17 +287,108 @@ class ComptrollerMinimalBigInt(object):
         self.updateOrTestSpeedRatioTarget()
         
 
+    # Bulk replay of many blocks, same final state as calling addBlockSample
+    # for each block, the controller steps run over local variables.
+    # blockTimes, difficulties: columnar integer sequences (lists or NumPy arrays).
+    # trace: return per-block controller values as a dict of columns.
+    def addBlockSamples(self, blockTimes, difficulties, trace=False):
+        if hasattr(blockTimes, 'tolist'):
+            blockTimes = blockTimes.tolist()
+        if hasattr(difficulties, 'tolist'):
+            difficulties = difficulties.tolist()
+        assert( len(blockTimes) == len(difficulties) )
+        if len(blockTimes) == 0:
+            return {'blockTimeFactor': [], 'movingMaxSpeed': [], 'movingMinSpeed': [], 'speedRatio': []} if trace else None
+
+        blockTimeFactor = self.blockTimeFactor
+        movingMaxSpeed = self.movingMaxSpeed
+        movingMinSpeed = self.movingMinSpeed
+        speedRatio = self.speedRatio
+
+        if trace:
+            factors, maxSpeeds, minSpeeds, ratios = [], [], [], []
+
+        # only the last blocks fit in the journal
+        journal = self.journal
+        journalFrom = len(blockTimes) - journal.maxlen
+        blockNumber = self.blockNumber
+        currentBlockTime = self.currentBlockTime
+        currentSpeed = self.currentSpeed
+
+        for i, (blockTime, difficulty) in enumerate(zip(blockTimes, difficulties)):
+            if i >= journalFrom:
+                lastDifficulty = difficulties[i-1] * UNIT if i > 0 else self.difficulty
+                journal.append((blockNumber + i, currentBlockTime, lastDifficulty, currentSpeed,
+                                blockTimeFactor, movingMaxSpeed, movingMinSpeed, speedRatio))
+            currentBlockTime = blockTime * UNIT
+            currentSpeed = divTrunc(difficulty * UNIT, currentBlockTime)
+            blockTimeFactor = blockTimeFactorStep(self, currentBlockTime, blockTimeFactor)
+            movingMaxSpeed, movingMinSpeed, speedRatio = speedRatioStep(self, currentSpeed, movingMaxSpeed, movingMinSpeed, speedRatio)
+
+            if trace:
+                factors.append(blockTimeFactor)
+                maxSpeeds.append(movingMaxSpeed)
+                minSpeeds.append(movingMinSpeed)
+                ratios.append(speedRatio)
+
+        self.blockNumber += len(blockTimes)
+        self.currentBlockTime = currentBlockTime
+        self.difficulty = difficulties[-1] * UNIT
+        self.currentSpeed = currentSpeed
+        self.blockTimeFactor = blockTimeFactor
+        self.movingMaxSpeed = movingMaxSpeed
+        self.movingMinSpeed = movingMinSpeed
+        self.speedRatio = speedRatio
+
+        if trace:
+            return {'blockTimeFactor': factors, 'movingMaxSpeed': maxSpeeds, 'movingMinSpeed': minSpeeds, 'speedRatio': ratios}
+
+
+    ## Reorgs
+
+    # fields of journalState, in order.
+    journalNames = ['blockNumber', 'currentBlockTime', 'difficulty', 'currentSpeed',
+                    'blockTimeFactor', 'movingMaxSpeed', 'movingMinSpeed', 'speedRatio']
+
+    def journalState(self):
+        return (self.blockNumber, self.currentBlockTime, self.difficulty, self.currentSpeed,
+                self.blockTimeFactor, self.movingMaxSpeed, self.movingMinSpeed, self.speedRatio)
+
+    def restoreState(self, state):
+        (self.blockNumber, self.currentBlockTime, self.difficulty, self.currentSpeed,
+         self.blockTimeFactor, self.movingMaxSpeed, self.movingMinSpeed, self.speedRatio) = state
+
+    # restores the state before the last block, no re-computation.
+    def dropLastBlockSample(self):
+        if self.blockNumber == 0: # do nothing if already empty.
+            return
+        if not self.journal:
+            raise ValueError('cannot drop block ' + str(self.blockNumber) + ', undo journal exhausted')
+        self.restoreState(self.journal.pop())
+
+    # restores the state right after block blockNumber, O(depth).
+    def rollbackTo(self, blockNumber):
+        depth = self.blockNumber - blockNumber
+        if depth < 0:
+            raise ValueError('cannot roll forward to block ' + str(blockNumber))
+        if depth > len(self.journal):
+            raise ValueError('cannot roll back ' + str(depth) + ' blocks, undo journal holds ' + str(len(self.journal)))
+        if depth == 0:
+            return
+        for i in range(depth - 1):
+            self.journal.pop()
+        self.restoreState(self.journal.pop())
+
+    # independent copy for simulating forks from a shared state, no
+    # snapshot file: the journal holds immutable tuples, O(journal).
+    def clone(self):
+        other = copy.copy(self)
+        other.journal = deque(self.journal, maxlen=self.journal.maxlen)
+        return other
+
+
     def updateOrTestBlockTimeActionable(self, newBlockTimeFactor=None):
-        if self.currentBlockTime > self.targetBlockTime:
-            validBlockTimeFactor = div(mul(self.blockTimeFactor, self.windowSize-1), self.windowSize)
-        elif self.currentBlockTime < self.targetBlockTime:
-            validBlockTimeFactor = div(mul(self.blockTimeFactor, self.windowSize+1), self.windowSize)
-        else: # ==
-            validBlockTimeFactor = self.blockTimeFactor  
-        if validBlockTimeFactor < self.minBlockTimeFactor:
-            validBlockTimeFactor = self.minBlockTimeFactor
-        if validBlockTimeFactor > self.maxBlockTimeFactor:
-            validBlockTimeFactor = self.maxBlockTimeFactor
+        validBlockTimeFactor = blockTimeFactorStep(self, self.currentBlockTime, self.blockTimeFactor)
         # test or update
         if newBlockTimeFactor:
             return newBlockTimeFactor == validBlockTimeFactor
@@ -114,48 +397,36 @@ class ComptrollerMinimalBigInt(object):
 
     # to use testing func, all parameters must be included.
     def updateOrTestSpeedRatioTarget(self, newMovingMaxSpeed=None, newMovingMinSpeed=None, newSpeedRatio=None):
-        #backup
-        backupMovingMaxSpeed = self.movingMaxSpeed
-        backupMovingMinSpeed = self.movingMinSpeed
-        backupSpeedRatio = self.speedRatio
+        valid = speedRatioStep(self, self.currentSpeed, self.movingMaxSpeed, self.movingMinSpeed, self.speedRatio)
+        testing = newMovingMaxSpeed and newMovingMinSpeed and newSpeedRatio
+        if testing and valid != (newMovingMaxSpeed, newMovingMinSpeed, newSpeedRatio):
+            return False # state unchanged
+        self.movingMaxSpeed, self.movingMinSpeed, self.speedRatio = valid
+        if testing:
+            return True
+        
 
-        if self.currentSpeed > self.movingMaxSpeed and self.speedRatio < self.maxSpeedRatio: # increase max
-            self.movingMaxSpeed = div(mul(self.movingMaxSpeed, self.windowSize+1), self.windowSize)
+    ## Snapshots, see Snapshot.py for the format.
 
-        if self.currentSpeed > self.movingMaxSpeed and self.speedRatio >= self.maxSpeedRatio: # increase max and increase min
-            self.movingMaxSpeed = div(mul(self.movingMaxSpeed, self.windowSize+1), self.windowSize)
-            self.movingMinSpeed = div(mul(self.movingMinSpeed, self.windowSize+1), self.windowSize)
-        
-        if self.currentSpeed < self.movingMinSpeed and self.speedRatio < self.maxSpeedRatio: # decrease min
-            self.movingMinSpeed = div(mul(self.movingMinSpeed, self.windowSize-1), self.windowSize)
-        if self.currentSpeed < self.movingMinSpeed and self.speedRatio >= self.maxSpeedRatio: # decrease min and decrease max
-            self.movingMinSpeed = div(mul(self.movingMinSpeed, self.windowSize-1), self.windowSize)
-            self.movingMaxSpeed = div(mul(self.movingMaxSpeed, self.windowSize-1), self.windowSize)
-        
-        if self.currentSpeed < self.movingMaxSpeed and self.currentSpeed > self.movingMinSpeed and self.speedRatio > self.minSpeedRatio:            
-            # in the middle, decrease max and increase min.
-            self.movingMinSpeed = div(mul(self.movingMinSpeed, self.windowSize+1), self.windowSize)
-            self.movingMaxSpeed = div(mul(self.movingMaxSpeed, self.windowSize-1), self.windowSize)
-
-        # when they cross in the middle, this should not happen.
-        if self.movingMaxSpeed < self.movingMinSpeed:
-            # we swap them, adding the buffer of minimum ratio.
-            aux = self.movingMaxSpeed
-            self.movingMaxSpeed = mulTrunc(self.movingMinSpeed, (UNIT + div(self.minSpeedRatio,2)))
-            self.movingMinSpeed = mulTrunc(aux, (UNIT + div(self.minSpeedRatio,2)))
-            print('DEBUG: Unexpected Speed Cross!!!: self.movingMaxSpeed < self.movingMinSpeed')
+    # the undo journal goes with the state, one <name>Journal buffer per
+    # field of journalState, so rollbackTo keeps working after a load.
+    def saveSnapshot(self, path):
+        scalars, buffers = Snapshot.snapshotState(self)
+        for name in self.journalNames:
+            buffers[name + 'Journal'] = RingBuffer(self.journal.maxlen, 'q', True)
+        for state in self.journal:
+            for name, value in zip(self.journalNames, state):
+                buffers[name + 'Journal'].append(value)
+        Snapshot.writeSnapshot(path, type(self).__name__, scalars, buffers)
 
-        self.speedRatio = divTrunc(self.movingMaxSpeed, self.movingMinSpeed)
+    @classmethod
+    def loadSnapshot(cls, path):
+        kind, scalars, buffers = Snapshot.readSnapshot(path)
+        columns = [buffers.pop(name + 'Journal', None) for name in cls.journalNames]
+        c = Snapshot.restoreObject(cls, kind, scalars, buffers) # checks the kind
+        c.journal.extend(zip(*[column.tolist() for column in columns])) # keeps the newest windowExtraBuffer
+        return c
 
-        if newMovingMaxSpeed and newMovingMinSpeed and newSpeedRatio:
-            if self.movingMaxSpeed==newMovingMaxSpeed and self.movingMinSpeed==newMovingMinSpeed and self.speedRatio==newSpeedRatio:
-                return True
-            else: # revert with backups, and return False
-                self.movingMaxSpeed = backupMovingMaxSpeed
-                self.movingMinSpeed = backupMovingMinSpeed
-                self.speedRatio = backupSpeedRatio
-                return False
-        
 
     ## VDF Difficulty calculations
 
@@ -164,6 +435,12 @@ class ComptrollerMinimalBigInt(object):
     # totalCoin: fixed-point by UNIT
     # vrfSeed: integer of 256 bits comming from a hash.
     def slotByStake(self, coins, totalCoins, vrfSeed): 
+        randomSlot = (vrfSeed % self.slotCount(coins, totalCoins))
+        return randomSlot
+
+    # number of slots slotByStake draws from, fixed for a stake until the
+    # bootstrap period ends.
+    def slotCount(self, coins, totalCoins):
         if self.blockNumber < self.bootstrapPeriod:
             totalCoins += self.bootstrapVirtualStake
         slots = divTrunc(totalCoins, coins) # math.ceil(float(totalCoins) / float(coins))
@@ -172,8 +449,7 @@ class ComptrollerMinimalBigInt(object):
         slots = trunc(slots)
         if (slots > 2 ** 32 - 1): # this will be highly unusual, usually slots is small.
             slots = 2 ** 32 - 1
-        randomSlot = (vrfSeed % slots)
-        return randomSlot
+        return slots
 
     # FLOATING POINT RETURN VALUE
     # warning: this functions returns a floating-point
@@ -190,20 +466,31 @@ class ComptrollerMinimalBigInt(object):
 
     # FLOATING POINT RETURN VALUE
     # warning: this functions returns a floating-point
-    def slotByStakeWithNoise(self, coins, totalCoins, vrfSeed):
-        if self.blockNumber < self.bootstrapPeriod:
-            totalCoins += self.bootstrapVirtualStake
-        slots = divTrunc(totalCoins, coins) # math.ceil(float(totalCoins) / float(coins))
-        if mulTrunc(slots, coins) < totalCoins:
-            slots += UNIT
-        slots = trunc(slots)
-        if (slots >= 2 ** 32 - 1): # this will be highly unusual, usually slots is small.
-            slots = 2 ** 32 - 1
+    # random slot plus noise out of slots slots (see slotCount).
+    def slotWithNoise(self, slots, vrfSeed):
         randomSlot = (vrfSeed % slots)
         extraNoise = self.noise(vrfSeed)
         return randomSlot * self.UNIT + extraNoise
 
 
+    # FLOATING POINT RETURN VALUE
+    # warning: this functions returns a floating-point
+    def slotByStakeWithNoise(self, coins, totalCoins, vrfSeed):
+        return self.slotWithNoise(self.slotCount(coins, totalCoins), vrfSeed)
+
+
+    # FLOATING POINT RETURN VALUE
+    # warning: this functions returns a floating-point
+    # exponent of speedRatio in the difficulty, capped at 64.
+    def protectedExponent(self, randomSlot):
+        # BEGIN FLOATING POINT SECTION #2
+        randomSlot = float(randomSlot) / self.UNIT # not truncate with // , is float division with /
+        if randomSlot >= 64.0:
+            randomSlot = 64.0
+        return randomSlot
+        # END FLOATING POINT SECTION #2
+
+
     # FLOATING POINT RETURN VALUE
     # warning: this functions returns a floating-point
     # vrfSeed is a bigint representing the signature of the current block number
@@ -212,17 +499,64 @@ class ComptrollerMinimalBigInt(object):
     # vrfSeed: integer of 256 bits comming from a hash.
     def slotByStakeProtected(self, coins, totalCoins, vrfSeed):
         randomSlot = self.slotByStakeWithNoise(coins, totalCoins, vrfSeed)
-        # BEGIN FLOATING POINT SECTION #2
-        randomSlot = float(randomSlot) / self.UNIT # not truncate with // , is float division with /
-        if randomSlot >= 64.0:
-            randomSlot = 64.0
-        return (float(self.speedRatio)/UNIT) ** float(randomSlot)
-        # END FLOATING POINT SECTION #2
+        return (float(self.speedRatio)/UNIT) ** self.protectedExponent(randomSlot)
+
+    ## Integer fixed-point versions of the floating point sections.
+
+    def noiseFixed(self, vrfSeed):
+        noise = (vrfSeed % 2**256) * self.UNIT >> 256
+        return mulTrunc(noise, self.noiseFractionSlots)
+
+    def slotWithNoiseFixed(self, slots, vrfSeed):
+        return (vrfSeed % slots) * UNIT + self.noiseFixed(vrfSeed)
+
+    def slotByStakeWithNoiseFixed(self, coins, totalCoins, vrfSeed):
+        return self.slotWithNoiseFixed(self.slotCount(coins, totalCoins), vrfSeed)
+
+    # speedRatio ** slot, fixed-point by UNIT.
+    def slotByStakeProtectedFixed(self, coins, totalCoins, vrfSeed):
+        randomSlot = self.slotByStakeWithNoiseFixed(coins, totalCoins, vrfSeed)
+        if randomSlot >= MAX_TABLE_EXPONENT * UNIT:
+            randomSlot = MAX_TABLE_EXPONENT * UNIT
+        return powFixed(self.speedRatio, randomSlot)
+
+    # blockTimeFactor * speedRatio**n (by UNIT**2) for every integer slot n,
+    # and the powTables of speedRatio. Built on the first difficulty of a
+    # block (getConsensusDifficulty and getConsensusDifficulties, with
+    # fixedPointDifficulty) and rebuilt whenever either parameter
+    # changed (new blocks, rollbacks, snapshots), so each candidate miner
+    # costs a table lookup plus the noise term.
+    def slotDifficultyTable(self):
+        table = self.difficultyTable
+        if table is None or table[0] != self.blockTimeFactor or table[1] != self.speedRatio:
+            tables = powTables(self.speedRatio)
+            slotDifficulties = [self.blockTimeFactor * power for power in tables[0]]
+            table = self.difficultyTable = (self.blockTimeFactor, self.speedRatio, slotDifficulties, tables)
+        return table
+
+    # even difficulty of slot randomSlot (slot plus noise, by UNIT) from a
+    # slotDifficultyTable.
+    def slotDifficultyFixed(self, randomSlot, table):
+        n, f = divmod(randomSlot, UNIT)
+        if n >= MAX_TABLE_EXPONENT:
+            n, f = MAX_TABLE_EXPONENT, 0
+        blockTimeFactor, speedRatio, slotDifficulties, tables = table
+        if f == 0:
+            steps = slotDifficulties[n] // (UNIT * UNIT)
+        else:
+            steps = (slotDifficulties[n] * fractionPower(tables, f) >> 3 * FRACTION_BITS) // (UNIT * UNIT)
+        return steps + (steps%int(2)) # even integer difficulty values only (odd can break VDF).
+
+    def getConsensusDifficultyFixed(self, coins, totalCoins, vrfSeed):
+        randomSlot = self.slotByStakeWithNoiseFixed(coins, totalCoins, vrfSeed)
+        return self.slotDifficultyFixed(randomSlot, self.slotDifficultyTable())
 
     ## Parameters used in next block consensus.
 
     # VRFSEED is based on miner address and was prev hashed with the blockNumber.
     def getConsensusDifficulty(self, coins, totalCoins, vrfSeed):
+        if self.fixedPointDifficulty:
+            return self.getConsensusDifficultyFixed(coins, totalCoins, vrfSeed)
         # BEGIN FLOATING POINT SECTION #3
         slotProtected = self.slotByStakeProtected(coins, totalCoins, vrfSeed)
         floatBlockTimeFactor = float(self.blockTimeFactor)/UNIT
@@ -230,6 +564,29 @@ class ComptrollerMinimalBigInt(object):
         # END FLOATING POINT SECTION #3
         return steps + (steps%int(2)) # even integer difficulty values only (odd can break VDF).
 
+    # getConsensusDifficulty of a whole validator set in one pass, coinsArray
+    # and vrfSeeds hold one entry per validator. Returns a ConsensusDifficulties
+    # (difficulties, order from the lowest difficulty, winner).
+    # Slot counts are computed once per distinct stake, and with
+    # fixedPointDifficulty all validators share one slot table.
+    def getConsensusDifficulties(self, coinsArray, totalCoins, vrfSeeds):
+        assert( len(coinsArray) == len(vrfSeeds) )
+        slotsByCoins = {}
+        slots = []
+        for coins in coinsArray:
+            count = slotsByCoins.get(coins)
+            if count is None:
+                count = slotsByCoins[coins] = self.slotCount(coins, totalCoins)
+            slots.append(count)
+        if self.fixedPointDifficulty:
+            table = self.slotDifficultyTable()
+            difficulties = [self.slotDifficultyFixed(self.slotWithNoiseFixed(count, vrfSeed), table)
+                            for count, vrfSeed in zip(slots, vrfSeeds)]
+            return rankDifficulties(difficulties)
+        exponents = [self.protectedExponent(self.slotWithNoise(count, vrfSeed)) for count, vrfSeed in zip(slots, vrfSeeds)]
+        difficulties = floatDifficulties(float(self.blockTimeFactor)/UNIT, float(self.speedRatio)/UNIT, exponents)
+        return rankDifficulties(difficulties)
+
     def getConsensusBlockReward(self):
         return self.blockReward # static 10 coins
 
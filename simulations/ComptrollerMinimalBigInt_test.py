@@ -1,6 +1,9 @@
 import unittest
+import random
 from math import floor
+from decimal import Decimal, localcontext
 
+import ComptrollerMinimalBigInt as bigint
 from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt
 
 class TestComptroller(unittest.TestCase):
@@ -395,6 +398,159 @@ class TestComptroller(unittest.TestCase):
         self.assertEqual( self.c.getConsensusDifficulty( 10, 10000, 9216276108752326758096410431252085093178178779429473360863086503377590964104312520850931781787794194), \
             6867367640585024404965563169767424 )
 
+    # Integer fixed-point difficulty.
+
+    def test_expLogFixed(self):
+        UNIT = self.UNIT
+        self.assertEqual( bigint.expFixed(0), UNIT )
+        self.assertEqual( bigint.expFixed(UNIT), 2718281828459 )
+        self.assertEqual( bigint.expFixed(-UNIT), 367879441171 )
+        self.assertEqual( bigint.logFixed(UNIT), 0 )
+        self.assertEqual( bigint.logFixed(2 * UNIT), 693147180559 )
+        self.assertEqual( bigint.logFixed(31 * UNIT // 10), 1131402111491 )
+        self.assertEqual( bigint.logFixed(UNIT // 2), -693147180560 )
+
+    def test_powFixed(self):
+        UNIT = self.UNIT
+        self.assertEqual( bigint.powFixed(3 * UNIT, 64 * UNIT), 3**64 * UNIT )
+        self.assertEqual( bigint.powFixed(3 * UNIT, 0), UNIT )
+        self.assertEqual( bigint.powFixed(2 * UNIT, UNIT // 2), 1414213562373 )
+        rng = random.Random(7)
+        with localcontext() as context:
+            context.prec = 60
+            for i in range(300):
+                base = rng.randrange(13 * UNIT // 10, 31 * UNIT // 10 + 1)
+                exponent = rng.randrange(0, 64 * UNIT + 1)
+                exact = (Decimal(base) / UNIT) ** (Decimal(exponent) / UNIT) * UNIT
+                self.assertLessEqual( abs(bigint.powFixed(base, exponent) - exact), exact * Decimal(10)**-12 + 1 )
+
+    def test_difficultyFixed(self):
+        self.c.blockNumber = self.c.bootstrapPeriod + 1
+        self.assertEqual( self.c.getConsensusDifficultyFixed( 1000, 10000, 10000000000000000000000000000005), 486000 )
+        self.assertEqual( self.c.getConsensusDifficultyFixed( 1000, 10000, 10000000000000000000000000000009), 39366000 )
+        self.assertEqual( self.c.getConsensusDifficultyFixed( 10, 10000, 5260998118755007034341642210716494845522350648952052609981187550070343416422107164948455223506489520), \
+            2000 * 3**64 )
+        self.assertEqual( self.c.noiseFixed( 2**255 ), 0.05 * self.UNIT )
+        self.c.fixedPointDifficulty = True
+        self.assertEqual( self.c.getConsensusDifficulty(1000, 10000, 10000000000000000000000000000009), 39366000 )
+
+    # the opt-in fixed-point path against the default floating point sections.
+    def test_difficultyFixedParity(self):
+        fixed = ComptrollerMinimalBigInt()
+        fixed.fixedPointDifficulty = True
+        rng = random.Random(8)
+        blockTimes = [rng.randint(10, 70) for i in range(50)]
+        difficulties = [rng.randint(100000, 900000) for i in range(50)]
+        for c in [self.c, fixed]:
+            c.addBlockSamples(blockTimes, difficulties)
+        for i in range(2000):
+            coins = rng.choice([rng.randint(1, 10), rng.randint(1, 10000)]) * self.UNIT
+            seed = rng.getrandbits(256)
+            exact = fixed.getConsensusDifficulty(coins, 10000 * self.UNIT, seed)
+            reference = self.c.getConsensusDifficulty(coins, 10000 * self.UNIT, seed)
+            self.assertLessEqual( abs(exact - reference), max(2, reference * 10**-12) )
+            self.assertEqual( exact % 2, 0 )
+            self.assertLessEqual( abs(self.c.noiseFixed(seed) - self.c.noise(seed)), 1 )
+
+    def test_slotDifficultyTable(self):
+        UNIT = self.UNIT
+        self.c.blockNumber = self.c.bootstrapPeriod + 1
+        rng = random.Random(9)
+        seeds = [rng.getrandbits(256) for i in range(200)]
+        before = [self.c.getConsensusDifficultyFixed(10, 10000, seed) for seed in seeds]
+        table = self.c.difficultyTable
+        self.assertEqual( table[2][5], self.c.blockTimeFactor * 3**5 * UNIT )
+        self.c.getConsensusDifficultyFixed(10, 10000, seeds[0])
+        self.assertIs( self.c.difficultyTable, table )
+        self.c.addBlockSample(blockTime=20, difficulty=900000)
+        after = [self.c.getConsensusDifficultyFixed(10, 10000, seed) for seed in seeds]
+        self.assertIsNot( self.c.difficultyTable, table )
+        for seed, difficulty in zip(seeds, after):
+            slot = min(self.c.slotByStakeWithNoiseFixed(10, 10000, seed), 64 * UNIT)
+            reference = self.c.blockTimeFactor * bigint.powFixed(self.c.speedRatio, slot) // (UNIT * UNIT)
+            self.assertLessEqual( abs(difficulty - reference), 2 )
+        self.c.dropLastBlockSample()
+        self.assertEqual( [self.c.getConsensusDifficultyFixed(10, 10000, seed) for seed in seeds], before )
+        # getConsensusDifficulty goes through the same table with fixedPointDifficulty
+        self.c.fixedPointDifficulty = True
+        table = self.c.difficultyTable
+        self.assertEqual( [self.c.getConsensusDifficulty(10, 10000, seed) for seed in seeds], before )
+        self.assertEqual( self.c.getConsensusDifficulties([10] * len(seeds), 10000, seeds).difficulties, before )
+        self.assertIs( self.c.difficultyTable, table )
+
+    def test_addBlockSamplesMatchesLoop(self):
+        rng = random.Random(5)
+        blockTimes = [rng.randint(10, 70) for i in range(500)]
+        difficulties = [rng.randint(100000, 900000) for i in range(500)]
+        r = ComptrollerMinimalBigInt()
+        states = []
+        for blockTime, difficulty in zip(blockTimes, difficulties):
+            r.addBlockSample(blockTime, difficulty)
+            states.append((r.blockTimeFactor, r.movingMaxSpeed, r.movingMinSpeed, r.speedRatio))
+        traced = self.c.addBlockSamples(blockTimes, difficulties, trace=True)
+        self.assertEqual(list(zip(traced['blockTimeFactor'], traced['movingMaxSpeed'], traced['movingMinSpeed'], traced['speedRatio'])), states)
+        for name in ['blockNumber', 'currentBlockTime', 'currentSpeed', 'blockTimeFactor', 'movingMaxSpeed', 'movingMinSpeed', 'speedRatio']:
+            self.assertEqual(getattr(self.c, name), getattr(r, name), name)
+
+    def test_dropLastBlockSample(self):
+        initial = vars(ComptrollerMinimalBigInt()).copy()
+        self.c.addBlockSample(blockTime=20, difficulty=2000)
+        afterFirst = self.c.journalState()
+        self.c.addBlockSample(blockTime=60, difficulty=9000000)
+        self.c.dropLastBlockSample()
+        self.assertEqual(self.c.journalState(), afterFirst)
+        self.c.dropLastBlockSample()
+        for name in ['blockNumber', 'currentBlockTime', 'currentSpeed', 'blockTimeFactor', 'movingMaxSpeed', 'movingMinSpeed', 'speedRatio']:
+            self.assertEqual(getattr(self.c, name), initial[name], name)
+        self.c.dropLastBlockSample() # empty, nothing to do
+        self.assertEqual(self.c.blockNumber, 0)
+
+    def test_clone(self):
+        for blockTime in [20, 60, 30]:
+            self.c.addBlockSample(blockTime=blockTime, difficulty=90000)
+        other = self.c.clone()
+        self.assertEqual(other.journalState(), self.c.journalState())
+        other.addBlockSample(blockTime=10, difficulty=90000)
+        other.rollbackTo(1)
+        self.assertEqual(self.c.blockNumber, 3)
+        self.assertEqual(len(self.c.journal), 3)
+        self.c.rollbackTo(1)
+        self.assertEqual(other.journalState(), self.c.journalState())
+
+    def test_rollbackTo(self):
+        rng = random.Random(8)
+        blockTimes = [rng.randint(10, 70) for i in range(300)]
+        difficulties = [rng.randint(100000, 900000) for i in range(300)]
+        states = []
+        for blockTime, difficulty in zip(blockTimes, difficulties):
+            self.c.addBlockSample(blockTime, difficulty)
+            states.append(self.c.journalState())
+        self.c.rollbackTo(250)
+        self.assertEqual(self.c.journalState(), states[249])
+        self.c.rollbackTo(250)
+        self.assertEqual(self.c.journalState(), states[249])
+        self.c.rollbackTo(100)
+        self.assertEqual(self.c.journalState(), states[99])
+        with self.assertRaises(ValueError):
+            self.c.rollbackTo(101)
+
+    def test_rollbackAfterBatch(self):
+        rng = random.Random(4)
+        blockTimes = [rng.randint(10, 70) for i in range(200)]
+        difficulties = [rng.randint(100000, 900000) for i in range(200)]
+        r = ComptrollerMinimalBigInt()
+        r.addBlockSamples(blockTimes[:150], difficulties[:150])
+        self.c.addBlockSamples(blockTimes, difficulties)
+        self.c.rollbackTo(150)
+        self.assertEqual(self.c.journalState(), r.journalState())
+
+    def test_journalBounded(self):
+        c = type('ShortJournal', (ComptrollerMinimalBigInt,), {'windowExtraBuffer': 3})()
+        c.addBlockSamples([20] * 10, [2000] * 10)
+        c.rollbackTo(7)
+        with self.assertRaises(ValueError):
+            c.dropLastBlockSample()
+
 
 if __name__ == '__main__':
 
@@ -1,4 +1,5 @@
 import unittest
+import random
 
 from ComptrollerMinimal import ComptrollerMinimal
 
@@ -394,6 +395,19 @@ class TestComptroller(unittest.TestCase):
         self.assertEqual( self.c.getConsensusDifficulty( 10, 10000, 9216276108752326758096410431252085093178178779429473360863086503377590964104312520850931781787794194), \
             6867367640585024404965563169767424 )
 
+    def test_addBlockSamplesMatchesLoop(self):
+        rng = random.Random(5)
+        blockTimes = [rng.randint(10, 70) for i in range(500)]
+        difficulties = [rng.randint(100000, 900000) for i in range(500)]
+        r = ComptrollerMinimal()
+        states = []
+        for blockTime, difficulty in zip(blockTimes, difficulties):
+            r.addBlockSample(blockTime, difficulty)
+            states.append((r.blockTimeFactor, r.movingMaxSpeed, r.movingMinSpeed, r.speedRatio))
+        traced = self.c.addBlockSamples(blockTimes, difficulties, trace=True)
+        self.assertEqual(list(zip(traced['blockTimeFactor'], traced['movingMaxSpeed'], traced['movingMinSpeed'], traced['speedRatio'])), states)
+        for name in ['blockNumber', 'currentBlockTime', 'currentSpeed', 'blockTimeFactor', 'movingMaxSpeed', 'movingMinSpeed', 'speedRatio']:
+            self.assertEqual(getattr(self.c, name), getattr(r, name), name)
 
 
 if __name__ == '__main__':
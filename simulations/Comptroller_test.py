@@ -1,6 +1,34 @@
 import unittest
+import random
+import statistics
+from array import array
 
 from Comptroller import Comptroller
+from RingBuffer import RingBuffer
+
+
+class SmallWindowComptroller(Comptroller):
+    windowSize = 24
+    windowExtraBuffer = 8
+
+
+# original full-window recomputation, reference for the rolling statistics.
+class ReferenceComptroller(SmallWindowComptroller):
+    def updateComplexMetrics(self):
+        self.currentBlockTime = statistics.mean(self.blockTimes[-self.windowSize:])
+        self.currentSpeed = statistics.mean(self.speeds[-self.windowSize:])
+        self.currentMaxSpeed = max(self.speeds[-self.windowSize:])
+        self.currentMinSpeed = min(self.speeds[-self.windowSize:])
+        self.currentSpeedRatio = self.currentMaxSpeed / self.currentMinSpeed
+        if len(self.volumes) < self.windowSize:
+            auxWindowsPerYear = self.blocksPerYear / len(self.volumes)
+        else:
+            auxWindowsPerYear = self.windowsPerYear
+        self.velocity = statistics.median(self.volumes[-self.windowSize:]) * auxWindowsPerYear / self.totalCirculating
+        if self.velocity == 0.0:
+            self.velocity = statistics.mean(self.volumes[-self.windowSize:]) * self.windowsPerYear / self.totalCirculating
+        self.meanBlockUtilization = statistics.mean(self.utilizations[-self.windowSize:])
+
 
 class TestComptroller(unittest.TestCase):
 
@@ -806,6 +834,167 @@ class TestComptroller(unittest.TestCase):
 
 
 
+    def test_rollingMetricsMatchReference(self):
+        rng = random.Random(11)
+        c = SmallWindowComptroller()
+        r = ReferenceComptroller()
+        for step in range(600):
+            if rng.random() < 0.25:
+                c.dropLastBlockSample()
+                r.dropLastBlockSample()
+            else:
+                sample = dict(
+                    blockTime=rng.randint(10, 70),
+                    difficulty=rng.randint(1000, 4000),
+                    volume=rng.choice([0, rng.randint(0, 100), rng.random() * 100]),
+                    newStake=0,
+                    newUnstake=0,
+                    reward=2,
+                    txsCount=rng.randint(0, 500),
+                )
+                c.addBlockSample(**sample)
+                r.addBlockSample(**sample)
+            for name in ['currentBlockTime', 'currentSpeed', 'currentMaxSpeed', 'currentMinSpeed',
+                         'velocity', 'blockTimeFactor', 'speedRatio', 'currentIssuance', 'blockReward', 'txsPerBlock']:
+                self.assertEqual(getattr(c, name), getattr(r, name), name)
+
+    def test_addBlockSamplesMatchesLoop(self):
+        rng = random.Random(3)
+        samples = [dict(
+            blockTime=rng.randint(10, 70),
+            difficulty=rng.randint(1000, 4000),
+            volume=rng.randint(0, 100),
+            newStake=0,
+            newUnstake=0,
+            reward=2,
+            txsCount=rng.randint(0, 500),
+        ) for i in range(200)]
+        c = SmallWindowComptroller()
+        r = SmallWindowComptroller()
+        factors = []
+        for sample in samples:
+            r.addBlockSample(**sample)
+            factors.append(r.blockTimeFactor)
+        columns = {name + 's': [sample[name] for sample in samples] for name in samples[0]}
+        traced = c.addBlockSamples(
+            blockTimes=columns['blockTimes'],
+            difficulties=columns['difficultys'],
+            volumes=columns['volumes'],
+            newStakes=columns['newStakes'],
+            newUnstakes=columns['newUnstakes'],
+            rewards=columns['rewards'],
+            txsCounts=columns['txsCounts'],
+            trace=True,
+        )
+        self.assertEqual(traced['blockTimeFactor'], factors)
+        self.assertSameState(c, r)
+        # in batches of any size on top of buffered blocks, wrapping the buffers
+        c = SmallWindowComptroller()
+        for sample in samples[:10]:
+            c.addBlockSample(**sample)
+        position = 10
+        for size in [0, 1, 7, 40, 3, 139]:
+            batch = samples[position:position + size]
+            c.addBlockSamples(*[[sample[name] for sample in batch] for name in samples[0]])
+            position += size
+        self.assertEqual(position, len(samples))
+        self.assertSameState(c, r)
+        c.rollbackTo(195)
+        r.rollbackTo(195)
+        self.assertSameState(c, r)
+
+    def randomSamples(self, rng, count):
+        return [dict(
+            blockTime=rng.randint(10, 70),
+            difficulty=rng.randint(1000, 4000),
+            volume=rng.randint(0, 100),
+            newStake=0,
+            newUnstake=rng.randint(0, 1),
+            reward=2,
+            txsCount=rng.randint(0, 500),
+        ) for i in range(count)]
+
+    # every scalar and buffer, with the same values and types.
+    def assertSameState(self, c, r):
+        for name, value in vars(r).items():
+            other = getattr(c, name)
+            if isinstance(value, RingBuffer): # c may have evicted older items than r
+                common = min(len(value), len(other))
+                value, other = value.window(common).tolist(), other.window(common).tolist()
+                self.assertEqual([type(v) for v in other], [type(v) for v in value], name)
+            elif value is not None and not isinstance(value, (bool, int, float)):
+                continue # rolling windows, checked through the metrics
+            self.assertEqual(other, value, name)
+            self.assertIs(type(other), type(value), name)
+
+    def test_rollbackTo(self):
+        samples = self.randomSamples(random.Random(21), 60)
+        c = SmallWindowComptroller()
+        r = SmallWindowComptroller()
+        for sample in samples:
+            c.addBlockSample(**sample)
+        for sample in samples[:52]:
+            r.addBlockSample(**sample)
+        c.rollbackTo(55)
+        c.rollbackTo(52)
+        self.assertSameState(c, r)
+        # window no longer in the buffers
+        with self.assertRaises(ValueError):
+            c.rollbackTo(51)
+        with self.assertRaises(ValueError):
+            c.rollbackTo(53)
+
+    def test_rollbackToGenesis(self):
+        c = SmallWindowComptroller()
+        for sample in self.randomSamples(random.Random(22), 10):
+            c.addBlockSample(**sample)
+        c.rollbackTo(0)
+        self.assertSameState(c, SmallWindowComptroller())
+        self.assertEqual(len(c.blockTimes), 0)
+
+    def test_historyKeepsTypes(self):
+        samples = self.randomSamples(random.Random(24), 20)
+        c = SmallWindowComptroller()
+        c.totalStaked = 2**60 + 1 # not representable as a double
+        c.totalCirculating = 2**70 + 3 # beyond 64 bits
+        stakes = []
+        for sample in samples:
+            c.addBlockSample(**sample)
+            stakes.append((c.totalStaked, c.totalCirculating, c.txsPerBlock))
+        c.rollbackTo(12)
+        self.assertEqual((c.totalStaked, c.totalCirculating, c.txsPerBlock), stakes[11])
+        self.assertEqual([type(v) for v in stakes[11]], [type(v) for v in (c.totalStaked, c.totalCirculating, c.txsPerBlock)])
+        c.dropLastBlockSample()
+        self.assertEqual((c.totalStaked, c.totalCirculating), stakes[10][:2])
+        self.assertIs(type(c.totalStaked), int)
+        self.assertEqual(c.blockTimes.tolist(), [sample['blockTime'] for sample in samples[:11]])
+        self.assertIs(type(c.blockTimes[-1]), int)
+
+    # ints and floats go to the buffers of their type, no list fallback
+    def test_buffersStayTyped(self):
+        c = SmallWindowComptroller()
+        for sample in self.randomSamples(random.Random(25), 60):
+            c.addBlockSample(**sample)
+        c.rollbackTo(55)
+        buffers = {name: value for name, value in vars(c).items() if isinstance(value, RingBuffer)}
+        self.assertEqual(len(buffers), 8 + len(c.historyNames))
+        for name, buffer in buffers.items():
+            self.assertIn(buffer.typecode, ['q', 'd'], name)
+            self.assertIsInstance(buffer.data, array, name)
+
+    def test_applyFork(self):
+        rng = random.Random(23)
+        common = self.randomSamples(rng, 40)
+        oldBranch = self.randomSamples(rng, 12)
+        newBranch = self.randomSamples(rng, 15)
+        c = SmallWindowComptroller()
+        c.addBlockSamples(*[[s[name] for s in common + oldBranch] for name in common[0]])
+        c.applyFork(44, newBranch)
+        r = SmallWindowComptroller()
+        for sample in common + oldBranch[:4] + newBranch:
+            r.addBlockSample(**sample)
+        self.assertSameState(c, r)
+
     def test_split(self):
         s = 'hello world'
         self.assertEqual(s.split(), ['hello', 'world'])
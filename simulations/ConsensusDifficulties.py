@@ -0,0 +1,28 @@
+import math
+from collections import namedtuple
+
+# Difficulties of a whole validator set for one block, see the
+# getConsensusDifficulties method of the comptroller classes.
+# difficulties[i]: VDF steps of validator i.
+# order: validators from the lowest difficulty (the expected winner at equal
+# VDF speed) up, ties by position.
+# winner: order[0], None for an empty set.
+ConsensusDifficulties = namedtuple('ConsensusDifficulties', ['difficulties', 'order', 'winner'])
+
+
+def rankDifficulties(difficulties):
+    order = sorted(range(len(difficulties)), key=difficulties.__getitem__) # stable, ties by position
+    return ConsensusDifficulties(difficulties, order, order[0] if order else None)
+
+
+# floor(blockTimeFactor * speedRatio ** exponent) rounded up to even, per
+# exponent, the float steps of getConsensusDifficulty. Kept on Python floats
+# on purpose: NumPy's vectorized power differs from the C library pow in the
+# last bit for some inputs, which would change consensus difficulties.
+# For the same reason the float classes have no per-block slot table like
+# ComptrollerMinimalBigInt.slotDifficultyTable: a table entry times
+# speedRatio ** noise rounds differently than one pow, and saves nothing
+# over that single C call.
+def floatDifficulties(blockTimeFactor, speedRatio, exponents):
+    steps = [int(math.floor(blockTimeFactor * speedRatio ** exponent)) for exponent in exponents]
+    return [step + (step%int(2)) for step in steps]
@@ -0,0 +1,56 @@
+import unittest
+import random
+
+from ConsensusDifficulties import rankDifficulties
+from Comptroller import Comptroller
+from ComptrollerMinimal import ComptrollerMinimal
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt
+
+class TestConsensusDifficulties(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.totalCoins = 100000
+        self.coins = [rng.choice([10, 100, 1000, rng.randint(1, 5000)]) for i in range(300)]
+        self.seeds = [rng.getrandbits(256) for i in range(300)] + [2**256 - 2, 10**31 + 5]
+        self.coins += [1000, 1000]
+
+    def assertMatchesSingle(self, c):
+        result = c.getConsensusDifficulties(self.coins, self.totalCoins, self.seeds)
+        expected = [c.getConsensusDifficulty(coins, self.totalCoins, seed) for coins, seed in zip(self.coins, self.seeds)]
+        self.assertEqual(result.difficulties, expected)
+        self.assertEqual([expected[i] for i in result.order], sorted(expected))
+        self.assertEqual(result.winner, result.order[0])
+        self.assertEqual(expected[result.winner], min(expected))
+
+    def test_rankDifficulties(self):
+        result = rankDifficulties([6, 2, 4, 2])
+        self.assertEqual(result.order, [1, 3, 2, 0])
+        self.assertEqual(result.winner, 1)
+        self.assertIsNone(rankDifficulties([]).winner)
+
+    def test_minimal(self):
+        c = ComptrollerMinimal()
+        c.blockNumber = c.bootstrapPeriod + 1
+        self.assertMatchesSingle(c)
+
+    def test_comptroller(self):
+        c = Comptroller()
+        for i in range(3):
+            c.addBlockSample(blockTime=30, difficulty=2000, volume=10, newStake=0, newUnstake=0, reward=2, txsCount=100)
+        self.assertMatchesSingle(c)
+
+    def test_bigInt(self):
+        c = ComptrollerMinimalBigInt()
+        c.blockNumber = c.bootstrapPeriod + 1
+        self.assertMatchesSingle(c)
+        c.fixedPointDifficulty = True
+        self.assertMatchesSingle(c)
+        c.addBlockSample(blockTime=20, difficulty=900000)
+        self.assertMatchesSingle(c)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
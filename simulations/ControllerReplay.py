@@ -0,0 +1,169 @@
+from ComptrollerMinimal import ComptrollerMinimal
+
+try:
+    import numpy
+except ImportError: # pure Python fallback
+    numpy = None
+
+# Replay of the ComptrollerMinimal controllers (blockTimeFactor and the
+# moving max/min speeds) over whole block-time series, for parameter studies.
+#
+# Both controllers branch on their own previous state (clamping, and the
+# speed bands move depending on the current ratio), so a trajectory is a
+# strict recurrence in time. We vectorize across runs instead: every block
+# updates all runs at once with NumPy, doing per element the same float
+# operations in the same order as the scalar class, so results are
+# bit-identical. Blocks are processed in chunks to bound memory.
+
+TRACE_NAMES = ['blockTimeFactor', 'movingMaxSpeed', 'movingMinSpeed', 'speedRatio']
+
+
+def iterReplayMinimal(blockTimes, difficulties, comptrollers, chunkSize=65536, useNumpy=None):
+    # blockTimes/difficulties: one series shared by all runs, or one series per run.
+    # comptrollers: list of ComptrollerMinimal (or subclasses with other
+    # parameters), one per run, advanced in place.
+    # yields a dict of per-run columns for each chunk of blocks.
+    runs = len(comptrollers)
+    if useNumpy is None:
+        useNumpy = numpy is not None and runs > 1
+    if useNumpy and numpy is None:
+        raise ImportError('numpy is not available')
+    perRun = isPerRun(blockTimes)
+    assert( perRun == isPerRun(difficulties) )
+    if perRun:
+        assert( len(blockTimes) == runs and len(difficulties) == runs )
+        length = len(blockTimes[0])
+    else:
+        length = len(blockTimes)
+
+    for start in range(0, length, chunkSize):
+        stop = min(start + chunkSize, length)
+        if perRun:
+            chunkTimes = [series[start:stop] for series in blockTimes]
+            chunkDifficulties = [series[start:stop] for series in difficulties]
+        else:
+            chunkTimes = [blockTimes[start:stop]] * runs
+            chunkDifficulties = [difficulties[start:stop]] * runs
+        if useNumpy:
+            yield replayChunkNumpy(chunkTimes, chunkDifficulties, comptrollers)
+        else:
+            yield replayChunkPython(chunkTimes, chunkDifficulties, comptrollers)
+
+
+def replayMinimal(blockTimes, difficulties, comptrollers=None, chunkSize=65536, useNumpy=None):
+    # Whole trajectory. With a single comptroller (or None, a fresh
+    # ComptrollerMinimal) columns are 1-D, with a list they are runs x blocks.
+    single = not isinstance(comptrollers, (list, tuple))
+    if comptrollers is None:
+        comptrollers = ComptrollerMinimal()
+    if single:
+        comptrollers = [comptrollers]
+    chunks = list(iterReplayMinimal(blockTimes, difficulties, comptrollers, chunkSize, useNumpy))
+    result = {}
+    for name in TRACE_NAMES:
+        columns = [chunk[name] for chunk in chunks]
+        if columns and numpy is not None and isinstance(columns[0], numpy.ndarray):
+            joined = numpy.concatenate(columns, axis=1)
+        else:
+            joined = [sum((column[run] for column in columns), []) for run in range(len(comptrollers))]
+        result[name] = joined[0] if single else joined
+    return result
+
+
+def isPerRun(series):
+    if numpy is not None and isinstance(series, numpy.ndarray):
+        return series.ndim == 2
+    return len(series) > 0 and hasattr(series[0], '__len__')
+
+
+def toList(series):
+    if hasattr(series, 'tolist'):
+        return series.tolist()
+    return list(series)
+
+
+def replayChunkPython(chunkTimes, chunkDifficulties, comptrollers):
+    result = {name: [] for name in TRACE_NAMES}
+    for c, times, difficulties in zip(comptrollers, chunkTimes, chunkDifficulties):
+        traced = c.addBlockSamples(toList(times), toList(difficulties), trace=True)
+        for name in TRACE_NAMES:
+            result[name].append(traced[name])
+    return result
+
+
+def replayChunkNumpy(chunkTimes, chunkDifficulties, comptrollers):
+    where = numpy.where
+    times = numpy.asarray(chunkTimes, dtype=numpy.float64)
+    difficulties = numpy.asarray(chunkDifficulties, dtype=numpy.float64)
+    runs, length = times.shape
+
+    def parameter(name):
+        return numpy.array([getattr(c, name) for c in comptrollers], dtype=numpy.float64)
+
+    windowSize = parameter('windowSize')
+    downFactor = windowSize - 1
+    upFactor = windowSize + 1
+    targetBlockTime = parameter('targetBlockTime')
+    minBlockTimeFactor = parameter('minBlockTimeFactor')
+    maxBlockTimeFactor = parameter('maxBlockTimeFactor')
+    minSpeedRatio = parameter('minSpeedRatio')
+    maxSpeedRatio = parameter('maxSpeedRatio')
+
+    blockTimeFactor = parameter('blockTimeFactor')
+    movingMaxSpeed = parameter('movingMaxSpeed')
+    movingMinSpeed = parameter('movingMinSpeed')
+    speedRatio = parameter('speedRatio')
+
+    result = {name: numpy.empty((runs, length)) for name in TRACE_NAMES}
+
+    for i in range(length):
+        blockTime = times[:, i]
+        currentSpeed = difficulties[:, i] / blockTime
+
+        # NumPy form of ComptrollerMinimal.blockTimeFactorStep
+        blockTimeFactor = where(blockTime > targetBlockTime, blockTimeFactor * downFactor / windowSize,
+                          where(blockTime < targetBlockTime, blockTimeFactor * upFactor / windowSize, blockTimeFactor))
+        blockTimeFactor = where(blockTimeFactor < minBlockTimeFactor, minBlockTimeFactor, blockTimeFactor)
+        blockTimeFactor = where(blockTimeFactor > maxBlockTimeFactor, maxBlockTimeFactor, blockTimeFactor)
+
+        # NumPy form of ComptrollerMinimal.speedRatioStep
+        mask = (currentSpeed > movingMaxSpeed) & (speedRatio < maxSpeedRatio)
+        movingMaxSpeed = where(mask, movingMaxSpeed * upFactor / windowSize, movingMaxSpeed)
+        mask = (currentSpeed > movingMaxSpeed) & (speedRatio >= maxSpeedRatio)
+        movingMaxSpeed = where(mask, movingMaxSpeed * upFactor / windowSize, movingMaxSpeed)
+        movingMinSpeed = where(mask, movingMinSpeed * upFactor / windowSize, movingMinSpeed)
+        mask = (currentSpeed < movingMinSpeed) & (speedRatio < maxSpeedRatio)
+        movingMinSpeed = where(mask, movingMinSpeed * downFactor / windowSize, movingMinSpeed)
+        mask = (currentSpeed < movingMinSpeed) & (speedRatio >= maxSpeedRatio)
+        movingMinSpeed = where(mask, movingMinSpeed * downFactor / windowSize, movingMinSpeed)
+        movingMaxSpeed = where(mask, movingMaxSpeed * downFactor / windowSize, movingMaxSpeed)
+        mask = (currentSpeed < movingMaxSpeed) & (currentSpeed > movingMinSpeed) & (speedRatio > minSpeedRatio)
+        movingMaxSpeed = where(mask, movingMaxSpeed * downFactor / windowSize, movingMaxSpeed)
+        movingMinSpeed = where(mask, movingMinSpeed * upFactor / windowSize, movingMinSpeed)
+        mask = movingMaxSpeed < movingMinSpeed
+        if mask.any():
+            crossedMax = movingMinSpeed * (1 + (minSpeedRatio/2))
+            crossedMin = movingMaxSpeed * (1 - (minSpeedRatio/2))
+            movingMaxSpeed = where(mask, crossedMax, movingMaxSpeed)
+            movingMinSpeed = where(mask, crossedMin, movingMinSpeed)
+            print('DEBUG: Unexpected Speed Cross!!!: self.movingMaxSpeed < self.movingMinSpeed')
+        speedRatio = movingMaxSpeed / movingMinSpeed
+
+        result['blockTimeFactor'][:, i] = blockTimeFactor
+        result['movingMaxSpeed'][:, i] = movingMaxSpeed
+        result['movingMinSpeed'][:, i] = movingMinSpeed
+        result['speedRatio'][:, i] = speedRatio
+
+    if length > 0:
+        for run, c in enumerate(comptrollers):
+            blockTime = chunkTimes[run][-1]
+            difficulty = chunkDifficulties[run][-1]
+            c.blockNumber += length
+            c.currentBlockTime = blockTime.item() if hasattr(blockTime, 'item') else blockTime
+            c.difficulty = difficulty.item() if hasattr(difficulty, 'item') else difficulty
+            c.currentSpeed = c.difficulty / c.currentBlockTime
+            c.blockTimeFactor = float(blockTimeFactor[run])
+            c.movingMaxSpeed = float(movingMaxSpeed[run])
+            c.movingMinSpeed = float(movingMinSpeed[run])
+            c.speedRatio = float(speedRatio[run])
+    return result
@@ -0,0 +1,65 @@
+import unittest
+import random
+
+import ControllerReplay
+from ControllerReplay import replayMinimal
+from ComptrollerMinimal import ComptrollerMinimal
+
+
+class TightComptrollerMinimal(ComptrollerMinimal):
+    windowSize = 50
+    maxSpeedRatio = 2.5
+
+
+class TestControllerReplay(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(9)
+        self.blockTimes = [rng.randint(10, 70) for i in range(700)]
+        self.difficulties = [rng.randint(100000, 900000) for i in range(700)]
+
+    def scalarTrajectory(self, c, blockTimes, difficulties):
+        trajectory = {name: [] for name in ControllerReplay.TRACE_NAMES}
+        for blockTime, difficulty in zip(blockTimes, difficulties):
+            c.addBlockSample(blockTime, difficulty)
+            for name in ControllerReplay.TRACE_NAMES:
+                trajectory[name].append(getattr(c, name))
+        return trajectory
+
+    def checkRuns(self, useNumpy):
+        comptrollers = [ComptrollerMinimal(), TightComptrollerMinimal(), ComptrollerMinimal()]
+        result = replayMinimal(self.blockTimes, self.difficulties, comptrollers, chunkSize=64, useNumpy=useNumpy)
+        for run, cls in enumerate([ComptrollerMinimal, TightComptrollerMinimal, ComptrollerMinimal]):
+            expected = self.scalarTrajectory(cls(), self.blockTimes, self.difficulties)
+            for name in ControllerReplay.TRACE_NAMES:
+                self.assertEqual(list(result[name][run]), expected[name], name)
+            self.assertEqual(comptrollers[run].speedRatio, expected['speedRatio'][-1])
+            self.assertEqual(comptrollers[run].blockNumber, len(self.blockTimes))
+
+    def test_singleRunPython(self):
+        c = ComptrollerMinimal()
+        result = replayMinimal(self.blockTimes, self.difficulties, c, chunkSize=100, useNumpy=False)
+        expected = self.scalarTrajectory(ComptrollerMinimal(), self.blockTimes, self.difficulties)
+        self.assertEqual(result, expected)
+
+    def test_runsPython(self):
+        self.checkRuns(False)
+
+    @unittest.skipIf(ControllerReplay.numpy is None, 'numpy not installed')
+    def test_runsNumpy(self):
+        self.checkRuns(True)
+
+    @unittest.skipIf(ControllerReplay.numpy is None, 'numpy not installed')
+    def test_perRunSeriesNumpy(self):
+        numpy = ControllerReplay.numpy
+        times = numpy.array([self.blockTimes, self.blockTimes[::-1]])
+        difficulties = numpy.array([self.difficulties, self.difficulties[::-1]])
+        result = replayMinimal(times, difficulties, [ComptrollerMinimal(), ComptrollerMinimal()], useNumpy=True)
+        expected = self.scalarTrajectory(ComptrollerMinimal(), self.blockTimes[::-1], self.difficulties[::-1])
+        self.assertEqual(result['speedRatio'][1].tolist(), expected['speedRatio'])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
@@ -0,0 +1,238 @@
+import math
+from collections import namedtuple
+
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt, UNIT
+
+try:
+    import numpy
+except ImportError: # pure Python fallback for the analytic part
+    numpy = None
+
+# How far block production diverges from stake-proportional chances
+# (RESEARCH.md question 5).
+#
+# Under slotByStakeProtected a validator with n slots (ceil(totalCoins /
+# coins), plus the virtual stake during the bootstrap) draws the exponent
+# slot + noise, slot uniform in [0, n) and noise uniform in [0, f) with f the
+# noiseFractionSlots, capped at 64, and the lowest difficulty
+# blockTimeFactor * speedRatio ** exponent wins. At equal VDF speeds the
+# order of the exponents decides, and with 0 < f <= 1 slot + noise / f is
+# uniform in [0, n): the win probabilities only depend on the slot counts,
+# not on blockTimeFactor, speedRatio or f. Scaling every count by the same
+# factor leaves them unchanged too, so the bootstrap virtual stake only acts
+# through the rounding up of the counts and the cap at 64, and large stakes
+# win more than their share (n = 1 against n = 2 wins 3/4 of the rounds,
+# not 2/3). The analytic estimate integrates
+#
+#   P(i wins) = sum over slots s < min(n_i, 64) of
+#               1/n_i * integral_0^1 prod_{j != i} (1 - (s + t) / n_j) dt
+#
+# with Gauss-Legendre quadrature, grouping validators by slot count, plus an
+# even split of the rounds where every validator hits the cap (a tie). The
+# Monte Carlo estimate draws slots and noise for batches of rounds with NumPy,
+# and also takes VDF speeds into account. The rounding of the steps to even
+# integers is ignored by both.
+
+QUADRATURE_NODES = 32
+MAX_SLOT = 64 # slots are capped at 64
+BATCH_DRAWS = 2**18 # validators x rounds drawn at once by the Monte Carlo
+
+# stakeShares, winProbabilities: per validator.
+# gini: of the win probabilities; stakeGini: of the stakes.
+# ratioGini: of winProbability / stakeShare weighted by stake, 0 when
+# chances are exactly proportional to stake.
+# klDivergence: KL(winProbabilities || stakeShares), in nats.
+# totalVariation: half the L1 distance of the two distributions.
+FairnessReport = namedtuple('FairnessReport', ['stakeShares', 'winProbabilities', 'gini', 'stakeGini', 'ratioGini',
+                                               'klDivergence', 'totalVariation'])
+
+
+# (slot counts per validator, noise fraction, speedRatio) of comptroller
+# for stakes, in the units of its class (fixed-point by UNIT for
+# ComptrollerMinimalBigInt).
+def comptrollerParameters(comptroller, stakes):
+    totalCoins = sum(stakes)
+    if isinstance(comptroller, ComptrollerMinimalBigInt):
+        slotCounts = [comptroller.slotCount(coins, totalCoins) for coins in stakes]
+        return slotCounts, comptroller.noiseFractionSlots / UNIT, comptroller.speedRatio / UNIT
+    # same slots as ComptrollerMinimal.slotByStakeWithNoise
+    slotCounts = [min(math.ceil(float(totalCoins) / float(coins)), 2 ** 32 - 1) for coins in stakes]
+    return slotCounts, comptroller.noiseFractionSlots, comptroller.speedRatio
+
+
+# nodes and weights of the Gauss-Legendre rule on [0, 1], Newton on the
+# Legendre polynomial roots.
+def gaussLegendre(k):
+    nodes = []
+    weights = []
+    for i in range(k):
+        x = math.cos(math.pi * (i + 0.75) / (k + 0.5))
+        for iteration in range(100):
+            p0, p1 = 1.0, x
+            for n in range(2, k + 1):
+                p0, p1 = p1, ((2 * n - 1) * x * p1 - (n - 1) * p0) / n
+            derivative = k * (x * p1 - p0) / (x * x - 1)
+            step = p1 / derivative
+            x -= step
+            if abs(step) < 1e-16:
+                break
+        nodes.append((1 - x) / 2)
+        weights.append(1 / ((1 - x * x) * derivative * derivative))
+    return nodes, weights
+
+
+# win probability of each validator at equal VDF speeds, from its slot count.
+def analyticWinProbabilities(slotCounts, nodes=QUADRATURE_NODES, useNumpy=None):
+    if useNumpy is None:
+        useNumpy = numpy is not None
+    if useNumpy and numpy is None:
+        raise ImportError('numpy is not available')
+    counts = {}
+    for n in slotCounts:
+        counts[n] = counts.get(n, 0) + 1
+    groups = sorted(counts)
+    multiplicities = [counts[n] for n in groups]
+    ts, ws = gaussLegendre(nodes)
+    if useNumpy:
+        byGroup = analyticGroupsNumpy(groups, multiplicities, ts, ws)
+    else:
+        byGroup = analyticGroupsPython(groups, multiplicities, ts, ws)
+    # every validator capped at 64: equal difficulties, an even split
+    tie = 1.0
+    for n, m in zip(groups, multiplicities):
+        tie *= ((n - MAX_SLOT) / n) ** m if n > MAX_SLOT else 0.0
+    probabilities = dict(zip(groups, byGroup))
+    return [probabilities[n] + tie / len(slotCounts) for n in slotCounts]
+
+
+def analyticGroupsPython(groups, multiplicities, ts, ws):
+    result = [0.0] * len(groups)
+    for s in range(min(groups[0], MAX_SLOT)): # from the smallest count up, someone always finished
+        for t, w in zip(ts, ws):
+            x = s + t
+            logs = [math.log1p(-x / n) for n in groups]
+            total = sum(m * log for m, log in zip(multiplicities, logs))
+            for g, n in enumerate(groups):
+                result[g] += w * math.exp(total - logs[g]) / n
+    return result
+
+
+def analyticGroupsNumpy(groups, multiplicities, ts, ws):
+    groups = numpy.array(groups, dtype=numpy.float64)
+    multiplicities = numpy.array(multiplicities, dtype=numpy.float64)
+    slots = min(int(groups[0]), MAX_SLOT) # from the smallest count up, someone always finished
+    x = (numpy.arange(slots)[:, None] + numpy.array(ts)[None, :]).ravel()
+    logs = numpy.log1p(-x[:, None] / groups[None, :])
+    total = logs @ multiplicities
+    integrand = numpy.exp(total[:, None] - logs) / groups[None, :]
+    weights = numpy.tile(numpy.array(ws), slots)
+    return (weights @ integrand).tolist()
+
+
+# Monte Carlo wins per validator over rounds rounds, in batches: slots
+# uniform in [0, n), noise uniform in [0, noiseFraction), exponent capped at
+# 64. speeds (VDF steps per second, with speedRatio) make the finish time
+# decide instead of the difficulty. Ties (at the cap, or without noise) go
+# to a random one of them. Returns a NumPy array of win counts.
+def monteCarloWins(slotCounts, noiseFraction, rounds, speedRatio=None, speeds=None, seed=None, batch=None):
+    if numpy is None:
+        raise ImportError('numpy is not available')
+    generator = numpy.random.default_rng(seed)
+    n = numpy.array(slotCounts, dtype=numpy.float64)
+    validators = len(n)
+    if speeds is not None:
+        offsets = -numpy.log(numpy.array(speeds, dtype=numpy.float64)) / math.log(speedRatio)
+    if batch is None:
+        batch = max(1, BATCH_DRAWS // validators)
+    wins = numpy.zeros(validators, dtype=numpy.int64)
+    for start in range(0, rounds, batch):
+        size = min(batch, rounds - start)
+        # one uniform per validator: the integer part of u * n is the slot,
+        # the fractional part (21+ bits left for n < 2**32) the noise
+        draws = generator.random((size, validators))
+        draws *= n
+        exponents = numpy.floor(draws)
+        draws -= exponents # noise / noiseFraction
+        exponents += noiseFraction * draws
+        numpy.minimum(exponents, MAX_SLOT, out=exponents)
+        draws *= 1e-9
+        exponents += draws # random order among equal difficulties
+        if speeds is not None:
+            exponents += offsets
+        wins += numpy.bincount(exponents.argmin(axis=1), minlength=validators)
+    return wins
+
+
+# weighted Gini coefficient, from the Lorenz curve of values sorted up.
+def gini(values, weights=None):
+    if weights is None:
+        weights = [1.0] * len(values)
+    pairs = sorted(zip(values, weights))
+    totalWeight = sum(weight for value, weight in pairs)
+    totalValue = sum(value * weight for value, weight in pairs)
+    if totalValue == 0:
+        return 0.0
+    area = 0.0
+    cumulative = 0.0
+    for value, weight in pairs:
+        previous = cumulative
+        cumulative += value * weight / totalValue
+        area += weight / totalWeight * (previous + cumulative)
+    return 1.0 - area
+
+
+# KL(p || q) in nats, infinite if q misses some mass of p.
+def klDivergence(p, q):
+    total = 0.0
+    for a, b in zip(p, q):
+        if a > 0:
+            if b <= 0:
+                return math.inf
+            total += a * math.log(a / b)
+    return total
+
+
+def fairnessReport(stakes, probabilities):
+    totalCoins = sum(stakes)
+    shares = [coins / totalCoins for coins in stakes]
+    probabilities = [float(probability) for probability in probabilities]
+    return FairnessReport(
+        stakeShares=shares,
+        winProbabilities=probabilities,
+        gini=gini(probabilities),
+        stakeGini=gini(shares),
+        ratioGini=gini([probability / share for probability, share in zip(probabilities, shares)], shares),
+        klDivergence=klDivergence(probabilities, shares),
+        totalVariation=sum(abs(probability - share) for probability, share in zip(probabilities, shares)) / 2,
+    )
+
+
+# FairnessReport of comptroller (its current slot rules, e.g. after the
+# bootstrap once blockNumber >= bootstrapPeriod) for stakes: analytic, or
+# Monte Carlo over rounds rounds when given (needs NumPy).
+def analyzeFairness(comptroller, stakes, rounds=None, speeds=None, seed=None):
+    slotCounts, noiseFraction, speedRatio = comptrollerParameters(comptroller, stakes)
+    if rounds is None:
+        if speeds is not None:
+            raise ValueError('the analytic estimate assumes equal VDF speeds, give rounds for Monte Carlo')
+        if not 0 < noiseFraction <= 1:
+            raise ValueError('the analytic estimate needs 0 < noiseFractionSlots <= 1 slot')
+        return fairnessReport(stakes, analyticWinProbabilities(slotCounts))
+    wins = monteCarloWins(slotCounts, noiseFraction, rounds, speedRatio, speeds, seed)
+    return fairnessReport(stakes, wins / rounds)
+
+
+if __name__ == '__main__':
+
+    import random
+    import time
+    rng = random.Random(1)
+    stakes = [int(rng.paretovariate(1.2) * 100) * UNIT for i in range(1000)]
+    c = ComptrollerMinimalBigInt()
+    c.blockNumber = c.bootstrapPeriod # after the bootstrap
+    for rounds in [None, 10**6]:
+        start = time.time()
+        report = analyzeFairness(c, stakes, rounds, seed=1)
+        print('Monte Carlo' if rounds else 'Analytic', format(time.time() - start, '.2f'), 'secs')
+        for name in ['gini', 'stakeGini', 'ratioGini', 'klDivergence', 'totalVariation']:
+            print('  ' + name + ': ', getattr(report, name))
@@ -0,0 +1,89 @@
+import math
+import unittest
+
+import FairnessAnalysis
+from ComptrollerMinimal import ComptrollerMinimal
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt, UNIT
+
+class TestFairnessAnalysis(unittest.TestCase):
+
+    def test_gaussLegendre(self):
+        nodes, weights = FairnessAnalysis.gaussLegendre(4)
+        self.assertAlmostEqual(sum(weights), 1.0, places=14)
+        self.assertAlmostEqual(sum(w * t**7 for t, w in zip(nodes, weights)), 1 / 8, places=14)
+
+    def checkAnalytic(self, useNumpy):
+        p = FairnessAnalysis.analyticWinProbabilities([1, 2], useNumpy=useNumpy)
+        self.assertAlmostEqual(p[0], 0.75, places=12)
+        self.assertAlmostEqual(p[1], 0.25, places=12)
+        for p in [FairnessAnalysis.analyticWinProbabilities([7] * 7, useNumpy=useNumpy),
+                  FairnessAnalysis.analyticWinProbabilities([1000] * 3, useNumpy=useNumpy)]: # mostly capped ties
+            for probability in p:
+                self.assertAlmostEqual(probability, 1 / len(p), places=12)
+        p = FairnessAnalysis.analyticWinProbabilities([5, 70, 100, 200, 7, 7, 3000], useNumpy=useNumpy)
+        self.assertAlmostEqual(sum(p), 1.0, places=12)
+        self.assertEqual(p[4], p[5])
+        self.assertTrue(p[0] > p[4] > p[1] > p[2] > p[3] > p[6] > 0)
+        return p
+
+    def test_analyticPython(self):
+        self.checkAnalytic(False)
+
+    @unittest.skipIf(FairnessAnalysis.numpy is None, 'numpy is not available')
+    def test_analyticNumpy(self):
+        p = self.checkAnalytic(True)
+        for a, b in zip(p, self.checkAnalytic(False)):
+            self.assertAlmostEqual(a, b, places=12)
+
+    @unittest.skipIf(FairnessAnalysis.numpy is None, 'numpy is not available')
+    def test_monteCarlo(self):
+        slotCounts = [5, 70, 100, 200, 7, 7, 3000]
+        rounds = 200000
+        wins = FairnessAnalysis.monteCarloWins(slotCounts, 0.1, rounds, seed=1, batch=3000)
+        self.assertEqual(int(wins.sum()), rounds)
+        for count, probability in zip(wins, FairnessAnalysis.analyticWinProbabilities(slotCounts)):
+            self.assertTrue(abs(count / rounds - probability) < 5 * math.sqrt(probability / rounds) + 1e-4)
+        self.assertEqual(list(wins), list(FairnessAnalysis.monteCarloWins(slotCounts, 0.1, rounds, seed=1)))
+        # a faster VDF wins more often
+        fast = FairnessAnalysis.monteCarloWins([10, 10], 0.1, 20000, 3.0, [20000, 10000], seed=2)
+        self.assertTrue(fast[0] > 0.53 * 20000)
+        # ties without noise are split evenly
+        even = FairnessAnalysis.monteCarloWins([2, 2], 0.0, 20000, seed=3)
+        self.assertTrue(abs(even[0] - 10000) < 500)
+
+    def test_gini(self):
+        self.assertAlmostEqual(FairnessAnalysis.gini([3, 3, 3]), 0.0)
+        self.assertAlmostEqual(FairnessAnalysis.gini([0, 0, 0, 1]), 0.75)
+        self.assertAlmostEqual(FairnessAnalysis.gini([1, 2], [2, 1]), FairnessAnalysis.gini([1, 1, 2]))
+
+    def test_klDivergence(self):
+        self.assertEqual(FairnessAnalysis.klDivergence([0.5, 0.5], [0.5, 0.5]), 0.0)
+        self.assertAlmostEqual(FairnessAnalysis.klDivergence([1, 0], [0.5, 0.5]), math.log(2))
+        self.assertEqual(FairnessAnalysis.klDivergence([0.5, 0.5], [1, 0]), math.inf)
+
+    def test_analyzeFairness(self):
+        stakes = [100 * UNIT, 100 * UNIT, 200 * UNIT, 400 * UNIT]
+        c = ComptrollerMinimalBigInt()
+        c.blockNumber = c.bootstrapPeriod
+        self.assertEqual(FairnessAnalysis.comptrollerParameters(c, stakes), ([8, 8, 4, 2], 0.1, 3.0))
+        report = FairnessAnalysis.analyzeFairness(c, stakes)
+        self.assertEqual(report.stakeShares, [0.125, 0.125, 0.25, 0.5])
+        self.assertAlmostEqual(sum(report.winProbabilities), 1.0, places=12)
+        self.assertTrue(report.winProbabilities[3] > 0.5) # large stakes are favoured
+        self.assertTrue(report.ratioGini > 0 and report.klDivergence > 0 and report.totalVariation > 0)
+        # the bootstrap virtual stake scales every slot count alike (here exactly)
+        bootstrap = FairnessAnalysis.analyzeFairness(ComptrollerMinimalBigInt(), stakes)
+        for a, b in zip(bootstrap.winProbabilities, report.winProbabilities):
+            self.assertAlmostEqual(a, b, places=12)
+        # float comptroller, same slots
+        floatReport = FairnessAnalysis.analyzeFairness(ComptrollerMinimal(), [100, 100, 200, 400])
+        self.assertEqual(floatReport.winProbabilities, report.winProbabilities)
+        with self.assertRaises(ValueError):
+            FairnessAnalysis.analyzeFairness(c, stakes, speeds=[1, 1, 1, 1])
+        if FairnessAnalysis.numpy is not None:
+            sampled = FairnessAnalysis.analyzeFairness(c, stakes, rounds=100000, seed=4)
+            self.assertTrue(abs(sampled.totalVariation - report.totalVariation) < 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+import heapq
+import random
+from array import array
+from collections import namedtuple
+
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt, UNIT
+
+try:
+    import numpy
+except ImportError: # pure Python fallback
+    numpy = None
+
+# Discrete-event simulation of a Pulsar network driving a
+# ComptrollerMinimalBigInt end to end.
+#
+# Every validator starts the VDF of the next block when the previous block
+# reaches it (the producer right away, the others after latency plus up to
+# jitter seconds), with the difficulty getConsensusDifficulty assigns to its
+# stake and a fresh VRF seed, and finishes difficulty / speed seconds later.
+# Finish events go through a heap in time order: the first one of a height
+# becomes the canonical block and is fed back with addBlockSample, a later
+# one from a validator the block had not reached yet is an orphan (a fork
+# the first-seen rule discards), anything else was abandoned.
+#
+# Only validators that can finish before the winner's block reaches everyone
+# get an event: the difficulty is monotonic in the exponent slot + noise, so
+# the integer slot alone (seed % slots) bounds each finish time, and the exact difficulty is only
+# computed for the few validators under the bound of the best one. With
+# NumPy the seeds are drawn as four 64-bit limbs and the slots computed limb
+# by limb for all validators at once (a different random stream than the
+# pure Python path, same model).
+
+MAX_SLOT = 64 # slots are capped at 64
+BOUND_SLACK = 1e-6 # relative, covers float vs fixed-point rounding of the bounds
+
+# coins: stake, fixed-point by UNIT; speed: VDF steps per second.
+Validator = namedtuple('Validator', ['coins', 'speed'])
+
+# blockTime: seconds since the parent, as fed to addBlockSample.
+BlockRecord = namedtuple('BlockRecord', ['height', 'time', 'winner', 'difficulty', 'blockTime'])
+
+
+class NetworkSimulator(object):
+
+    # False schedules every validator, for testing the bounds.
+    pruneEvents = True
+
+    # comptroller: a ComptrollerMinimalBigInt (or subclass), advanced in place.
+    # latency, jitter: block propagation takes latency + uniform(0, jitter) seconds.
+    # trace: keep a BlockRecord of every canonical block in self.blocks.
+    # totalCoins: stake of the whole chain, the validators' sum by default
+    # (a partition only sees some of them).
+    # start: time of the last block before the simulation.
+    def __init__(self, validators, comptroller=None, latency=1.0, jitter=0.0, seed=None, trace=False, useNumpy=None,
+                 totalCoins=None, start=0.0):
+        self.validators = list(validators)
+        assert( len(self.validators) > 0 )
+        if useNumpy is None:
+            useNumpy = numpy is not None
+        if useNumpy and numpy is None:
+            raise ImportError('numpy is not available')
+        self.useNumpy = useNumpy
+        self.comptroller = comptroller if comptroller is not None else ComptrollerMinimalBigInt()
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        if useNumpy:
+            self.generator = numpy.random.Generator(numpy.random.PCG64(self.rng.getrandbits(128)))
+        self.totalCoins = totalCoins if totalCoins is not None else sum(validator.coins for validator in self.validators)
+        self.inverseSpeeds = [1.0 / validator.speed for validator in self.validators]
+        if useNumpy:
+            self.inverseSpeeds = numpy.array(self.inverseSpeeds)
+
+        self.height = 0 # canonical blocks so far
+        self.time = start # time of the last canonical block
+        self.producer = None # of the last canonical block, None for genesis
+        self.arrivals = None # per validator, arrival time of the last canonical block
+        self.events = [] # heap of (finish time, sequence, height, validator, difficulty)
+        self.sequence = 0
+        self.slotCounts = None
+        self.slotCountsBootstrap = None
+        self.limbPowers = None # 2**(64 k) % slot count, per limb k and validator
+
+        self.wins = [0] * len(self.validators)
+        self.orphans = 0
+        self.blockTimes = array('d')
+        self.blocks = [] if trace else None
+
+    # per validator slot counts, they only change when the bootstrap ends.
+    def currentSlotCounts(self):
+        c = self.comptroller
+        bootstrap = c.blockNumber < c.bootstrapPeriod
+        if self.slotCounts is None or self.slotCountsBootstrap != bootstrap:
+            self.slotCounts = [c.slotCount(validator.coins, self.totalCoins) for validator in self.validators]
+            self.slotCountsBootstrap = bootstrap
+            if self.useNumpy:
+                # counts < 2**32, so limb % count times these stays below 2**64
+                self.slotCounts = numpy.array(self.slotCounts, dtype=numpy.uint64)
+                self.limbPowers = [numpy.array([pow(2, 64 * k, int(count)) for count in self.slotCounts], dtype=numpy.uint64)
+                                   for k in range(4)]
+        return self.slotCounts
+
+    # VRF seeds, integer slots (capped) and arrival times of the last block
+    # for every validator.
+    def drawPython(self):
+        rng = self.rng
+        n = len(self.validators)
+        seeds = [rng.getrandbits(256) for i in range(n)]
+        slots = [seed % count for seed, count in zip(seeds, self.currentSlotCounts())]
+        slots = [slot if slot < MAX_SLOT else MAX_SLOT for slot in slots]
+        start = self.time + self.latency
+        arrivals = [start + self.jitter * rng.random() for i in range(n)]
+        return seeds, slots, arrivals
+
+    def drawNumpy(self):
+        n = len(self.validators)
+        counts = self.currentSlotCounts()
+        limbs = self.generator.bit_generator.random_raw((4, n))
+        slots = numpy.zeros(n, dtype=numpy.uint64)
+        for k in range(4):
+            slots = (slots + (limbs[k] % counts) * self.limbPowers[k] % counts) % counts
+        slots = numpy.minimum(slots, MAX_SLOT).astype(numpy.intp)
+        arrivals = self.time + self.latency + self.jitter * self.generator.random(n)
+        return limbs, slots, arrivals
+
+    # draws the VRF seeds of the next height and pushes the finish events
+    # of every validator that could produce it.
+    def scheduleNextHeight(self):
+        c = self.comptroller
+        blockTimeFactor = c.blockTimeFactor / UNIT
+        speedRatio = c.speedRatio / UNIT
+        # bounds of the steps of slot n: the exponent is in [n, n + noise]
+        # (capped), the steps are monotonic in it either way of speedRatio
+        noise = c.noiseFractionSlots / UNIT
+        ends = [(blockTimeFactor * speedRatio ** n, blockTimeFactor * speedRatio ** min(n + noise, MAX_SLOT))
+                for n in range(MAX_SLOT + 1)]
+        lowSteps = [min(steps) * (1 - BOUND_SLACK) - 1 for steps in ends]
+        highSteps = [max(steps) * (1 + BOUND_SLACK) + 2 for steps in ends]
+        # finish time bounds after the last block: the lower ones ignore
+        # latency, the upper one of the best validator includes it, and a
+        # block can still fork until it reached everyone
+        if self.useNumpy:
+            limbs, slots, arrivals = self.drawNumpy()
+            lower = numpy.array(lowSteps)[slots] * self.inverseSpeeds
+            best = int(numpy.argmin(lower))
+        else:
+            seeds, slots, arrivals = self.drawPython()
+            lower = [lowSteps[slot] * inverse for slot, inverse in zip(slots, self.inverseSpeeds)]
+            best = min(range(len(lower)), key=lower.__getitem__)
+        threshold = highSteps[slots[best]] * self.inverseSpeeds[best] + 2 * (self.latency + self.jitter)
+        if self.producer is not None:
+            arrivals[self.producer] = self.time
+        self.arrivals = arrivals
+
+        if not self.pruneEvents:
+            candidates = range(len(self.validators))
+        elif self.useNumpy:
+            candidates = numpy.nonzero(lower <= threshold)[0].tolist()
+        else:
+            candidates = [v for v, bound in enumerate(lower) if bound <= threshold]
+        height = self.height + 1
+        for v in candidates:
+            if self.useNumpy:
+                seed = int(limbs[0, v]) | int(limbs[1, v]) << 64 | int(limbs[2, v]) << 128 | int(limbs[3, v]) << 192
+            else:
+                seed = seeds[v]
+            difficulty = c.getConsensusDifficulty(self.validators[v].coins, self.totalCoins, seed)
+            finish = float(arrivals[v]) + difficulty * float(self.inverseSpeeds[v])
+            heapq.heappush(self.events, (finish, self.sequence, height, v, difficulty))
+            self.sequence += 1
+
+    def acceptBlock(self, time, validator, difficulty):
+        blockTime = max(1, int(round(time - self.time))) # integer seconds, see addBlockSample
+        self.comptroller.addBlockSample(blockTime, difficulty)
+        self.height += 1
+        self.time = time
+        self.producer = validator
+        self.wins[validator] += 1
+        self.blockTimes.append(blockTime)
+        if self.blocks is not None:
+            self.blocks.append(BlockRecord(self.height, time, validator, difficulty, blockTime))
+
+    # simulates until blocks more canonical blocks, or until the simulated
+    # time passes until (seconds), whichever comes first.
+    def run(self, blocks=None, until=None):
+        assert( blocks is not None or until is not None )
+        target = None if blocks is None else self.height + blocks
+        if not self.events:
+            self.scheduleNextHeight()
+        while self.events and (target is None or self.height < target):
+            time, sequence, height, validator, difficulty = heapq.heappop(self.events)
+            if until is not None and time > until:
+                heapq.heappush(self.events, (time, sequence, height, validator, difficulty))
+                break
+            if height == self.height + 1:
+                self.acceptBlock(time, validator, difficulty)
+                self.scheduleNextHeight()
+            elif height == self.height and time < self.arrivals[validator]:
+                self.orphans += 1
+        return self.summary()
+
+    def summary(self):
+        blocks = len(self.blockTimes)
+        return {
+            'blocks': blocks,
+            'time': self.time,
+            'meanBlockTime': sum(self.blockTimes) / blocks if blocks else None,
+            'orphans': self.orphans,
+            'orphanRate': self.orphans / blocks if blocks else None,
+            'wins': list(self.wins),
+            'blockTimeFactor': self.comptroller.blockTimeFactor,
+            'speedRatio': self.comptroller.speedRatio,
+        }
+
+
+if __name__ == '__main__':
+
+    import time
+    rng = random.Random(1)
+    validators = [Validator(rng.randint(1, 1000) * UNIT, rng.uniform(5000, 15000)) for i in range(1000)]
+    sim = NetworkSimulator(validators, latency=1.0, jitter=1.0, seed=1)
+    start = time.time()
+    summary = sim.run(blocks=60 * 60 * 24 * 365 // 40)
+    print('Elapsed: ', format(time.time() - start, '.1f'), 'secs')
+    for name in ['blocks', 'time', 'meanBlockTime', 'orphans', 'orphanRate', 'blockTimeFactor', 'speedRatio']:
+        print(name + ': ', summary[name])
@@ -0,0 +1,105 @@
+import unittest
+import random
+
+import NetworkSimulator
+from NetworkSimulator import Validator
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt, UNIT
+
+class TestNetworkSimulator(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(12)
+        self.validators = [Validator(rng.randint(1, 1000) * UNIT, rng.uniform(5000, 15000)) for i in range(100)]
+
+    def simulator(self, **args):
+        return NetworkSimulator.NetworkSimulator(self.validators, latency=1.0, jitter=0.5, seed=4, trace=True, **args)
+
+    def checkRun(self, useNumpy):
+        sim = self.simulator(useNumpy=useNumpy)
+        summary = sim.run(blocks=300)
+        self.assertEqual(summary['blocks'], 300)
+        self.assertEqual(sum(summary['wins']), 300)
+        self.assertEqual(sim.comptroller.blockNumber, 300)
+        self.assertEqual([block.height for block in sim.blocks], list(range(1, 301)))
+        self.assertTrue(all(block.blockTime >= 1 for block in sim.blocks))
+        self.assertTrue(all(a.time <= b.time for a, b in zip(sim.blocks, sim.blocks[1:])))
+        # same seed, same run
+        again = self.simulator(useNumpy=useNumpy)
+        again.run(blocks=300)
+        self.assertEqual(again.blocks, sim.blocks)
+        # the bounds never drop a validator that could win or fork
+        full = self.simulator(useNumpy=useNumpy)
+        full.pruneEvents = False
+        full.run(blocks=300)
+        self.assertEqual(full.blocks, sim.blocks)
+        self.assertEqual(full.orphans, sim.orphans)
+        # winners were fed to the comptroller
+        reference = ComptrollerMinimalBigInt()
+        for block in sim.blocks:
+            reference.addBlockSample(block.blockTime, block.difficulty)
+        self.assertEqual(reference.journalState(), sim.comptroller.journalState())
+
+    def test_runPython(self):
+        self.checkRun(False)
+
+    @unittest.skipIf(NetworkSimulator.numpy is None, 'numpy not installed')
+    def test_runNumpy(self):
+        self.checkRun(True)
+        sim = self.simulator(useNumpy=True)
+        limbs, slots, arrivals = sim.drawNumpy()
+        for v in range(len(self.validators)):
+            seed = int(limbs[0, v]) | int(limbs[1, v]) << 64 | int(limbs[2, v]) << 128 | int(limbs[3, v]) << 192
+            self.assertEqual(slots[v], min(seed % int(sim.slotCounts[v]), NetworkSimulator.MAX_SLOT))
+
+    # the bounds hold for noise over one slot and for speedRatio <= 1
+    def test_boundsAnyParameters(self):
+        class WideNoise(ComptrollerMinimalBigInt):
+            noiseFractionSlots = 3 * UNIT // 2
+        for useNumpy in [False, True] if NetworkSimulator.numpy is not None else [False]:
+            sim = self.simulator(useNumpy=useNumpy, comptroller=WideNoise())
+            sim.run(blocks=200)
+            full = self.simulator(useNumpy=useNumpy, comptroller=WideNoise())
+            full.pruneEvents = False
+            full.run(blocks=200)
+            self.assertEqual(full.blocks, sim.blocks)
+            self.assertEqual(full.orphans, sim.orphans)
+            # few large stakes, slots under the cap
+            rng = random.Random(3)
+            validators = [Validator(rng.randint(1000, 5000) * UNIT, rng.uniform(9000, 11000)) for i in range(10)]
+            for speedRatio in [UNIT * 9 // 10, UNIT]:
+                for noiseFractionSlots in [UNIT // 10, 3 * UNIT // 2]:
+                    sims = []
+                    for pruneEvents in [True, False]:
+                        c = ComptrollerMinimalBigInt()
+                        c.speedRatio = speedRatio
+                        c.noiseFractionSlots = noiseFractionSlots
+                        sim = NetworkSimulator.NetworkSimulator(validators, c, latency=0.0, seed=4, useNumpy=useNumpy)
+                        sim.pruneEvents = pruneEvents
+                        sims.append(sim)
+                    for height in range(200): # same draws, the comptrollers stay put
+                        heights = []
+                        for sim in sims:
+                            sim.events = []
+                            sim.scheduleNextHeight()
+                            # (finish, validator, difficulty), sequences differ
+                            heights.append(sorted((event[0], event[3], event[4]) for event in sim.events))
+                        pruned, events = heights
+                        # without latency only the first finish can win, it was scheduled
+                        deadline = events[0][0]
+                        self.assertEqual([event for event in pruned if event[0] <= deadline],
+                                         [event for event in events if event[0] <= deadline])
+
+    def test_until(self):
+        sim = self.simulator(useNumpy=False)
+        sim.run(until=500.0)
+        self.assertLessEqual(sim.time, 500.0)
+        self.assertGreater(sim.events[0][0], 500.0)
+        blocks = sim.height
+        sim.run(blocks=10)
+        self.assertEqual(sim.height, blocks + 10)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
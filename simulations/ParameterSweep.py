@@ -0,0 +1,227 @@
+import csv
+import inspect
+import itertools
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt, UNIT
+from NetworkSimulator import NetworkSimulator, Validator
+
+# Monte Carlo sweep of the consensus parameters (windowSize, min/maxSpeedRatio,
+# noiseFractionSlots, bootstrapVirtualStake, or any other class attribute).
+#
+#   sweep({'windowSize': [540, 2160, 15120], 'noiseFractionSlots': [...]}, range(8), 'sweep.csv')
+#
+# Every grid point becomes a subclass of the base comptroller with those
+# class attributes overridden, and runs once per seed in a process pool.
+# Each run appends one CSV row (parameters, seed, summary metrics) as soon as
+# it finishes, so an interrupted sweep resumes where it stopped: rerunning
+# it skips the (parameters, seed) pairs already in the file.
+#
+# The results file is row-oriented on purpose: a columnar file (per-column
+# arrays, like the Snapshot format) has to be rewritten as a whole to add a
+# run, so a crash mid-write could lose every run before it, while a CSV line
+# is appended and flushed on its own and a torn last line is simply dropped
+# on resume. readResults turns the rows into columns for analysis.
+#
+# Parameter values are in the units of the base class, fixed-point by UNIT
+# for the ComptrollerMinimalBigInt ratios and stakes. Grid names that are not
+# class attributes of the base go to the run function as keyword arguments
+# (scenario settings such as validators or latency).
+
+METRICS = ['blocks', 'meanBlockTime', 'stdevBlockTime', 'orphanRate', 'blockTimeFactor', 'speedRatio', 'maxShareError']
+
+
+# list of dicts, the cartesian product of grid (name: values).
+def parameterGrid(grid):
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def comptrollerClass(base, parameters):
+    for name in parameters:
+        if not hasattr(base, name):
+            raise AttributeError(base.__name__ + ' has no parameter ' + name)
+    return type(base.__name__ + 'Sweep', (base,), dict(parameters))
+
+
+# random validator set: stakes in [1, 1000] coins, speeds in [5000, 15000] steps per second.
+def randomValidators(count, rng):
+    stakes = [rng.randint(1, 1000) for i in range(count)]
+    speeds = [rng.uniform(5000, 15000) for i in range(count)]
+    return stakes, speeds
+
+
+# Zero latency network for the float ComptrollerMinimal: each block goes to
+# the first validator to finish its VDF. Returns (block times, wins).
+def minimalRun(comptroller, stakes, speeds, blocks, rng):
+    totalCoins = sum(stakes)
+    inverseSpeeds = [1.0 / speed for speed in speeds]
+    blockTimes = []
+    wins = [0] * len(stakes)
+    for i in range(blocks):
+        seeds = [rng.getrandbits(256) for stake in stakes]
+        difficulties = comptroller.getConsensusDifficulties(stakes, totalCoins, seeds).difficulties
+        times = [difficulty * inverse for difficulty, inverse in zip(difficulties, inverseSpeeds)]
+        winner = min(range(len(times)), key=times.__getitem__)
+        blockTime = max(1, int(round(times[winner])))
+        comptroller.addBlockSample(blockTime, difficulties[winner])
+        blockTimes.append(blockTime)
+        wins[winner] += 1
+    return blockTimes, wins
+
+
+# default run: a random validator set produces blocks blocks, on the
+# NetworkSimulator for ComptrollerMinimalBigInt and on minimalRun otherwise.
+def runScenario(comptroller, seed, validators=100, blocks=1000, latency=1.0, jitter=1.0):
+    rng = random.Random(seed)
+    stakes, speeds = randomValidators(validators, rng)
+    if isinstance(comptroller, ComptrollerMinimalBigInt):
+        sim = NetworkSimulator([Validator(stake * UNIT, speed) for stake, speed in zip(stakes, speeds)],
+                               comptroller, latency, jitter, seed=rng.getrandbits(64))
+        sim.run(blocks=blocks)
+        blockTimes, wins, orphans, scale = sim.blockTimes, sim.wins, sim.orphans, UNIT
+    else:
+        blockTimes, wins = minimalRun(comptroller, stakes, speeds, blocks, rng)
+        orphans, scale = 0, 1
+    totalCoins = sum(stakes)
+    return {
+        'blocks': len(blockTimes),
+        'meanBlockTime': statistics.fmean(blockTimes),
+        'stdevBlockTime': statistics.pstdev(blockTimes),
+        'orphanRate': orphans / len(blockTimes),
+        'blockTimeFactor': comptroller.blockTimeFactor / scale,
+        'speedRatio': comptroller.speedRatio / scale,
+        'maxShareError': max(abs(win / len(blockTimes) - stake / totalCoins) for win, stake in zip(wins, stakes)),
+    }
+
+
+# (class attributes, run keyword arguments) of a grid point.
+def splitParameters(base, run, parameters):
+    accepted = inspect.signature(run).parameters
+    attributes = {}
+    runArgs = {}
+    for name, value in parameters.items():
+        if hasattr(base, name):
+            attributes[name] = value
+        elif name in accepted:
+            runArgs[name] = value
+        else:
+            raise AttributeError(base.__name__ + ' has no parameter ' + name)
+    return attributes, runArgs
+
+
+# one run in a worker process, the subclass is built there (it cannot be pickled).
+def sweepTask(task):
+    base, parameters, seed, run, runArgs = task
+    attributes, pointArgs = splitParameters(base, run, parameters)
+    comptroller = comptrollerClass(base, attributes)()
+    return parameters, seed, run(comptroller, seed, **dict(runArgs, **pointArgs))
+
+
+# key of a row, as the CSV module writes it.
+def resultKey(values):
+    return tuple(str(value) for value in values)
+
+
+# Opens (or creates) the results file for appending: checks the header,
+# drops a last row torn by an interruption and returns the keys
+# (parameters and seed) of the rows already there.
+def prepareResults(path, columns, keyLength):
+    done = set()
+    if os.path.exists(path):
+        with open(path, 'rb+') as f:
+            content = f.read()
+            if not content.endswith(b'\n'):
+                content = content[:content.rfind(b'\n') + 1]
+                f.truncate(len(content))
+        rows = list(csv.reader(content.decode('utf-8').splitlines()))
+        if rows:
+            if rows[0] != columns:
+                raise ValueError('results file ' + str(path) + ' has other columns: ' + ','.join(rows[0]))
+            done = set(resultKey(row[:keyLength]) for row in rows[1:] if len(row) == len(columns))
+            return done
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerow(columns)
+    return done
+
+
+# Runs every grid point (a dict of lists, or a list of parameter dicts) once
+# per seed and streams the rows to path. workers: pool size, None for
+# os.cpu_count(), 1 runs in this process. run(comptroller, seed, **runArgs)
+# returns a dict with the metrics columns. Returns the number of runs done.
+def sweep(grid, seeds, path, base=ComptrollerMinimalBigInt, workers=None, run=runScenario, metrics=METRICS, **runArgs):
+    points = parameterGrid(grid) if isinstance(grid, dict) else list(grid)
+    names = sorted(points[0]) if points else []
+    assert( all(sorted(point) == names for point in points) )
+    for point in points: # fail before starting any run
+        splitParameters(base, run, point)
+    if set(names) & set(metrics):
+        raise ValueError('parameters and metrics share columns: ' + ','.join(sorted(set(names) & set(metrics))))
+    columns = names + ['seed'] + list(metrics)
+    done = prepareResults(path, columns, len(names) + 1)
+    tasks = [(base, point, seed, run, runArgs) for point in points for seed in seeds
+             if resultKey([point[name] for name in names] + [seed]) not in done]
+
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f)
+
+        def write(result):
+            parameters, seed, summary = result
+            writer.writerow([parameters[name] for name in names] + [seed] + [summary[name] for name in metrics])
+            f.flush()
+
+        if workers == 1:
+            for task in tasks:
+                write(sweepTask(task))
+            return len(tasks)
+        limit = 2 * (workers or os.cpu_count() or 1) # runs queued at once
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            queue = iter(tasks)
+            pending = set()
+            while True:
+                for task in itertools.islice(queue, limit - len(pending)):
+                    pending.add(executor.submit(sweepTask, task))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write(future.result())
+    return len(tasks)
+
+
+# results file as a dict of columns, numbers converted back.
+def readResults(path):
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    columns = {name: [] for name in rows[0]}
+    for row in rows[1:]:
+        if len(row) != len(rows[0]):
+            continue
+        for name, value in zip(rows[0], row):
+            columns[name].append(parseValue(value))
+    return columns
+
+
+def parseValue(value):
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return value
+
+
+if __name__ == '__main__':
+
+    grid = {
+        'windowSize': [540, 2160, 15120],
+        'noiseFractionSlots': [5 * (UNIT//10**2), 10 * (UNIT//10**2), 20 * (UNIT//10**2)],
+    }
+    runs = sweep(grid, range(4), 'sweep.csv', validators=100, blocks=2000)
+    print('Runs: ', runs)
+    results = readResults('sweep.csv')
+    for i in range(len(results['seed'])):
+        print({name: column[i] for name, column in results.items()})
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+import ParameterSweep
+from ComptrollerMinimal import ComptrollerMinimal
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt, UNIT
+
+class TestParameterSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'sweep.csv')
+        self.grid = {'windowSize': [540, 15120], 'maxSpeedRatio': [31 * (UNIT//10), 40 * (UNIT//10)]}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def runSweep(self, workers=1, path=None):
+        return ParameterSweep.sweep(self.grid, [1, 2], path or self.path, workers=workers, validators=20, blocks=50)
+
+    def test_parameterGrid(self):
+        points = ParameterSweep.parameterGrid({'b': [1, 2], 'a': [3]})
+        self.assertEqual(points, [{'a': 3, 'b': 1}, {'a': 3, 'b': 2}])
+
+    def test_comptrollerClass(self):
+        cls = ParameterSweep.comptrollerClass(ComptrollerMinimal, {'windowSize': 540, 'minSpeedRatio': 1.1})
+        c = cls()
+        self.assertTrue(isinstance(c, ComptrollerMinimal))
+        self.assertEqual((c.windowSize, c.minSpeedRatio), (540, 1.1))
+        self.assertEqual(ComptrollerMinimal.windowSize, 15120)
+        with self.assertRaises(AttributeError):
+            ParameterSweep.comptrollerClass(ComptrollerMinimal, {'windowsize': 540})
+
+    def test_runScenario(self):
+        for base in [ComptrollerMinimal, ComptrollerMinimalBigInt]:
+            summary = ParameterSweep.runScenario(base(), 3, validators=20, blocks=50)
+            self.assertEqual(summary['blocks'], 50)
+            self.assertEqual(sorted(summary), sorted(ParameterSweep.METRICS))
+            self.assertEqual(summary, ParameterSweep.runScenario(base(), 3, validators=20, blocks=50))
+
+    def test_sweep(self):
+        self.assertEqual(self.runSweep(), 8)
+        results = ParameterSweep.readResults(self.path)
+        self.assertEqual(list(results), ['maxSpeedRatio', 'windowSize', 'seed'] + ParameterSweep.METRICS)
+        self.assertEqual(results['blocks'], [50] * 8)
+        self.assertEqual(sorted(zip(results['windowSize'], results['maxSpeedRatio'], results['seed'])),
+                         sorted((w, r, s) for w in [540, 15120] for r in [31 * (UNIT//10), 40 * (UNIT//10)] for s in [1, 2]))
+        # the overridden windowSize changes the controller
+        self.assertNotEqual(results['blockTimeFactor'][0], results['blockTimeFactor'][2])
+        # done runs are skipped
+        self.assertEqual(self.runSweep(), 0)
+
+    def test_resume(self):
+        self.runSweep()
+        with open(self.path) as f:
+            lines = f.readlines()
+        # interrupted in the middle of the sixth row
+        with open(self.path, 'w') as f:
+            f.writelines(lines[:6])
+            f.write(lines[6][:10])
+        self.assertEqual(self.runSweep(), 3)
+        with open(self.path) as f:
+            self.assertEqual(sorted(f.readlines()), sorted(lines))
+
+    def test_pool(self):
+        other = os.path.join(self.directory.name, 'pool.csv')
+        self.runSweep()
+        self.assertEqual(self.runSweep(workers=2, path=other), 8)
+        with open(self.path) as f, open(other) as g:
+            self.assertEqual(sorted(f.readlines()), sorted(g.readlines()))
+
+    def test_runArguments(self):
+        grid = {'windowSize': [540], 'validators': [10, 20]}
+        self.assertEqual(ParameterSweep.sweep(grid, [1], self.path, workers=1, blocks=30), 2)
+        self.assertEqual(ParameterSweep.readResults(self.path)['validators'], [10, 20])
+        with self.assertRaises(ValueError):
+            ParameterSweep.sweep({'blocks': [30]}, [1], self.path + '.other', workers=1)
+        with self.assertRaises(AttributeError):
+            ParameterSweep.sweep({'windowsize': [540]}, [1], self.path + '.other', workers=1)
+
+    def test_columns(self):
+        self.runSweep()
+        with self.assertRaises(ValueError):
+            ParameterSweep.sweep({'windowSize': [540]}, [1], self.path, workers=1, validators=20, blocks=50)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
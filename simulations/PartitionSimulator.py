@@ -0,0 +1,144 @@
+import math
+import random
+
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt, UNIT
+from NetworkSimulator import NetworkSimulator, Validator
+from ParameterSweep import randomValidators
+
+# Network partition and reconciliation (RESEARCH.md question 4: a 55% / 45%
+# split of the nodes, does it affect consensus, can the forks reconcile?).
+#
+# The network runs together up to the split, then each side mines its own
+# fork for partitionTime seconds on a clone of the comptroller at the split
+# (the shared snapshot), with the slots still computed over the whole stake.
+# At the heal the fork with the smallest average VDF steps per block wins
+# (the Average Fastest Chain fork choice, see README.md), the losing side
+# rolls its comptroller back to the split and replays the winning blocks,
+# and the merged network mines on. A control network that never split runs
+# alongside from the same snapshot.
+#
+# Reported per scenario:
+#   reorgDepth: blocks the losing side drops.
+#   finalityDepth: speedRatio + 1 confirmations of the losing side at the
+#       heal (SPECS.md), finalityViolated when the reorg is deeper.
+#   reconciled: the losing comptroller ends in exactly the winner's state.
+#   blockTimeFactorDivergence, speedRatioDivergence: largest relative
+#       difference of a side's controller against the control at the heal.
+#   convergenceTime: seconds after the heal until the merged controller is
+#       back within tolerance of the control, None if not within maxTime.
+
+METRICS = ['blocksA', 'blocksB', 'winner', 'reorgDepth', 'finalityDepth', 'finalityViolated', 'reconciled',
+           'blockTimeFactorDivergence', 'speedRatioDivergence', 'convergenceTime']
+
+
+def relativeDifference(value, reference):
+    return abs(value - reference) / reference
+
+
+class PartitionSimulator(object):
+
+    # validators: list of Validator, the first side gets fraction of them
+    # (chosen at random with seed).
+    # comptroller: ComptrollerMinimalBigInt (or subclass) at the start,
+    # not modified; the other arguments as in NetworkSimulator.
+    def __init__(self, validators, comptroller=None, fraction=0.55, latency=1.0, jitter=0.0, seed=None, useNumpy=None):
+        self.validators = list(validators)
+        self.comptroller = comptroller if comptroller is not None else ComptrollerMinimalBigInt()
+        self.latency = latency
+        self.jitter = jitter
+        self.useNumpy = useNumpy
+        self.rng = random.Random(seed)
+        self.totalCoins = sum(validator.coins for validator in self.validators)
+        order = list(range(len(self.validators)))
+        self.rng.shuffle(order)
+        split = int(round(fraction * len(order)))
+        self.sides = [sorted(order[:split]), sorted(order[split:])]
+        assert( self.sides[0] and self.sides[1] )
+
+    def network(self, indices, comptroller, start):
+        return NetworkSimulator([self.validators[i] for i in indices], comptroller, self.latency, self.jitter,
+                                seed=self.rng.getrandbits(64), trace=True, useNumpy=self.useNumpy,
+                                totalCoins=self.totalCoins, start=start)
+
+    # warmup: blocks of the whole network before the split.
+    # checkInterval: seconds between convergence checks after the heal.
+    # tolerance: relative, for blockTimeFactor and speedRatio.
+    def run(self, partitionTime, warmup=0, maxTime=2 * 24 * 3600, checkInterval=600, tolerance=0.05):
+        everyone = range(len(self.validators))
+        snapshot = self.comptroller.clone()
+        splitTime = 0.0
+        if warmup:
+            shared = self.network(everyone, snapshot, 0.0)
+            shared.run(blocks=warmup)
+            splitTime = shared.time
+        splitBlock = snapshot.blockNumber
+        heal = splitTime + partitionTime
+
+        sides = [self.network(indices, snapshot.clone(), splitTime) for indices in self.sides]
+        control = self.network(everyone, snapshot.clone(), splitTime)
+        for sim in sides + [control]:
+            sim.run(until=heal)
+
+        # Average Fastest Chain, a side without blocks loses
+        averages = [sum(block.difficulty for block in sim.blocks) / len(sim.blocks) if sim.blocks else math.inf
+                    for sim in sides]
+        winner = min([0, 1], key=lambda side: (averages[side], -len(sides[side].blocks)))
+        winning, losing = sides[winner].comptroller, sides[1 - winner].comptroller
+        reorgDepth = len(sides[1 - winner].blocks)
+        finalityDepth = losing.speedRatio // UNIT + 1
+        c = control.comptroller
+        result = {
+            'blocksA': len(sides[0].blocks),
+            'blocksB': len(sides[1].blocks),
+            'winner': 'AB'[winner],
+            'reorgDepth': reorgDepth,
+            'finalityDepth': finalityDepth,
+            'finalityViolated': reorgDepth > finalityDepth,
+            'blockTimeFactorDivergence': max(relativeDifference(sim.comptroller.blockTimeFactor, c.blockTimeFactor) for sim in sides),
+            'speedRatioDivergence': max(relativeDifference(sim.comptroller.speedRatio, c.speedRatio) for sim in sides),
+        }
+
+        # reconciliation of the losing side
+        try:
+            losing.rollbackTo(splitBlock)
+            for block in sides[winner].blocks:
+                losing.addBlockSample(block.blockTime, block.difficulty)
+        except ValueError: # deeper than the undo journal, resync from the winner
+            losing = winning.clone()
+        result['reconciled'] = losing.journalState() == winning.journalState()
+
+        merged = self.network(everyone, losing, heal)
+        result['convergenceTime'] = None
+        time = heal
+        while True:
+            if (relativeDifference(losing.blockTimeFactor, c.blockTimeFactor) <= tolerance and
+                    relativeDifference(losing.speedRatio, c.speedRatio) <= tolerance):
+                result['convergenceTime'] = time - heal
+                break
+            if time >= heal + maxTime:
+                break
+            time += checkInterval
+            merged.run(until=time)
+            control.run(until=time)
+        return result
+
+
+# ParameterSweep run function, for many scenarios in a process pool:
+#   sweep({'fraction': [0.5, 0.55, 0.7], 'partitionTime': [3600, 21600]}, range(100), 'partitions.csv',
+#         run=partitionRun, metrics=METRICS)
+def partitionRun(comptroller, seed, validators=100, fraction=0.55, partitionTime=6 * 3600, warmup=0, latency=1.0,
+                 jitter=1.0, maxTime=2 * 24 * 3600, checkInterval=600, tolerance=0.05):
+    rng = random.Random(seed)
+    stakes, speeds = randomValidators(validators, rng)
+    sim = PartitionSimulator([Validator(stake * UNIT, speed) for stake, speed in zip(stakes, speeds)], comptroller,
+                             fraction, latency, jitter, seed=rng.getrandbits(64))
+    return sim.run(partitionTime, warmup, maxTime, checkInterval, tolerance)
+
+
+if __name__ == '__main__':
+
+    import time
+    start = time.time()
+    for seed in range(10):
+        print(partitionRun(ComptrollerMinimalBigInt(), seed))
+    print('Elapsed: ', format(time.time() - start, '.1f'), 'secs')
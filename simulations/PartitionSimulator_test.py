@@ -0,0 +1,55 @@
+import os
+import random
+import tempfile
+import unittest
+
+import ParameterSweep
+import PartitionSimulator
+from NetworkSimulator import Validator
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt, UNIT
+
+class TestPartitionSimulator(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.validators = [Validator(rng.randint(1, 1000) * UNIT, rng.uniform(5000, 15000)) for i in range(40)]
+
+    def simulator(self, comptroller=None):
+        return PartitionSimulator.PartitionSimulator(self.validators, comptroller, fraction=0.55, latency=1.0, jitter=0.5, seed=3)
+
+    def test_sides(self):
+        sim = self.simulator()
+        self.assertEqual(len(sim.sides[0]), 22)
+        self.assertEqual(sorted(sim.sides[0] + sim.sides[1]), list(range(40)))
+
+    def test_run(self):
+        c = ComptrollerMinimalBigInt()
+        result = self.simulator(c).run(1800, warmup=50, maxTime=1800)
+        self.assertEqual(sorted(result), sorted(PartitionSimulator.METRICS))
+        self.assertTrue(result['reconciled'])
+        self.assertEqual(result['reorgDepth'], result['blocksB' if result['winner'] == 'A' else 'blocksA'])
+        self.assertEqual(result['finalityViolated'], result['reorgDepth'] > result['finalityDepth'])
+        self.assertTrue(result['blockTimeFactorDivergence'] > 0)
+        # the starting comptroller is only cloned
+        self.assertEqual(c.journalState(), ComptrollerMinimalBigInt().journalState())
+        # same seed, same scenario
+        self.assertEqual(self.simulator(c).run(1800, warmup=50, maxTime=1800), result)
+
+    def test_journalExhausted(self):
+        class ShortJournal(ComptrollerMinimalBigInt):
+            windowExtraBuffer = 2
+        result = self.simulator(ShortJournal()).run(1800, maxTime=0)
+        self.assertTrue(result['reorgDepth'] > 2)
+        self.assertTrue(result['reconciled'])
+
+    def test_sweep(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'partitions.csv')
+            runs = ParameterSweep.sweep({'fraction': [0.55, 0.7]}, [1], path, workers=1, run=PartitionSimulator.partitionRun,
+                                        metrics=PartitionSimulator.METRICS, validators=20, partitionTime=600, maxTime=600)
+            self.assertEqual(runs, 2)
+            self.assertEqual(ParameterSweep.readResults(path)['fraction'], [0.55, 0.7])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+from array import array
+
+INT64_MIN = -2**63
+INT64_MAX = 2**63 - 1
+
+
+# Fixed-capacity circular buffer over a typed array (no per-item objects).
+# Appending when full overwrites the oldest item, popping removes the newest.
+# Indexing follows list semantics (negative from newest), slices are views.
+#
+# A typed array converts what it stores ('d' turns ints into floats). With
+# exact=True the buffer switches to a Python list (typecode 'O') the first
+# time a value would not come back unchanged: another type than the array
+# holds, or an int outside 64 bits. Typecode 'O' is a list from the start.
+class RingBuffer(object):
+
+    def __init__(self, capacity, typecode='d', exact=False):
+        assert( capacity > 0 )
+        self.capacity = capacity
+        self.typecode = typecode
+        self.exact = exact
+        if typecode == 'O':
+            self.data = [0] * capacity
+        else:
+            self.data = array(typecode, bytes(array(typecode).itemsize * capacity))
+        self.start = 0 # physical position of the oldest item
+        self.length = 0
+
+    def fits(self, value):
+        if self.typecode == 'd':
+            return type(value) is float
+        if self.typecode == 'q':
+            return type(value) is int and INT64_MIN <= value <= INT64_MAX
+        return self.typecode == 'O'
+
+    # switches the storage to a Python list, O(capacity), at most once.
+    def promote(self):
+        self.data = self.data.tolist()
+        self.typecode = 'O'
+
+    # returns the evicted oldest item, or None if there was room.
+    def append(self, value):
+        if self.exact and not self.fits(value):
+            self.promote()
+        evicted = None
+        if self.length == self.capacity:
+            evicted = self.data[self.start]
+            self.data[self.start] = value
+            self.start += 1
+            if self.start == self.capacity:
+                self.start = 0
+        else:
+            end = self.start + self.length
+            if end >= self.capacity:
+                end -= self.capacity
+            self.data[end] = value
+            self.length += 1
+        return evicted
+
+    # fits for a whole list, at C speed.
+    def fitsAll(self, values):
+        types = set(map(type, values))
+        if self.typecode == 'd':
+            return types <= {float}
+        if self.typecode == 'q':
+            return types <= {int} and (not values or (INT64_MIN <= min(values) and max(values) <= INT64_MAX))
+        return self.typecode == 'O'
+
+    # appends the values of a list in order, the same as append for each
+    # one, with at most two slice writes.
+    def extend(self, values):
+        if self.exact and not self.fitsAll(values):
+            self.promote()
+        if len(values) > self.capacity:
+            values = values[-self.capacity:]
+        count = len(values)
+        end = self.start + self.length
+        if end >= self.capacity:
+            end -= self.capacity
+        first = min(count, self.capacity - end)
+        if self.typecode == 'O':
+            self.data[end:end + first] = values[:first]
+            self.data[:count - first] = values[first:]
+        else:
+            self.data[end:end + first] = array(self.typecode, values[:first])
+            self.data[:count - first] = array(self.typecode, values[first:])
+        overflow = self.length + count - self.capacity
+        if overflow > 0:
+            self.start += overflow
+            if self.start >= self.capacity:
+                self.start -= self.capacity
+            self.length = self.capacity
+        else:
+            self.length += count
+
+    def pop(self):
+        if self.length == 0:
+            raise IndexError('pop from empty RingBuffer')
+        self.length -= 1
+        end = self.start + self.length
+        if end >= self.capacity:
+            end -= self.capacity
+        return self.data[end]
+
+    def clear(self):
+        self.start = 0
+        self.length = 0
+
+    def physical(self, index):
+        if index < 0:
+            index += self.length
+        if index < 0 or index >= self.length:
+            raise IndexError('RingBuffer index out of range')
+        index += self.start
+        if index >= self.capacity:
+            index -= self.capacity
+        return index
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RingBufferView(self, range(*index.indices(self.length)))
+        return self.data[self.physical(index)]
+
+    def __setitem__(self, index, value):
+        if self.exact and not self.fits(value):
+            self.promote()
+        self.data[self.physical(index)] = value
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self[i]
+
+    # view of the newest n items (all of them if there are fewer).
+    def window(self, n):
+        return RingBufferView(self, range(max(self.length - n, 0), self.length))
+
+    def tolist(self):
+        return list(self)
+
+    def toarray(self):
+        # contiguous copy, oldest first (a list for typecode 'O').
+        end = self.start + self.length
+        if end <= self.capacity:
+            return self.data[self.start:end]
+        return self.data[self.start:] + self.data[:end - self.capacity]
+
+
+# Non-copying view over logical positions of a RingBuffer, it is only
+# valid until the buffer is modified.
+class RingBufferView(object):
+
+    def __init__(self, buffer, positions):
+        self.buffer = buffer
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RingBufferView(self.buffer, self.positions[index])
+        return self.buffer[self.positions[index]]
+
+    def __iter__(self):
+        buffer = self.buffer
+        for i in self.positions:
+            yield buffer[i]
+
+    def tolist(self):
+        return list(self)
@@ -0,0 +1,112 @@
+import unittest
+
+from RingBuffer import RingBuffer
+
+class TestRingBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.b = RingBuffer(4)
+
+    def test_appendEvicts(self):
+        for v in [1, 2, 3, 4]:
+            self.assertIsNone(self.b.append(v))
+        self.assertEqual(self.b.append(5), 1.0)
+        self.assertEqual(self.b.tolist(), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(len(self.b), 4)
+
+    def test_popTail(self):
+        for v in [1, 2, 3, 4, 5, 6]:
+            self.b.append(v)
+        self.assertEqual(self.b.pop(), 6.0)
+        self.assertEqual(self.b.pop(), 5.0)
+        self.assertEqual(self.b.tolist(), [3.0, 4.0])
+        self.b.append(7)
+        self.assertEqual(self.b.tolist(), [3.0, 4.0, 7.0])
+        self.b.pop()
+        self.b.pop()
+        self.b.pop()
+        with self.assertRaises(IndexError):
+            self.b.pop()
+
+    def test_indexing(self):
+        for v in [1, 2, 3, 4, 5]:
+            self.b.append(v)
+        self.assertEqual(self.b[0], 2.0)
+        self.assertEqual(self.b[-1], 5.0)
+        self.assertEqual(self.b[-4], 2.0)
+        with self.assertRaises(IndexError):
+            self.b[-5]
+        with self.assertRaises(IndexError):
+            self.b[4]
+
+    def test_views(self):
+        for v in [1, 2, 3, 4, 5, 6]:
+            self.b.append(v)
+        self.assertEqual(list(self.b[-2:]), [5.0, 6.0])
+        self.assertEqual(list(self.b.window(3)), [4.0, 5.0, 6.0])
+        self.assertEqual(list(self.b.window(10)), [3.0, 4.0, 5.0, 6.0])
+        self.assertEqual(self.b[-3:][1:].tolist(), [5.0, 6.0])
+        self.assertEqual(self.b.toarray().tolist(), [3.0, 4.0, 5.0, 6.0])
+
+    def test_integerStorage(self):
+        b = RingBuffer(2, 'q')
+        b.append(2**40)
+        self.assertEqual(b[-1], 2**40)
+        self.assertIs(type(b[-1]), int)
+
+    def test_exactStorage(self):
+        b = RingBuffer(3, 'q', True)
+        b.append(2)
+        b.append(-5)
+        self.assertEqual(b.typecode, 'q')
+        b.append(2**70)
+        self.assertEqual(b.typecode, 'O')
+        b.append(0.5)
+        self.assertEqual(b.tolist(), [-5, 2**70, 0.5])
+        self.assertEqual([type(v) for v in b], [int, int, float])
+        b[0] = 3
+        self.assertEqual(b.pop(), 0.5)
+        self.assertEqual(b.toarray(), [3, 2**70])
+
+    def test_exactFloats(self):
+        b = RingBuffer(3, 'd', True)
+        b.append(1.5)
+        self.assertEqual(b.typecode, 'd')
+        b.append(3)
+        self.assertEqual(b.typecode, 'O')
+        self.assertEqual([type(v) for v in b], [float, int])
+        # not exact: converted as before
+        b = RingBuffer(3)
+        b.append(3)
+        self.assertIs(type(b[-1]), float)
+
+    def test_extend(self):
+        for typecode, exact in [('d', False), ('q', True), ('O', False)]:
+            for before in range(6):
+                for count in range(7):
+                    b = RingBuffer(4, typecode, exact)
+                    r = RingBuffer(4, typecode, exact)
+                    for v in range(before):
+                        b.append(v)
+                        r.append(v)
+                    if before == 5: # wrapped, start away from 0
+                        b.pop()
+                        r.pop()
+                    values = list(range(10, 10 + count))
+                    b.extend(values)
+                    for v in values:
+                        r.append(v)
+                    self.assertEqual(b.tolist(), r.tolist())
+                    self.assertEqual([type(v) for v in b], [type(v) for v in r])
+        b = RingBuffer(3, 'q', True)
+        b.extend([1, 2])
+        self.assertEqual(b.typecode, 'q')
+        b.extend([2**70, 0.5])
+        self.assertEqual(b.typecode, 'O')
+        self.assertEqual(b.tolist(), [2, 2**70, 0.5])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
@@ -0,0 +1,177 @@
+from collections import deque
+import statistics
+
+from SlidingMedian import SlidingMedian
+
+# Incremental statistics over the last windowSize samples of a series.
+# Every tracker supports appending a sample (the oldest one may expire) and
+# dropping the newest sample (the expired one may come back, for reorgs).
+# Results are the same (bit-identical) as the statistics module over a slice.
+
+# Floats are dyadic rationals, scaling by 2**1074 makes every finite float an
+# integer, so sums are exact and int true division rounds like statistics does.
+SCALE_BITS = 1074
+
+
+def exactScaled(value):
+    if isinstance(value, int):
+        return value << SCALE_BITS
+    numerator, denominator = value.as_integer_ratio()
+    return numerator << (SCALE_BITS - denominator.bit_length() + 1)
+
+
+class RollingMean(object):
+
+    def __init__(self):
+        self.total = 0 # exact sum scaled by 2**SCALE_BITS
+        self.count = 0
+        self.floats = 0 # any float in window makes the mean a float
+
+    def add(self, value):
+        self.total += exactScaled(value)
+        self.count += 1
+        if not isinstance(value, int):
+            self.floats += 1
+
+    def remove(self, value):
+        self.total -= exactScaled(value)
+        self.count -= 1
+        if not isinstance(value, int):
+            self.floats -= 1
+
+    def mean(self):
+        if self.count == 0:
+            raise statistics.StatisticsError('mean requires at least one data point')
+        denominator = self.count << SCALE_BITS
+        if self.floats == 0 and self.total % denominator == 0:
+            return self.total // denominator
+        return self.total / denominator
+
+
+class RollingExtreme(object):
+
+    # Monotonic deque of (position, value), front is the max (or min).
+    # Each append journals what it displaced so it can be undone in O(1)
+    # amortized; the journal keeps the last undoDepth appends.
+    def __init__(self, windowSize, largest=True, undoDepth=None):
+        self.windowSize = windowSize
+        self.largest = largest
+        self.items = deque()
+        self.journal = deque(maxlen=undoDepth)
+        self.position = 0 # samples appended so far
+
+    def dominated(self, old, new):
+        if self.largest:
+            return old <= new
+        return old >= new
+
+    def add(self, value):
+        removed = []
+        while self.items and self.dominated(self.items[-1][1], value):
+            removed.append(self.items.pop())
+        self.items.append((self.position, value))
+        expired = None
+        if self.items[0][0] <= self.position - self.windowSize:
+            expired = self.items.popleft()
+        self.journal.append((removed, expired))
+        self.position += 1
+
+    # returns False when the journal is exhausted, caller must rebuild.
+    def undo(self):
+        if not self.journal:
+            return False
+        removed, expired = self.journal.pop()
+        self.items.pop()
+        self.items.extend(reversed(removed))
+        if expired is not None:
+            self.items.appendleft(expired)
+        self.position -= 1
+        return True
+
+    def rebuild(self, window):
+        self.items.clear()
+        self.journal.clear()
+        self.position = 0
+        for value in window:
+            self.add(value)
+        self.journal.clear()
+
+    def value(self):
+        if not self.items:
+            raise ValueError('empty window')
+        return self.items[0][1]
+
+
+class RollingWindow(object):
+
+    # Statistics of the last windowSize values of one per-block series.
+    # undoDepth bounds how many drops can be undone without a rebuild.
+    # median=True keeps a SlidingMedian of the window, any series can use it.
+    def __init__(self, windowSize, undoDepth=None, extremes=False, median=False):
+        self.windowSize = windowSize
+        self.meanTracker = RollingMean()
+        self.maxTracker = None
+        self.minTracker = None
+        self.medianTracker = None
+        if extremes:
+            self.maxTracker = RollingExtreme(windowSize, True, undoDepth)
+            self.minTracker = RollingExtreme(windowSize, False, undoDepth)
+        if median:
+            self.medianTracker = SlidingMedian()
+
+    # expired: value that leaves the window (None while it is not full).
+    def append(self, value, expired=None):
+        self.meanTracker.add(value)
+        if expired is not None:
+            self.meanTracker.remove(expired)
+        if self.medianTracker is not None:
+            self.medianTracker.add(value)
+            if expired is not None:
+                self.medianTracker.remove(expired)
+        if self.maxTracker is not None:
+            self.maxTracker.add(value)
+            self.minTracker.add(value)
+
+    # Fills an empty window from history, the whole buffered series: the
+    # mean and median see the last windowSize values, the extremes replay
+    # all of it so their journals can undo drops back to the buffer start.
+    def extend(self, history):
+        for value in history[-self.windowSize:]:
+            self.meanTracker.add(value)
+            if self.medianTracker is not None:
+                self.medianTracker.add(value)
+        if self.maxTracker is not None:
+            for value in history:
+                self.maxTracker.add(value)
+                self.minTracker.add(value)
+
+    # restored: value that re-enters the window (None if none left).
+    # history: the series after the pop, only read if a rebuild is needed.
+    def pop(self, value, restored=None, history=()):
+        self.meanTracker.remove(value)
+        if restored is not None:
+            self.meanTracker.add(restored)
+        if self.medianTracker is not None:
+            self.medianTracker.remove(value)
+            if restored is not None:
+                self.medianTracker.add(restored)
+        if self.maxTracker is not None:
+            if not (self.maxTracker.undo() and self.minTracker.undo()):
+                window = history[-self.windowSize:]
+                self.maxTracker.rebuild(window)
+                self.minTracker.rebuild(window)
+
+    def __len__(self):
+        return self.meanTracker.count
+
+    def mean(self):
+        return self.meanTracker.mean()
+
+    def max(self):
+        return self.maxTracker.value()
+
+    def min(self):
+        return self.minTracker.value()
+
+    def median(self):
+        return self.medianTracker.median()
@@ -0,0 +1,67 @@
+import unittest
+import random
+import statistics
+
+from RollingStats import RollingMean, RollingExtreme, RollingWindow
+
+class TestRollingStats(unittest.TestCase):
+
+    def test_meanExact(self):
+        m = RollingMean()
+        values = [0.1, 0.2, 0.3, 1e-300, 1e300, -1e300, 3]
+        for v in values:
+            m.add(v)
+        self.assertEqual(m.mean(), statistics.mean(values))
+        m.remove(0.1)
+        self.assertEqual(m.mean(), statistics.mean(values[1:]))
+
+    def test_meanIntegers(self):
+        m = RollingMean()
+        for v in [20, 20, 20]:
+            m.add(v)
+        self.assertEqual(m.mean(), 20)
+        self.assertIs(type(m.mean()), int)
+        m.add(21)
+        self.assertEqual(m.mean(), 20.25)
+
+    def test_extremeUndo(self):
+        e = RollingExtreme(3, largest=True)
+        for v in [5, 1, 4, 2, 3]:
+            e.add(v)
+        self.assertEqual(e.value(), 4)
+        self.assertTrue(e.undo())
+        self.assertEqual(e.value(), 4)
+        self.assertTrue(e.undo())
+        self.assertEqual(e.value(), 5)
+        self.assertTrue(e.undo())
+        self.assertTrue(e.undo())
+        self.assertTrue(e.undo())
+        self.assertFalse(e.undo())
+
+    def test_windowMatchesStatistics(self):
+        rng = random.Random(7)
+        windowSize = 16
+        w = RollingWindow(windowSize, undoDepth=8, extremes=True, median=True)
+        series = []
+        for step in range(3000):
+            if series and rng.random() < 0.3:
+                value = series.pop()
+                restored = series[-windowSize] if len(series) >= windowSize else None
+                w.pop(value, restored, series)
+            else:
+                series.append(rng.choice([rng.randint(0, 50), rng.random() * 100]))
+                expired = series[-windowSize-1] if len(series) > windowSize else None
+                w.append(series[-1], expired)
+            if not series:
+                continue
+            window = series[-windowSize:]
+            self.assertEqual(w.mean(), statistics.mean(window))
+            self.assertEqual(w.max(), max(window))
+            self.assertEqual(w.min(), min(window))
+            self.assertEqual(w.median(), statistics.median(window))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
@@ -0,0 +1,85 @@
+from bisect import bisect_left, bisect_right, insort
+import statistics
+
+# Indexed multiset for windowed medians: a list of sorted blocks of at
+# most 2 * load items plus the max of every block. add/remove cost
+# O(log n + load) and the k-th smallest O(n / load), instead of sorting
+# the whole window every block. median() follows statistics.median.
+class SlidingMedian(object):
+
+    load = 256
+
+    def __init__(self, values=()):
+        self.blocks = [] # sorted blocks, every item <= items of the next block
+        self.maxes = [] # last item of every block
+        self.length = 0
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        if not self.blocks:
+            self.blocks.append([value])
+            self.maxes.append(value)
+            self.length = 1
+            return
+        i = bisect_right(self.maxes, value)
+        if i == len(self.blocks):
+            i -= 1
+        block = self.blocks[i]
+        insort(block, value)
+        self.maxes[i] = block[-1]
+        if len(block) > 2 * self.load:
+            self.blocks[i:i+1] = [block[:self.load], block[self.load:]]
+            self.maxes[i:i+1] = [block[self.load-1], block[-1]]
+        self.length += 1
+
+    def remove(self, value):
+        i = bisect_left(self.maxes, value)
+        if i < len(self.blocks):
+            block = self.blocks[i]
+            j = bisect_left(block, value)
+            if j < len(block) and block[j] == value:
+                del block[j]
+                if block:
+                    self.maxes[i] = block[-1]
+                else:
+                    del self.blocks[i]
+                    del self.maxes[i]
+                self.length -= 1
+                return
+        raise ValueError('SlidingMedian.remove(x): x not present')
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, value):
+        i = bisect_left(self.maxes, value)
+        if i == len(self.blocks):
+            return False
+        block = self.blocks[i]
+        j = bisect_left(block, value)
+        return j < len(block) and block[j] == value
+
+    # k-th smallest item, negative k counts from the largest.
+    def __getitem__(self, k):
+        if k < 0:
+            k += self.length
+        if k < 0 or k >= self.length:
+            raise IndexError('SlidingMedian index out of range')
+        for block in self.blocks:
+            if k < len(block):
+                return block[k]
+            k -= len(block)
+
+    def __iter__(self):
+        for block in self.blocks:
+            yield from block
+
+    def median(self):
+        n = self.length
+        if n == 0:
+            raise statistics.StatisticsError('no median for empty data')
+        if n % 2 == 1:
+            return self[n // 2]
+        i = n // 2
+        return (self[i - 1] + self[i]) / 2
@@ -0,0 +1,60 @@
+import unittest
+import random
+import statistics
+
+from SlidingMedian import SlidingMedian
+
+
+class SmallBlocksMedian(SlidingMedian):
+    load = 4
+
+
+class TestSlidingMedian(unittest.TestCase):
+
+    def test_median(self):
+        m = SlidingMedian([5, 1, 4, 2])
+        self.assertEqual(m.median(), 3.0)
+        m.remove(1)
+        self.assertEqual(m.median(), 4)
+        with self.assertRaises(statistics.StatisticsError):
+            SlidingMedian().median()
+
+    def test_remove(self):
+        m = SlidingMedian([3, 3, 1])
+        m.remove(3)
+        self.assertEqual(list(m), [1, 3])
+        self.assertIn(3, m)
+        self.assertNotIn(2, m)
+        with self.assertRaises(ValueError):
+            m.remove(2)
+
+    def test_indexing(self):
+        m = SmallBlocksMedian(range(100, 0, -1))
+        self.assertEqual(m[0], 1)
+        self.assertEqual(m[57], 58)
+        self.assertEqual(m[-1], 100)
+        with self.assertRaises(IndexError):
+            m[100]
+
+    def test_slidingWindowMatchesStatistics(self):
+        rng = random.Random(17)
+        m = SmallBlocksMedian()
+        window = []
+        for step in range(4000):
+            if window and (len(window) > 40 or rng.random() < 0.3):
+                value = window.pop(rng.randrange(len(window)))
+                m.remove(value)
+            else:
+                value = rng.choice([rng.randint(0, 20), rng.random() * 20])
+                window.append(value)
+                m.add(value)
+            self.assertEqual(len(m), len(window))
+            if window:
+                self.assertEqual(m.median(), statistics.median(window))
+            self.assertEqual(list(m), sorted(window))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
@@ -0,0 +1,141 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from RingBuffer import RingBuffer
+
+# Binary snapshot of a comptroller state.
+#
+# Layout:
+#   magic      8 bytes  b'PLSRSNAP'
+#   version    uint32 little-endian
+#   headerSize uint32 little-endian
+#   header     JSON utf-8: kind, byteorder, scalar attributes and the
+#              array table (name, typecode, exact, capacity, length, offset)
+#   arrays     raw typed array data, each 8-byte aligned
+#
+# Buffers stored as Python lists (typecode 'O', see RingBuffer) keep their
+# values in the array table entry instead, so ints and floats come back as
+# they were.
+#
+# Scalars go through JSON, which round-trips Python ints of any size and
+# floats exactly. Arrays are read straight from a memory map, so loading
+# costs O(snapshot size) no matter how long the chain was.
+
+MAGIC = b'PLSRSNAP'
+VERSION = 1
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 8
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# kind: class name of the saved object, checked on load.
+# scalars: dict of None/bool/int/float values.
+# buffers: dict of RingBuffer, saved oldest first.
+def writeSnapshot(path, kind, scalars, buffers):
+    table = []
+    blobs = []
+    offset = 0
+    for name, buffer in buffers.items():
+        entry = {'name': name, 'typecode': buffer.typecode, 'exact': buffer.exact, 'capacity': buffer.capacity,
+                 'length': len(buffer), 'offset': offset}
+        if buffer.typecode == 'O':
+            entry['values'] = buffer.tolist()
+            data = b''
+        else:
+            data = buffer.toarray().tobytes()
+        table.append(entry)
+        blobs.append(data)
+        offset = align(offset + len(data))
+    header = json.dumps({'kind': kind, 'byteorder': sys.byteorder, 'scalars': scalars,
+                         'arrays': table}).encode('utf-8')
+    dataStart = align(PREAMBLE.size + len(header))
+    with open(path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        f.write(bytes(dataStart - PREAMBLE.size - len(header)))
+        written = 0
+        for entry, data in zip(table, blobs):
+            f.write(bytes(entry['offset'] - written))
+            f.write(data)
+            written = entry['offset'] + len(data)
+
+
+# returns (kind, scalars, buffers) with buffers rebuilt as RingBuffer.
+def readSnapshot(path):
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                if len(mm) < PREAMBLE.size:
+                    raise ValueError('not a snapshot file: ' + str(path))
+                magic, version, headerSize = PREAMBLE.unpack_from(mm, 0)
+                if magic != MAGIC:
+                    raise ValueError('not a snapshot file: ' + str(path))
+                if version != VERSION:
+                    raise ValueError('unsupported snapshot version ' + str(version))
+                header = json.loads(bytes(view[PREAMBLE.size:PREAMBLE.size + headerSize]).decode('utf-8'))
+                dataStart = align(PREAMBLE.size + headerSize)
+                buffers = {}
+                for entry in header['arrays']:
+                    buffer = RingBuffer(entry['capacity'], entry['typecode'], entry.get('exact', False))
+                    if entry['typecode'] == 'O':
+                        data = entry['values']
+                    else:
+                        data = array(entry['typecode'])
+                        start = dataStart + entry['offset']
+                        data.frombytes(view[start:start + entry['length'] * data.itemsize])
+                        if header['byteorder'] != sys.byteorder:
+                            data.byteswap()
+                    buffer.data[:len(data)] = data
+                    buffer.length = len(data)
+                    buffers[entry['name']] = buffer
+            finally:
+                view.release()
+    return header['kind'], header['scalars'], buffers
+
+
+# generic state split used by the comptroller classes.
+def snapshotState(obj):
+    scalars = {}
+    buffers = {}
+    for name, value in vars(obj).items():
+        if value is None or isinstance(value, (bool, int, float)):
+            scalars[name] = value
+        elif isinstance(value, RingBuffer):
+            buffers[name] = value
+    return scalars, buffers
+
+
+def saveObject(obj, path):
+    scalars, buffers = snapshotState(obj)
+    writeSnapshot(path, type(obj).__name__, scalars, buffers)
+
+
+# new instance of cls with the saved attributes, buffers are resized to
+# the capacity cls uses (keeping the newest items).
+def loadObject(cls, path):
+    return restoreObject(cls, *readSnapshot(path))
+
+
+# loadObject from what readSnapshot returned, for classes that keep more
+# than their attributes in a snapshot.
+def restoreObject(cls, kind, scalars, buffers):
+    if kind != cls.__name__:
+        raise ValueError('snapshot of ' + kind + ' cannot be loaded as ' + cls.__name__)
+    obj = cls()
+    for name, value in scalars.items():
+        setattr(obj, name, value)
+    for name, saved in buffers.items():
+        current = getattr(obj, name)
+        if saved.capacity == current.capacity:
+            setattr(obj, name, saved)
+        else:
+            for value in saved.window(current.capacity):
+                current.append(value)
+    return obj
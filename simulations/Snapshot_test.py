@@ -0,0 +1,121 @@
+import unittest
+import os
+import random
+import tempfile
+
+from Comptroller import Comptroller
+from ComptrollerMinimal import ComptrollerMinimal
+from ComptrollerMinimalBigInt import ComptrollerMinimalBigInt
+import Snapshot
+
+
+class SmallWindowComptroller(Comptroller):
+    windowSize = 24
+    windowExtraBuffer = 8
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.snap')
+        os.close(fd)
+        self.rng = random.Random(13)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def sample(self):
+        return dict(
+            blockTime=self.rng.randint(10, 70),
+            difficulty=self.rng.randint(1000, 4000),
+            volume=self.rng.randint(0, 100),
+            newStake=0,
+            newUnstake=0,
+            reward=2,
+            txsCount=self.rng.randint(0, 500),
+        )
+
+    def test_comptrollerRoundTrip(self):
+        c = SmallWindowComptroller()
+        for i in range(100):
+            c.addBlockSample(**self.sample())
+        c.saveSnapshot(self.path)
+        l = SmallWindowComptroller.loadSnapshot(self.path)
+        self.assertEqual(l.blockTimes.tolist(), c.blockTimes.tolist())
+        self.assertEqual(l.volumes.tolist(), c.volumes.tolist())
+        for i in range(60):
+            sample = self.sample()
+            c.addBlockSample(**sample)
+            l.addBlockSample(**sample)
+        for i in range(40):
+            c.dropLastBlockSample()
+            l.dropLastBlockSample()
+        for name in ['blockNumber', 'totalStaked', 'totalCirculating', 'currentBlockTime', 'currentMaxSpeed',
+                     'velocity', 'blockTimeFactor', 'speedRatio', 'currentIssuance', 'blockReward', 'txsPerBlock']:
+            self.assertEqual(getattr(l, name), getattr(c, name), name)
+
+    def test_rollbackAfterLoad(self):
+        c = SmallWindowComptroller()
+        for i in range(100):
+            c.addBlockSample(**dict(self.sample(), difficulty=self.rng.randint(1000, 40000)))
+        c.saveSnapshot(self.path)
+        l = SmallWindowComptroller.loadSnapshot(self.path)
+        # the extremes can undo every buffered block, no window rebuild
+        self.assertEqual(len(l.speedsWindow.maxTracker.journal), len(c.speedsWindow.maxTracker.journal))
+        for blockNumber in [99, 97, 92]:
+            c.rollbackTo(blockNumber)
+            l.rollbackTo(blockNumber)
+            for name in ['currentMaxSpeed', 'currentMinSpeed', 'currentSpeedRatio', 'currentSpeed', 'velocity',
+                         'speedRatio', 'blockTimeFactor']:
+                self.assertEqual(getattr(l, name), getattr(c, name), name)
+
+    def test_exactBuffersRoundTrip(self):
+        c = SmallWindowComptroller()
+        c.totalStaked = 2**70 # stored in a list, not in the 'q' array
+        for i in range(30):
+            c.addBlockSample(**self.sample())
+        c.addBlockSample(**dict(self.sample(), volume=2.5)) # a float among the ints
+        c.saveSnapshot(self.path)
+        l = SmallWindowComptroller.loadSnapshot(self.path)
+        for name in ['volumes', 'blockTimes', 'totalStakedHistory', 'speedRatioHistory']:
+            self.assertEqual(getattr(l, name).typecode, getattr(c, name).typecode, name)
+            self.assertEqual(getattr(l, name).tolist(), getattr(c, name).tolist(), name)
+            self.assertEqual([type(v) for v in getattr(l, name)], [type(v) for v in getattr(c, name)], name)
+        self.assertEqual(l.volumes.typecode, 'O')
+        self.assertEqual(l.totalStakedHistory.typecode, 'O')
+
+    def test_minimalRoundTrip(self):
+        c = ComptrollerMinimal()
+        c.addBlockSamples([self.rng.randint(10, 70) for i in range(50)], [self.rng.randint(1000, 900000) for i in range(50)])
+        c.saveSnapshot(self.path)
+        l = ComptrollerMinimal.loadSnapshot(self.path)
+        self.assertEqual(vars(l), vars(c))
+
+    def test_bigIntRoundTrip(self):
+        c = ComptrollerMinimalBigInt()
+        c.addBlockSamples([self.rng.randint(10, 70) for i in range(50)], [self.rng.randint(1000, 900000) for i in range(50)])
+        c.difficulty = 2**300
+        c.saveSnapshot(self.path)
+        l = ComptrollerMinimalBigInt.loadSnapshot(self.path)
+        self.assertEqual(vars(l), vars(c))
+        l.rollbackTo(0)
+        c.rollbackTo(0)
+        self.assertEqual(vars(l), vars(c))
+        self.assertEqual(l.journalState(), ComptrollerMinimalBigInt().journalState())
+
+    def test_wrongKind(self):
+        ComptrollerMinimal().saveSnapshot(self.path)
+        with self.assertRaises(ValueError):
+            ComptrollerMinimalBigInt.loadSnapshot(self.path)
+
+    def test_notSnapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'garbage file contents')
+        with self.assertRaises(ValueError):
+            Snapshot.readSnapshot(self.path)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
@@ -1,6 +1,11 @@
+import multiprocessing
+import os
 import random
-import math
-import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+
+SIEVE_LIMIT = 1 << 16 #candidates are sieved by the ~6500 primes below this
+SIEVE_WINDOW = 1024 #candidates sieved at a time
 
 def rabinMiller(n):
      s = int(n-1)
@@ -50,17 +55,144 @@ def isPrime(n):
              return rabinMiller(n)
      return False
 
-def generateLargePrime(k):
-     #k is the desired bit length
-     r=100*(math.log(k,2)+1) #number of attempts max
-     r_ = r
-     while r>0:
-        #randrange is mersenne twister and is completely deterministic
-        #unusable for serious crypto purposes
-         n = random.randrange(2**(k-1),2**(k))
-         r-=1
-         if isPrime(n) == True:
+@lru_cache(maxsize=None)
+def smallPrimes(limit=SIEVE_LIMIT):
+     #sieve of Eratosthenes, odd primes below limit
+     sieve = bytearray([1]) * limit
+     sieve[0:2] = b'\x00\x00'
+     for i in range(2, int(limit**0.5) + 1):
+         if sieve[i]:
+             sieve[i*i::i] = bytes(len(range(i*i, limit, i)))
+     return [i for i in range(3, limit) if sieve[i]]
+
+def millerRabinRound(n, a=2):
+     #a single strong probable prime test, rejects most sieve survivors
+     #for the cost of one modular exponentiation
+     s = n - 1
+     t = 0
+     while s&1 == 0:
+         s = s // 2
+         t += 1
+     v = pow(a, s, n)
+     if v == 1 or v == n-1:
+         return True
+     for i in range(t-1):
+         v = pow(v, 2, n)
+         if v == n-1:
+             return True
+     return False
+
+@lru_cache(maxsize=None)
+def stepInverses(step, limit=SIEVE_LIMIT):
+     return [pow(step, -1, p) for p in smallPrimes(limit)]
+
+def sieveWindow(start, step, size, primes):
+     #flags for the candidates start, start+step, ... (size of them), set
+     #for the ones with a small prime factor. step must be coprime to primes
+     composite = bytearray(size)
+     inverses = stepInverses(step) if primes is smallPrimes() else [pow(step, -1, p) for p in primes]
+     for p, inverse in zip(primes, inverses):
+         #first index i with start + i*step = 0 (mod p)
+         i = (-start * inverse) % p
+         if start + i*step == p:
+             i += p
+         if i < size:
+             composite[i::p] = b'\x01' * len(range(i, size, p))
+     return composite
+
+def sievedCandidates(start, step=2, end=None, window=SIEVE_WINDOW):
+     #incremental sieve: yields the candidates start, start+step, ... below
+     #end that have no prime factor below SIEVE_LIMIT, one window at a time
+     primes = smallPrimes()
+     while end is None or start < end:
+         size = window if end is None else min(window, (end - start + step - 1) // step)
+         composite = sieveWindow(start, step, size, primes)
+         for i in range(size):
+             if not composite[i]:
+                 yield start + i*step
+         start += size*step
+
+def searchPrime(start, end=None, step=2, stop=None):
+     #first prime in start, start+step, ... below end, or None.
+     #start must be odd (step even), candidates pass a single MR round
+     #before the full rabinMiller test (3 is too small for it). Gives up
+     #(None) once the event stop is set
+     for n in sievedCandidates(start, step, end):
+         if stop is not None and stop.is_set():
+             return None
+         if n == 3 or (n > 3 and millerRabinRound(n) and rabinMiller(n)):
              return n
-     return "Failure after "+str(r_) + " tries."
+     return None
+
+def randomStart(k, step, residue, rng):
+     #random k-bit n rounded up to the residue, so a prime found from it
+     #has k bits too
+     while True:
+         n = rng.randrange(2**(k-1), 2**k)
+         n += (residue - n) % step
+         if n < 2**k:
+             return n
+
+stopEvent = None #set in the pool workers by initSearchWorker
+
+def initSearchWorker(event):
+     global stopEvent
+     stopEvent = event
+
+def searchPrimeWorker(start, end, step):
+     return searchPrime(start, end, step, stopEvent)
+
+def searchLargePrime(k, step, residue, rng, workers):
+     #one random start per worker, the first prime found wins and the
+     #others stop at their next candidate
+     if k < 2:
+         raise ValueError('no prime has ' + str(k) + ' bits')
+     if workers is None or workers <= 1:
+         while True:
+             n = searchPrime(randomStart(k, step, residue, rng), 2**k, step)
+             if n is not None:
+                 return n
+     stop = multiprocessing.Event()
+     executor = ProcessPoolExecutor(max_workers=workers, initializer=initSearchWorker, initargs=(stop,))
+     try:
+         pending = set()
+         while True:
+             while len(pending) < workers:
+                 pending.add(executor.submit(searchPrimeWorker, randomStart(k, step, residue, rng), 2**k, step))
+             done, pending = wait(pending, return_when=FIRST_COMPLETED)
+             for future in done:
+                 n = future.result()
+                 if n is not None:
+                     return n
+     finally:
+         #no waiting for the running searches, they see stop and return
+         stop.set()
+         executor.shutdown(wait=False, cancel_futures=True)
+
+def generateLargePrime(k, workers=None):
+     #k is the desired bit length (k >= 2), workers > 1 searches in parallel
+     #(at most one per CPU, more would only slow each other down)
+     #randrange is mersenne twister and is completely deterministic
+     #unusable for serious crypto purposes
+     if workers is not None:
+         workers = min(workers, os.cpu_count() or 1)
+     return searchLargePrime(k, 2, 1, random, workers)
+
+def generateSlothPrime(k, seed=None):
+     #k-bit prime p = 3 (mod 4), the modulus condition of the sloth VDF
+     #square roots (vdf.mod_sqrt_op). Only those candidates are sieved and
+     #tested, and the same seed always gives the same prime
+     rng = random.Random(seed) if seed is not None else random
+     return searchLargePrime(k, 4, 3, rng, None)
+
+if __name__ == '__main__':
 
-print(generateLargePrime(1024))
+     import time
+     print(generateLargePrime(1024))
+     #serial against parallel search, averaged over a few draws
+     draws = 8
+     for workers in [None, os.cpu_count()]:
+         start = time.perf_counter()
+         for i in range(draws):
+             generateLargePrime(1024, workers)
+         print('workers:', workers or 1, format((time.perf_counter() - start) / draws, '.3f'), 'secs per 1024-bit prime')
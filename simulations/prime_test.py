@@ -0,0 +1,110 @@
+import unittest
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import prime
+
+class TestPrime(unittest.TestCase):
+
+    def test_smallPrimes(self):
+        primes = prime.smallPrimes(100)
+        self.assertEqual(primes, [n for n in range(3, 100) if all(n % d for d in range(2, n))])
+
+    def test_sievedCandidates(self):
+        primes = set(prime.smallPrimes())
+        candidates = list(prime.sievedCandidates(3, 2, 1001, window=64))
+        self.assertEqual(candidates, [n for n in range(3, 1001, 2) if n in primes])
+        start = 2**64 + 1
+        candidates = list(prime.sievedCandidates(start, 2, start + 20000, window=512))
+        self.assertEqual(candidates, [n for n in range(start, start + 20000, 2) if all(n % p for p in primes)])
+
+    def test_millerRabinRound(self):
+        for n in range(5, 2000, 2):
+            if prime.isPrime(n):
+                self.assertTrue(prime.millerRabinRound(n))
+        self.assertFalse(prime.millerRabinRound(2**61 + 1))
+        self.assertTrue(prime.millerRabinRound(2**61 - 1))
+
+    def test_searchPrime(self):
+        self.assertEqual(prime.searchPrime(2**61 - 1, 2**62), 2**61 - 1)
+        self.assertEqual(prime.searchPrime(1000001), 1000003)
+        self.assertIsNone(prime.searchPrime(1000005, 1000033))
+        stop = multiprocessing.Event()
+        stop.set()
+        self.assertIsNone(prime.searchPrime(1000001, stop=stop))
+
+    def test_randomStart(self):
+        rng = random.Random(5)
+        for k in [3, 4, 5, 8]:
+            for i in range(300):
+                n = prime.randomStart(k, 4, 3, rng)
+                self.assertEqual(n.bit_length(), k)
+                self.assertEqual(n % 4, 3)
+        for k in [4, 5, 6, 8, 10]:
+            for seed in range(100):
+                self.assertEqual(prime.generateSlothPrime(k, seed=seed).bit_length(), k)
+            for i in range(100):
+                self.assertEqual(prime.generateLargePrime(k).bit_length(), k)
+
+    def test_smallSizes(self):
+        self.assertEqual(prime.searchPrime(3, 4), 3)
+        self.assertEqual(prime.searchPrime(1, 8), 3)
+        self.assertEqual(prime.searchPrime(3, 8, 4), 3)
+        self.assertIsNone(prime.searchPrime(1, 3))
+        self.assertEqual(prime.generateLargePrime(2), 3)
+        self.assertEqual(prime.generateSlothPrime(2, seed=1), 3)
+        self.assertEqual(prime.generateSlothPrime(3, seed=1), 7)
+        self.assertIn(prime.generateLargePrime(3), [5, 7])
+        for k in [0, 1]:
+            with self.assertRaises(ValueError):
+                prime.generateLargePrime(k)
+            with self.assertRaises(ValueError):
+                prime.generateSlothPrime(k)
+
+    def test_generateLargePrime(self):
+        for k in [16, 64, 256]:
+            n = prime.generateLargePrime(k)
+            self.assertEqual(n.bit_length(), k)
+            self.assertTrue(prime.isPrime(n))
+        n = prime.searchLargePrime(128, 2, 1, random, 2) # the pool, whatever the CPU count
+        self.assertEqual(n.bit_length(), 128)
+        self.assertTrue(prime.isPrime(n))
+
+    def test_parallelStops(self):
+        # a stopped worker gives up at its first candidate
+        stop = multiprocessing.Event()
+        stop.set()
+        with ProcessPoolExecutor(max_workers=1, initializer=prime.initSearchWorker, initargs=(stop,)) as executor:
+            future = executor.submit(prime.searchPrimeWorker, prime.randomStart(2048, 2, 1, random.Random(1)), 2**2048, 2)
+            self.assertIsNone(future.result(timeout=60))
+        # the first hit stops the other searches, no worker is left running
+        n = prime.searchLargePrime(1024, 2, 1, random.Random(3), 2)
+        self.assertEqual(n.bit_length(), 1024)
+        self.assertTrue(prime.isPrime(n))
+        deadline = time.monotonic() + 60
+        while multiprocessing.active_children() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_generateSlothPrime(self):
+        import vdf
+        for k in [32, 64, 256]:
+            n = prime.generateSlothPrime(k, seed=k)
+            self.assertEqual(n.bit_length(), k)
+            self.assertEqual(n % 4, 3)
+            self.assertTrue(prime.isPrime(n))
+            self.assertEqual(prime.generateSlothPrime(k, seed=k), n)
+        self.assertNotEqual(prime.generateSlothPrime(256, seed=1), prime.generateSlothPrime(256, seed=2))
+        q = prime.generateSlothPrime(64, seed=3)
+        for x in range(1, 200):
+            self.assertEqual(vdf.mod_sqrt_op_fast(x, q), vdf.mod_sqrt_op(x, q))
+            y = vdf.mod_sqrt_op(x, q)
+            self.assertIn(y * y % q, (x % q, (-x) % q))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
@@ -1,12 +1,78 @@
 # from https://github.com/ericchenmelt/VDF/blob/master/sloth_vdf.py
 
+import asyncio
 import datetime
+import os
+import struct
 import time
+import weakref
+from collections import namedtuple
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    import gmpy2
+except ImportError: # pure Python fallback
+    gmpy2 = None
 
 #p = 73237431696005972674723595250817150843 
 p = 64106875808534963770974826322234655855469213855659218736479077548818158667371
 vdf_prime = p
 
+
+# Big-integer backends for the modular arithmetic. Every backend computes
+# the same exact integers, functions always return plain Python ints.
+class PythonBackend(object):
+    name = 'python'
+
+    def mpz(self, x):
+        return int(x)
+
+    def powmod(self, x, e, m):
+        return pow(x, e, m)
+
+
+class Gmpy2Backend(object):
+    name = 'gmpy2'
+
+    def mpz(self, x):
+        return gmpy2.mpz(x)
+
+    def powmod(self, x, e, m):
+        return gmpy2.powmod(x, e, m)
+
+
+backends = {'python': PythonBackend()}
+if gmpy2 is not None:
+    backends['gmpy2'] = Gmpy2Backend()
+# fastest available by default
+backend = backends['gmpy2'] if gmpy2 is not None else backends['python']
+
+
+def available_backends():
+    return list(backends)
+
+
+def get_backend():
+    return backend.name
+
+
+def set_backend(name):
+    global backend
+    if name not in backends:
+        raise ValueError('unknown or unavailable VDF backend: ' + str(name))
+    backend = backends[name]
+
+
+# name (or None for the current one) to backend object.
+def resolve_backend(name=None):
+    if name is None:
+        return backend
+    if name not in backends:
+        raise ValueError('unknown or unavailable VDF backend: ' + str(name))
+    return backends[name]
+
+
 def sqrt_mod_p_verify(y, x, p):
     if pow(y, 2) % p == x % p:
         pass #return True
@@ -14,45 +80,320 @@ def sqrt_mod_p_verify(y, x, p):
         return False
 
 
-def quad_res(x, p):
-    return pow(x, (p - 1) // 2, p) == 1
+def quad_res(x, p, backend=None):
+    return resolve_backend(backend).powmod(x, (p - 1) // 2, p) == 1
 
 
-def mod_sqrt_op(x, p):
-    if quad_res(x, p):
-        y = pow(x, (p + 1) // 4, p)
+def mod_sqrt_op(x, p, backend=None):
+    b = resolve_backend(backend)
+    if quad_res(x, p, b.name):
+        y = b.powmod(x, (p + 1) // 4, p)
     else:
         x = (-x) % p
-        y = pow(x, (p + 1) // 4, p)
-    return y
+        y = b.powmod(x, (p + 1) // 4, p)
+    return int(y)
+
+
+# For p = 3 (mod 4), y = x^((p+1)/4) gives y^2 = x^((p+1)/2) = +-x, with
+# +x exactly when x is a quadratic residue. So a squaring replaces the
+# Legendre exponentiation of quad_res, and for a non-residue the root of -x
+# is (-1)^((p+1)/4) * y. Same output as mod_sqrt_op, one exponentiation.
+def mod_sqrt_op_fast(x, p, backend=None):
+    b = resolve_backend(backend)
+    e = (p + 1) // 4
+    y = b.powmod(x, e, p)
+    if y * y % p == x % p or e % 2 == 0:
+        return int(y)
+    return int((-y) % p)
 
 
-def mod_op(x, t):  # hash operation on an int with t iternations
-    x = x % p
+def mod_op_fast(x, t, backend=None):  # same as mod_op, one exponentiation per step
+    b = resolve_backend(backend)
+    m = b.mpz(p)
+    e = (m + 1) // 4
+    negate = e % 2 == 1
+    powmod = b.powmod
+    x = b.mpz(x) % m
+    for i in range(t):
+        y = powmod(x, e, m)
+        if negate and y * y % m != x:
+            y = (-y) % m
+        x = y
+    return int(x)
+
+
+# reference implementation, two exponentiations per step
+def mod_op(x, t, backend=None):  # hash operation on an int with t iternations
+    b = resolve_backend(backend)
+    m = b.mpz(p)
+    x = b.mpz(x) % m
     start = datetime.datetime.now()
     for i in range(t):
-        x = mod_sqrt_op(x, p)
+        x = mod_sqrt_op(x, m, b.name)
     end = datetime.datetime.now()
-    return x
+    return int(x)
 
 
-def mod_verif(y, x, t):
+def mod_verif(y, x, t, backend=None):
+    b = resolve_backend(backend)
+    m = b.mpz(p)
+    y = b.mpz(y)
     start = datetime.datetime.now()
     for i in range(t):
-        y = pow(int(y), 2, p)
-    if not quad_res(y, p):
-        y = (-y) % p
+        y = b.powmod(y, 2, m)
+    if not quad_res(y, m, b.name):
+        y = (-y) % m
     end = datetime.datetime.now()
     if x % p == y or (-x) % p == y:
         return True
     else:
         return False
 
-def vdf_execute(x,t):
-    return mod_op(x,t)
+# with checkpoint_every=k also returns the (steps, value) pairs after k, 2k, ...
+# steps (excluding x and y), to verify the segments in parallel.
+# backend: name of the big-integer backend, None for the current one.
+def vdf_execute(x,t,checkpoint_every=None,backend=None):
+    if checkpoint_every is None:
+        return mod_op_fast(x,t,backend)
+    assert( checkpoint_every > 0 )
+    checkpoints = []
+    y = x % p
+    done = 0
+    while done < t:
+        steps = min(checkpoint_every, t - done)
+        y = mod_op_fast(y, steps, backend)
+        done += steps
+        if done < t:
+            checkpoints.append((done, y))
+    return y, checkpoints
+
+def vdf_verify(y,x,t,backend=None):
+    return mod_verif(y,x,t,backend)
+
+
+# Resumable vdf_execute, runs the t steps in chunks so it can be cancelled
+# (e.g. when a competing block arrives), report progress, and be paused and
+# resumed in another process from to_bytes(). The result equals vdf_execute.
+class VDFComputation(object):
+
+    # version, t, steps done, then x and the current value as 32-byte ints
+    state_format = struct.Struct('<BQQ32s32s')
+    state_version = 1
+
+    # progress: called as progress(done, t) after every chunk.
+    def __init__(self, x, t, chunk=1000, backend=None, progress=None):
+        assert( chunk > 0 )
+        self.x = x % p
+        self.t = t
+        self.done = 0
+        self.value = self.x
+        self.chunk = chunk
+        self.backend = backend
+        self.progress = progress
+        self.cancelled = False
+
+    def finished(self):
+        return self.done >= self.t
+
+    # stops run() before its next chunk, safe to call from another thread
+    # or from the progress callback.
+    def cancel(self):
+        self.cancelled = True
+
+    # computes one chunk (or steps steps), returns True once finished.
+    def step(self, steps=None):
+        steps = min(self.chunk if steps is None else steps, self.t - self.done)
+        self.value = mod_op_fast(self.value, steps, self.backend)
+        self.done += steps
+        if self.progress is not None:
+            self.progress(self.done, self.t)
+        return self.finished()
+
+    # runs chunks until finished, cancelled, or max_steps more steps are
+    # done; returns the VDF output, or None if it stopped early.
+    def run(self, max_steps=None):
+        limit = self.t if max_steps is None else min(self.t, self.done + max_steps)
+        while self.done < limit and not self.cancelled:
+            self.step(min(self.chunk, limit - self.done))
+        return self.value if self.finished() else None
+
+    def resume(self, max_steps=None):
+        self.cancelled = False
+        return self.run(max_steps)
+
+    def result(self):
+        if not self.finished():
+            raise ValueError('VDF computation not finished: ' + str(self.done) + ' of ' + str(self.t) + ' steps')
+        return self.value
+
+    def to_bytes(self):
+        return self.state_format.pack(self.state_version, self.t, self.done,
+                                      self.x.to_bytes(32, 'little'), int(self.value).to_bytes(32, 'little'))
+
+    @classmethod
+    def from_bytes(cls, state, chunk=1000, backend=None, progress=None):
+        if len(state) != cls.state_format.size:
+            raise ValueError('bad VDF computation state size: ' + str(len(state)))
+        version, t, done, x, value = cls.state_format.unpack(state)
+        if version != cls.state_version:
+            raise ValueError('unsupported VDF computation state version ' + str(version))
+        x = int.from_bytes(x, 'little')
+        value = int.from_bytes(value, 'little')
+        if done > t:
+            raise ValueError('bad VDF computation state: ' + str(done) + ' of ' + str(t) + ' steps done')
+        if x >= p or value >= p or (done == 0 and value != x):
+            raise ValueError('bad VDF computation state: values out of range')
+        computation = cls(x, t, chunk, backend, progress)
+        computation.done = done
+        computation.value = value
+        return computation
+
+
+# (y, x, steps) of every segment x -> c1 -> ... -> y, checkpoints as
+# returned by vdf_execute.
+def vdf_segments(y, x, t, checkpoints):
+    points = [(0, x % p)] + list(checkpoints) + [(t, y)]
+    segments = []
+    for (start, value), (end, next_value) in zip(points, points[1:]):
+        if end <= start:
+            raise ValueError('checkpoint steps must increase within (0, t)')
+        segments.append((next_value, value, end - start))
+    return segments
+
+
+def vdf_verify_segment(segment, backend=None):
+    y, x, t = segment
+    return mod_verif(y, x, t, backend)
+
+
+# Runs function over items in executor (a new pool of workers processes if
+# None), results in input order. With stop_on_failure the first falsy result
+# cancels the rest, their results are None.
+def run_in_pool(function, items, workers=None, executor=None, stop_on_failure=True, failed=lambda result: not result):
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(function, item) for item in items]
+        index = {future: i for i, future in enumerate(futures)}
+        results = [None] * len(futures)
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            stop = False
+            for future in done:
+                results[index[future]] = future.result()
+                stop = stop or (stop_on_failure and failed(results[index[future]]))
+            if stop:
+                for future in pending:
+                    future.cancel()
+                break
+        return results
+    finally:
+        if own:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Verifies every checkpoint segment concurrently in a process pool, stops
+# at the first failed segment. executor: reuse an existing pool.
+def vdf_verify_parallel(y, x, t, checkpoints, workers=None, executor=None, backend=None):
+    segments = vdf_segments(y, x, t, checkpoints)
+    backend = resolve_backend(backend).name # workers may not share our current backend
+    if workers == 1 and executor is None:
+        return all(vdf_verify_segment(segment, backend) for segment in segments)
+    results = run_in_pool(partial(vdf_verify_segment, backend=backend), segments, workers, executor)
+    return all(results)
+
+
+# ok is None for proofs cancelled after an earlier failure.
+VerifyResult = namedtuple('VerifyResult', ['ok', 'elapsed'])
+
+
+def vdf_verify_timed(proof, backend=None):
+    y, x, t = proof
+    start = time.perf_counter()
+    ok = mod_verif(y, x, t, backend)
+    return VerifyResult(ok, time.perf_counter() - start)
+
+
+# Verifies many (y, x, t) proofs across a process pool, returns a
+# VerifyResult (ok, elapsed seconds in the worker) per proof, in order.
+# stop_on_failure cancels the proofs still pending after the first failure.
+def vdf_verify_batch(proofs, workers=None, stop_on_failure=True, executor=None, backend=None):
+    backend = resolve_backend(backend).name
+    results = run_in_pool(partial(vdf_verify_timed, backend=backend), list(proofs), workers, executor, stop_on_failure,
+                          failed=lambda result: not result.ok)
+    return [result if result is not None else VerifyResult(None, None) for result in results]
+
+
+# asyncio API: VDF work runs in a process pool shared by all callers, so
+# the event loop keeps serving the network while VDFs are computed.
+# vdf_execute_async runs in chunks of async_chunk steps, cancelling the
+# awaiting task abandons the computation at the next chunk boundary.
+# At most async_limit jobs (per event loop) use the pool at a time.
+
+async_workers = None # pool size, None for os.cpu_count()
+async_limit = None # concurrent jobs, None for the pool size
+async_chunk = 10000
+shared_executor = None
+async_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_executor():
+    global shared_executor
+    if shared_executor is None:
+        shared_executor = ProcessPoolExecutor(max_workers=async_workers)
+    return shared_executor
+
+
+def shutdown_executor(wait=True):
+    global shared_executor
+    if shared_executor is not None:
+        shared_executor.shutdown(wait=wait, cancel_futures=True)
+        shared_executor = None
+
+
+def async_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = async_semaphores.get(loop)
+    if semaphore is None:
+        limit = async_limit or async_workers or os.cpu_count() or 1
+        semaphore = asyncio.Semaphore(limit)
+        async_semaphores[loop] = semaphore
+    return semaphore
+
+
+# worker side of vdf_execute_async, state as VDFComputation.to_bytes().
+def vdf_computation_chunk(state, steps, backend=None):
+    computation = VDFComputation.from_bytes(state, steps, backend)
+    computation.run(steps)
+    return computation.to_bytes()
+
+
+# progress: called in the event loop as progress(done, t) after every chunk.
+async def vdf_execute_async(x, t, backend=None, chunk=None, progress=None, executor=None):
+    backend = resolve_backend(backend).name
+    chunk = chunk or async_chunk
+    executor = executor or get_executor()
+    loop = asyncio.get_running_loop()
+    computation = VDFComputation(x, t, chunk, backend)
+    async with async_semaphore():
+        while not computation.finished():
+            steps = min(chunk, t - computation.done)
+            state = await loop.run_in_executor(executor, vdf_computation_chunk, computation.to_bytes(), steps, backend)
+            computation = VDFComputation.from_bytes(state, chunk, backend)
+            if progress is not None:
+                progress(computation.done, t)
+    return computation.result()
+
+
+async def vdf_verify_async(y, x, t, backend=None, executor=None):
+    backend = resolve_backend(backend).name
+    executor = executor or get_executor()
+    loop = asyncio.get_running_loop()
+    async with async_semaphore():
+        return await loop.run_in_executor(executor, mod_verif, y, x, t, backend)
 
-def vdf_verify(y,x,t):
-    return mod_verif(y,x,t)
 
 if __name__ == '__main__':
 
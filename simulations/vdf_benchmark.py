@@ -0,0 +1,136 @@
+# Sloth VDF throughput benchmark, the Python counterpart of BENCHMARK.md.
+#
+#   python vdf_benchmark.py --steps 1000 3000 10000 --repeat 5 --output bench.json
+#   python vdf_benchmark.py --compare bench.json   # exit 1 on regressions
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+
+import vdf
+
+DEFAULT_STEPS = [1000, 3000, 10000]
+DEFAULT_X = 24106875808534963550974826322234633855469213855649218736479077548818158667371
+PERCENTILES = [50, 90, 99]
+
+
+# linear interpolation between closest ranks, q in [0, 100].
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        raise ValueError('percentile of empty data')
+    position = (len(values) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+# seconds of each of repeat timed calls, after warmup untimed calls.
+def measure(function, repeat, warmup):
+    for i in range(warmup):
+        function()
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summarize(backend, operation, steps, times):
+    summary = {
+        'backend': backend,
+        'operation': operation,
+        'steps': steps,
+        'repeat': len(times),
+        'times': times,
+        'min': min(times),
+        'mean': sum(times) / len(times),
+    }
+    for q in PERCENTILES:
+        summary['p' + str(q)] = percentile(times, q)
+    summary['steps_per_second'] = steps / summary['p50']
+    return summary
+
+
+def benchmark(steps=DEFAULT_STEPS, backends=None, repeat=5, warmup=1, x=DEFAULT_X):
+    if backends is None:
+        backends = vdf.available_backends()
+    results = []
+    for backend in backends:
+        for t in steps:
+            times = measure(lambda: vdf.vdf_execute(x, t, backend=backend), repeat, warmup)
+            results.append(summarize(backend, 'eval', t, times))
+            y = vdf.vdf_execute(x, t, backend=backend)
+            times = measure(lambda: vdf.vdf_verify(y, x, t, backend=backend), repeat, warmup)
+            results.append(summarize(backend, 'verify', t, times))
+    return {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'warmup': warmup,
+        'results': results,
+    }
+
+
+# entries of current whose median throughput dropped more than tolerance
+# (a fraction) against the same backend/operation/steps in baseline.
+def compare(baseline, current, tolerance=0.10):
+    def key(entry):
+        return (entry['backend'], entry['operation'], entry['steps'])
+    previous = {key(entry): entry for entry in baseline['results']}
+    regressions = []
+    for entry in current['results']:
+        old = previous.get(key(entry))
+        if old is None:
+            continue
+        change = entry['steps_per_second'] / old['steps_per_second'] - 1
+        if change < -tolerance:
+            regressions.append({'backend': entry['backend'], 'operation': entry['operation'], 'steps': entry['steps'],
+                                'baseline': old['steps_per_second'], 'current': entry['steps_per_second'], 'change': change})
+    return regressions
+
+
+def report(result, out=sys.stdout):
+    out.write('%-8s %-7s %7s %10s %10s %10s %12s\n' % ('backend', 'op', 'steps', 'p50 (s)', 'p90 (s)', 'p99 (s)', 'steps/s'))
+    for entry in result['results']:
+        out.write('%-8s %-7s %7d %10.4f %10.4f %10.4f %12.1f\n' % (entry['backend'], entry['operation'], entry['steps'],
+                  entry['p50'], entry['p90'], entry['p99'], entry['steps_per_second']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sloth VDF eval/verify throughput benchmark.')
+    parser.add_argument('--steps', type=int, nargs='+', default=DEFAULT_STEPS)
+    parser.add_argument('--backends', nargs='+', default=None, choices=vdf.available_backends())
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--compare', help='baseline JSON file, exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed throughput drop (fraction)')
+    args = parser.parse_args(argv)
+
+    result = benchmark(args.steps, args.backends, args.repeat, args.warmup)
+    report(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), result, args.tolerance)
+        for r in regressions:
+            print('REGRESSION %s %s %d steps: %.1f -> %.1f steps/s (%+.1f%%)' % (
+                r['backend'], r['operation'], r['steps'], r['baseline'], r['current'], 100 * r['change']))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import unittest
+
+import vdf_benchmark
+
+class TestVDFBenchmark(unittest.TestCase):
+
+    def test_percentile(self):
+        self.assertEqual(vdf_benchmark.percentile([3, 1, 2], 50), 2)
+        self.assertEqual(vdf_benchmark.percentile([1, 2], 50), 1.5)
+        self.assertEqual(vdf_benchmark.percentile([1, 2, 3, 4], 100), 4)
+        self.assertEqual(vdf_benchmark.percentile([5], 90), 5)
+
+    def test_benchmarkAndCompare(self):
+        result = vdf_benchmark.benchmark(steps=[10], backends=['python'], repeat=2, warmup=0)
+        self.assertEqual([(e['operation'], e['steps'], e['repeat']) for e in result['results']], [('eval', 10, 2), ('verify', 10, 2)])
+        self.assertEqual(vdf_benchmark.compare(result, result), [])
+        slower = {'results': [dict(e, steps_per_second=e['steps_per_second'] / 2) for e in result['results']]}
+        regressions = vdf_benchmark.compare(result, slower)
+        self.assertEqual(len(regressions), 2)
+        self.assertAlmostEqual(regressions[0]['change'], -0.5)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
@@ -0,0 +1,141 @@
+# Calibrated Sloth VDF speed model: times vdf_execute on this machine at a
+# few step counts, fits seconds = overhead + steps / steps_per_second and
+# caches the fit on disk, so simulations and miners can turn a difficulty
+# (VDF steps) into an expected block time without running the VDF.
+#
+#   model = load_or_calibrate()
+#   model.predict_seconds(comptroller.getConsensusDifficulty(coins, totalCoins, vrfSeed))
+
+import datetime
+import json
+import os
+import platform
+import statistics
+
+import vdf
+from vdf_benchmark import measure
+
+DEFAULT_STEPS = [500, 1000, 2000, 4000]
+DEFAULT_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'pulsar', 'vdf_speed.json')
+DEFAULT_X = 24106875808534963550974826322234633855469213855649218736479077548818158667371
+
+
+class VDFSpeedModel(object):
+
+    def __init__(self, steps_per_second, overhead=0.0, backend=None, machine=None, created=None, samples=()):
+        assert( steps_per_second > 0 )
+        self.steps_per_second = steps_per_second
+        self.overhead = overhead # seconds per computation, independent of steps
+        self.backend = backend
+        self.machine = machine
+        self.created = created
+        self.samples = [tuple(sample) for sample in samples] # (steps, seconds)
+
+    def predict_seconds(self, steps):
+        return self.overhead + steps / self.steps_per_second
+
+    # steps that fit in seconds, the inverse of predict_seconds.
+    def steps_for(self, seconds):
+        return max(0, int((seconds - self.overhead) * self.steps_per_second))
+
+    # expected time for a miner on this machine to produce the next block.
+    def predict_block_time(self, comptroller, coins, totalCoins, vrfSeed):
+        return self.predict_seconds(comptroller.getConsensusDifficulty(coins, totalCoins, vrfSeed))
+
+    def to_dict(self):
+        return {'steps_per_second': self.steps_per_second, 'overhead': self.overhead, 'backend': self.backend,
+                'machine': self.machine, 'created': self.created, 'samples': self.samples}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['steps_per_second'], data['overhead'], data.get('backend'), data.get('machine'),
+                   data.get('created'), data.get('samples', ()))
+
+
+# least squares line through (steps, seconds) samples; a negative
+# intercept (timer noise) is dropped by refitting through the origin.
+def fit(samples):
+    samples = list(samples)
+    if len(set(steps for steps, seconds in samples)) < 2:
+        raise ValueError('need samples at two or more step counts')
+    n = len(samples)
+    meanSteps = sum(steps for steps, seconds in samples) / n
+    meanSeconds = sum(seconds for steps, seconds in samples) / n
+    sxx = sum((steps - meanSteps) ** 2 for steps, seconds in samples)
+    sxy = sum((steps - meanSteps) * (seconds - meanSeconds) for steps, seconds in samples)
+    slope = sxy / sxx
+    overhead = meanSeconds - slope * meanSteps
+    if overhead < 0 or slope <= 0:
+        overhead = 0.0
+        slope = sum(steps * seconds for steps, seconds in samples) / sum(steps * steps for steps, seconds in samples)
+    return 1.0 / slope, overhead
+
+
+# identifies the machine and backend a calibration is valid for.
+def machine_key(backend=None):
+    return '|'.join([platform.node(), platform.machine(), platform.processor(), platform.python_implementation(),
+                     platform.python_version(), vdf.resolve_backend(backend).name])
+
+
+# times vdf_execute (median of repeat runs per step count) and fits the model.
+def calibrate(step_counts=DEFAULT_STEPS, repeat=3, backend=None, x=DEFAULT_X):
+    backend = vdf.resolve_backend(backend).name
+    samples = []
+    for steps in step_counts:
+        times = measure(lambda: vdf.vdf_execute(x, steps, backend=backend), repeat, 1)
+        samples.append((steps, statistics.median(times)))
+    steps_per_second, overhead = fit(samples)
+    return VDFSpeedModel(steps_per_second, overhead, backend, machine_key(backend),
+                         datetime.datetime.now(datetime.timezone.utc).isoformat(), samples)
+
+
+def load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_model(model, path=DEFAULT_CACHE):
+    cache = load_cache(path)
+    cache[model.machine] = model.to_dict()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, path)
+
+
+# cached model for this machine and backend, or None.
+# max_age: seconds after which a calibration is considered stale.
+def load_model(path=DEFAULT_CACHE, backend=None, max_age=None):
+    data = load_cache(path).get(machine_key(backend))
+    if data is None:
+        return None
+    model = VDFSpeedModel.from_dict(data)
+    if max_age is not None and model.created is not None:
+        created = datetime.datetime.fromisoformat(model.created)
+        if (datetime.datetime.now(datetime.timezone.utc) - created).total_seconds() > max_age:
+            return None
+    return model
+
+
+def load_or_calibrate(path=DEFAULT_CACHE, backend=None, max_age=None, **calibrate_args):
+    model = load_model(path, backend, max_age)
+    if model is None:
+        model = calibrate(backend=backend, **calibrate_args)
+        save_model(model, path)
+    return model
+
+
+if __name__ == '__main__':
+
+    model = load_or_calibrate() # cached after the first run
+    print('Backend: ', model.backend)
+    print('Steps per second: ', format(model.steps_per_second, '.1f'))
+    print('Overhead: ', format(model.overhead, '.6f'))
+    for steps in [1000, 3000, 10000]:
+        print(steps, 'steps: ', format(model.predict_seconds(steps), '.3f'), 'secs')
@@ -0,0 +1,48 @@
+import unittest
+import os
+import tempfile
+
+import vdf_calibration
+from vdf_calibration import VDFSpeedModel
+from ComptrollerMinimal import ComptrollerMinimal
+
+class TestVDFCalibration(unittest.TestCase):
+
+    def test_fit(self):
+        samples = [(steps, 0.5 + steps / 2000.0) for steps in [1000, 2000, 4000]]
+        steps_per_second, overhead = vdf_calibration.fit(samples)
+        self.assertAlmostEqual(steps_per_second, 2000.0)
+        self.assertAlmostEqual(overhead, 0.5)
+        # negative intercept from noise, fit through the origin
+        steps_per_second, overhead = vdf_calibration.fit([(1000, 0.4), (2000, 1.0)])
+        self.assertEqual(overhead, 0.0)
+        with self.assertRaises(ValueError):
+            vdf_calibration.fit([(1000, 1.0), (1000, 1.1)])
+
+    def test_model(self):
+        model = VDFSpeedModel(1000.0, 0.25)
+        self.assertEqual(model.predict_seconds(2000), 2.25)
+        self.assertEqual(model.steps_for(2.25), 2000)
+        self.assertEqual(model.steps_for(0.1), 0)
+        c = ComptrollerMinimal()
+        c.blockNumber = c.bootstrapPeriod + 1
+        self.assertEqual(model.predict_block_time(c, 1000, 10000, 10000000000000000000000000000001), 6.25)
+
+    def test_cache(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.remove(path)
+        try:
+            model = vdf_calibration.load_or_calibrate(path, backend='python', step_counts=[20, 40], repeat=1)
+            self.assertGreater(model.steps_per_second, 0)
+            cached = vdf_calibration.load_or_calibrate(path, backend='python', step_counts=[20, 40], repeat=1)
+            self.assertEqual(cached.to_dict(), model.to_dict())
+            self.assertIsNone(vdf_calibration.load_model(path, backend='python', max_age=-1))
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)
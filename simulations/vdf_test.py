@@ -0,0 +1,167 @@
+import unittest
+import asyncio
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import vdf
+
+class TestVDF(unittest.TestCase):
+
+    def setUp(self):
+        self.x = 24106875808534963550974826322234633855469213855649218736479077548818158667371
+        self.t = 200
+
+    def test_executeVerify(self):
+        y = vdf.vdf_execute(self.x, self.t)
+        self.assertTrue(vdf.vdf_verify(y, self.x, self.t))
+        self.assertFalse(vdf.vdf_verify(y + 1, self.x, self.t))
+
+    def test_checkpoints(self):
+        y, checkpoints = vdf.vdf_execute(self.x, self.t, checkpoint_every=60)
+        self.assertEqual(y, vdf.vdf_execute(self.x, self.t))
+        self.assertEqual([steps for steps, value in checkpoints], [60, 120, 180])
+        self.assertEqual(checkpoints[1][1], vdf.vdf_execute(self.x, 120))
+        segments = vdf.vdf_segments(y, self.x, self.t, checkpoints)
+        self.assertEqual([steps for y, x, steps in segments], [60, 60, 60, 20])
+
+    def test_verifyParallel(self):
+        y, checkpoints = vdf.vdf_execute(self.x, self.t, checkpoint_every=50)
+        self.assertTrue(vdf.vdf_verify_parallel(y, self.x, self.t, checkpoints, workers=2))
+        self.assertTrue(vdf.vdf_verify_parallel(y, self.x, self.t, checkpoints, workers=1))
+        bad = list(checkpoints)
+        bad[2] = (bad[2][0], bad[2][1] + 1)
+        self.assertFalse(vdf.vdf_verify_parallel(y, self.x, self.t, bad, workers=2))
+        self.assertFalse(vdf.vdf_verify_parallel(y, self.x, self.t + 1, checkpoints, workers=2))
+        with self.assertRaises(ValueError):
+            vdf.vdf_verify_parallel(y, self.x, 100, checkpoints, workers=2)
+
+    def test_verifyBatch(self):
+        proofs = []
+        for i in range(6):
+            x = self.x + i
+            proofs.append((vdf.vdf_execute(x, 50), x, 50))
+        results = vdf.vdf_verify_batch(proofs, workers=2)
+        self.assertEqual([result.ok for result in results], [True] * 6)
+        self.assertTrue(all(result.elapsed >= 0 for result in results))
+        proofs[0] = (proofs[0][0] + 1, proofs[0][1], 50)
+        results = vdf.vdf_verify_batch(proofs, workers=1, stop_on_failure=False)
+        self.assertEqual([result.ok for result in results], [False] + [True] * 5)
+        results = vdf.vdf_verify_batch(proofs, workers=1)
+        self.assertFalse(results[0].ok)
+        self.assertTrue(all(result.ok in (True, None) for result in results[1:]))
+
+    def test_computation(self):
+        y = vdf.vdf_execute(self.x, self.t)
+        seen = []
+        computation = vdf.VDFComputation(self.x, self.t, chunk=30, progress=lambda done, t: seen.append(done))
+        self.assertEqual(computation.run(), y)
+        self.assertEqual(seen, [30, 60, 90, 120, 150, 180, 200])
+        self.assertEqual(computation.result(), y)
+
+    def test_computationCancelResume(self):
+        y = vdf.vdf_execute(self.x, self.t)
+        computation = vdf.VDFComputation(self.x, self.t, chunk=25)
+        computation.progress = lambda done, t: computation.cancel() if done == 50 else None
+        self.assertIsNone(computation.run())
+        self.assertEqual(computation.done, 50)
+        with self.assertRaises(ValueError):
+            computation.result()
+        self.assertIsNone(computation.resume(max_steps=60))
+        self.assertEqual(computation.done, 110)
+        state = computation.to_bytes()
+        self.assertEqual(len(state), vdf.VDFComputation.state_format.size)
+        restored = vdf.VDFComputation.from_bytes(state, chunk=40)
+        self.assertEqual((restored.x, restored.t, restored.done), (self.x, self.t, 110))
+        self.assertEqual(restored.run(), y)
+        with self.assertRaises(ValueError):
+            vdf.VDFComputation.from_bytes(state[:-1])
+        with self.assertRaises(ValueError):
+            vdf.VDFComputation.from_bytes(state + b'\x00')
+        # hand-built states with more steps done than t, or values over p
+        pack = vdf.VDFComputation.state_format.pack
+        version = vdf.VDFComputation.state_version
+        value = restored.value.to_bytes(32, 'little')
+        with self.assertRaises(ValueError):
+            vdf.VDFComputation.from_bytes(pack(version, self.t, self.t + 1, self.x.to_bytes(32, 'little'), value))
+        with self.assertRaises(ValueError):
+            vdf.VDFComputation.from_bytes(pack(version, self.t, 10, vdf.p.to_bytes(32, 'little'), value))
+        with self.assertRaises(ValueError):
+            vdf.VDFComputation.from_bytes(pack(version, self.t, 10, self.x.to_bytes(32, 'little'), vdf.p.to_bytes(32, 'little')))
+        done = vdf.VDFComputation.from_bytes(pack(version, self.t, self.t, self.x.to_bytes(32, 'little'), y.to_bytes(32, 'little')))
+        self.assertEqual(done.result(), y)
+
+    def test_executeAsync(self):
+        y = vdf.vdf_execute(self.x, self.t)
+        seen = []
+
+        async def main():
+            other = asyncio.create_task(vdf.vdf_execute_async(self.x + 1, self.t, chunk=50))
+            result = await vdf.vdf_execute_async(self.x, self.t, chunk=60, progress=lambda done, t: seen.append(done))
+            ok = await vdf.vdf_verify_async(result, self.x, self.t)
+            return result, ok, await other
+
+        try:
+            result, ok, other = asyncio.run(main())
+        finally:
+            vdf.shutdown_executor()
+        self.assertEqual(result, y)
+        self.assertTrue(ok)
+        self.assertEqual(other, vdf.vdf_execute(self.x + 1, self.t))
+        self.assertEqual(seen, [60, 120, 180, 200])
+
+    def test_executeAsyncCancel(self):
+        chunks = []
+
+        async def main(executor):
+            task = asyncio.create_task(vdf.vdf_execute_async(self.x, 100000, chunk=10, executor=executor,
+                                                             progress=lambda done, t: chunks.append(done)))
+            while not chunks:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return await vdf.vdf_verify_async(vdf.vdf_execute(self.x, 20), self.x, 20, executor=executor)
+
+        with ThreadPoolExecutor(2) as executor:
+            self.assertTrue(asyncio.run(main(executor)))
+        self.assertLess(chunks[-1], 100000)
+
+    def test_fastSqrtMatchesReference(self):
+        rng = random.Random(2)
+        for x in [0, 1, 2, vdf.p - 1] + [rng.randrange(vdf.p) for i in range(200)]:
+            self.assertEqual(vdf.mod_sqrt_op_fast(x, vdf.p), vdf.mod_sqrt_op(x, vdf.p))
+        # small primes, (p+1)/4 odd for 19 and even for 23 and 31
+        for q in [19, 23, 31]:
+            for x in range(2 * q):
+                self.assertEqual(vdf.mod_sqrt_op_fast(x, q), vdf.mod_sqrt_op(x, q))
+        self.assertEqual(vdf.mod_op_fast(self.x, self.t), vdf.mod_op(self.x, self.t))
+
+    def test_backendsIdentical(self):
+        rng = random.Random(6)
+        xs = [0, 1, vdf.p - 1] + [rng.randrange(vdf.p) for i in range(20)]
+        for name in vdf.available_backends():
+            for x in xs:
+                self.assertEqual(vdf.mod_sqrt_op(x, vdf.p, name), vdf.mod_sqrt_op(x, vdf.p, 'python'))
+                self.assertEqual(vdf.mod_sqrt_op_fast(x, vdf.p, name), vdf.mod_sqrt_op(x, vdf.p, 'python'))
+            y = vdf.vdf_execute(self.x, self.t, backend=name)
+            self.assertIs(type(y), int)
+            self.assertEqual(y, vdf.mod_op(self.x, self.t, 'python'))
+            self.assertEqual(vdf.mod_op(self.x, 20, name), vdf.mod_op(self.x, 20, 'python'))
+            self.assertTrue(vdf.vdf_verify(y, self.x, self.t, backend=name))
+            self.assertFalse(vdf.vdf_verify(y, self.x + 1, self.t, backend=name))
+
+    def test_setBackend(self):
+        previous = vdf.get_backend()
+        try:
+            vdf.set_backend('python')
+            self.assertEqual(vdf.get_backend(), 'python')
+            with self.assertRaises(ValueError):
+                vdf.set_backend('no-such-backend')
+        finally:
+            vdf.set_backend(previous)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
+    exit(0)